@@ -0,0 +1,49 @@
+"""Benchmarks of the cache backends with small and large dataframes"""
+import sqlite3
+import tempfile
+import pytest
+from liquer.cache import FileCache, MemoryCache, SQLCache, StoreCache
+from liquer.state import State
+from liquer.store import MemoryStore, FileStore
+
+
+@pytest.fixture(params=["MemoryCache", "FileCache", "SQLCache", "StoreCache-memory", "StoreCache-file"])
+def cache(request):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if request.param == "MemoryCache":
+            yield MemoryCache()
+        elif request.param == "FileCache":
+            yield FileCache(tmpdir)
+        elif request.param == "SQLCache":
+            yield SQLCache(sqlite3.connect(":memory:"), delete_before_insert=True)
+        elif request.param == "StoreCache-memory":
+            yield StoreCache(MemoryStore(), path="cache")
+        else:
+            yield StoreCache(FileStore(tmpdir), path="cache")
+
+
+@pytest.fixture(params=["small", "large"])
+def state(request, small_df, large_df):
+    state = State().with_data(small_df if request.param == "small" else large_df)
+    state.query = f"{request.param}_df"
+    return state
+
+
+def bench_store(benchmark, cache, state):
+    assert benchmark(cache.store, state)
+
+
+def bench_get(benchmark, cache, state):
+    cache.store(state)
+    result = benchmark(cache.get, state.query)
+    assert len(result.get()) == len(state.get())
+
+
+def bench_get_metadata(benchmark, cache, state):
+    cache.store(state)
+    assert benchmark(cache.get_metadata, state.query)["query"] == state.query
+
+
+def bench_contains(benchmark, cache, state):
+    cache.store(state)
+    assert benchmark(cache.contains, state.query)
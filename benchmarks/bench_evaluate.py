@@ -0,0 +1,92 @@
+"""Benchmarks of the query evaluation - deep pipelines (many actions) and wide queries (many links)"""
+import pytest
+from liquer import evaluate
+from liquer.cache import set_cache, MemoryCache
+from liquer.commands import command, first_command, reset_command_registry
+
+
+@pytest.fixture
+def commands():
+    reset_command_registry()
+
+    @first_command
+    def bench_value(x=0):
+        return int(x)
+
+    @command
+    def bench_add(value, x: int = 1):
+        return value + x
+
+    @command(pure=True)
+    def bench_add_pure(value, x: int = 1):
+        return value + x
+
+    @command
+    def bench_sum(value, *values):
+        return value + sum(int(x) for x in values)
+
+    @first_command
+    def bench_range(n: int = 1000):
+        return list(range(n))
+
+    @command
+    def bench_list_sum(values):
+        return sum(values)
+
+    yield
+    reset_command_registry()
+
+
+def deep_query(depth, command="bench_add"):
+    return "bench_value-0/" + "/".join(f"{command}-{i}" for i in range(depth))
+
+
+def wide_query(width):
+    links = "-".join(f"~X~bench_value-{i}~E" for i in range(width))
+    return f"bench_value-0/bench_sum-{links}"
+
+
+@pytest.mark.parametrize("depth", [1, 10, 50])
+def bench_deep_no_cache(benchmark, commands, no_cache, depth):
+    query = deep_query(depth)
+    assert benchmark(evaluate, query).get() == sum(range(depth))
+
+
+@pytest.mark.parametrize("depth", [10, 50])
+def bench_deep_pure_no_cache(benchmark, commands, no_cache, depth):
+    query = deep_query(depth, "bench_add_pure")
+    assert benchmark(evaluate, query).get() == sum(range(depth))
+
+
+@pytest.mark.parametrize("width", [10, 50])
+def bench_wide_no_cache(benchmark, commands, no_cache, width):
+    query = wide_query(width)
+    assert benchmark(evaluate, query).get() == sum(range(width))
+
+
+@pytest.mark.parametrize("depth", [10, 50])
+def bench_deep_memory_cache_hit(benchmark, commands, depth):
+    set_cache(MemoryCache())
+    try:
+        query = deep_query(depth)
+        evaluate(query)
+        assert benchmark(evaluate, query).get() == sum(range(depth))
+    finally:
+        set_cache(None)
+
+
+def bench_deep_memory_cache_miss(benchmark, commands):
+    query = deep_query(20)
+
+    def setup():
+        set_cache(MemoryCache())
+
+    try:
+        benchmark.pedantic(evaluate, args=(query,), setup=setup, rounds=20)
+    finally:
+        set_cache(None)
+
+
+def bench_large_data_pipeline(benchmark, commands, no_cache):
+    query = "bench_range-1000000/bench_list_sum"
+    assert benchmark(evaluate, query).get() == sum(range(1000000))
@@ -0,0 +1,32 @@
+"""Benchmarks of the query parsing"""
+import pytest
+from liquer.parser import parse
+from liquer.plan import QueryPlanner
+
+QUERIES = dict(
+    short="hello-world",
+    pipeline="df_from-data.csv/eq-a-1/teq-b-x/head_df-10/data.xlsx",
+    links="df_from-~X~data.csv~E/concat-~X~df_from-other.csv~E/head_df-10",
+    resource="-R/path/to/data.csv/-/eq-a-1/head_df-10",
+    long="/".join(f"action{i}-{i}-x{i}" for i in range(50)),
+)
+
+
+@pytest.mark.parametrize("name", QUERIES.keys())
+def bench_parse(benchmark, name):
+    query = QUERIES[name]
+    result = benchmark(parse, query)
+    assert result.encode() == parse(query).encode()
+
+
+@pytest.mark.parametrize("name", QUERIES.keys())
+def bench_encode(benchmark, name):
+    query = parse(QUERIES[name])
+    benchmark(query.encode)
+
+
+@pytest.mark.parametrize("name", QUERIES.keys())
+def bench_planner_parse(benchmark, name):
+    planner = QueryPlanner()
+    query = QUERIES[name]
+    benchmark(planner.parse, query)
@@ -0,0 +1,39 @@
+"""Benchmarks of the recipe store synchronization"""
+import pytest
+from liquer.commands import first_command, reset_command_registry
+from liquer.recipes import RecipeSpecStore
+from liquer.store import MemoryStore
+
+
+@pytest.fixture
+def recipe_store():
+    def make(directories, recipes_per_directory):
+        reset_command_registry()
+
+        @first_command
+        def bench_hello(x):
+            return f"Hello, {x}"
+
+        substore = MemoryStore()
+        for d in range(directories):
+            recipes = "\n".join(
+                f"  - bench_hello-{d}_{i}/hello{i}.txt"
+                for i in range(recipes_per_directory)
+            )
+            substore.store(f"dir{d}/recipes.yaml", f"RECIPES:\n{recipes}\n", {})
+        return RecipeSpecStore(substore)
+
+    yield make
+    reset_command_registry()
+
+
+@pytest.mark.parametrize("directories,recipes", [(1, 1000), (100, 10)])
+def bench_sync(benchmark, recipe_store, directories, recipes):
+    store = recipe_store(directories, recipes)
+    benchmark(store.sync)
+    assert store.contains(f"dir0/hello0.txt")
+
+
+def bench_recipe_metadata(benchmark, recipe_store):
+    store = recipe_store(10, 100)
+    benchmark(store.get_metadata, "dir5/hello50.txt")
@@ -0,0 +1,97 @@
+"""Benchmarks of concurrent HTTP requests against the Flask and FastAPI servers.
+
+Requests are sent through the in-process test clients from a thread pool,
+so the benchmarks measure the server code paths (routing, evaluation, serialization)
+without the network overhead.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from liquer.cache import set_cache, MemoryCache
+from liquer.commands import first_command, command, reset_command_registry
+
+REQUESTS = 200
+WORKERS = 8
+
+
+@pytest.fixture(scope="module")
+def commands():
+    reset_command_registry()
+
+    @first_command
+    def bench_hello(x="world"):
+        return f"Hello, {x}"
+
+    @command
+    def bench_upper(text):
+        return text.upper()
+
+    set_cache(MemoryCache())
+    yield
+    set_cache(None)
+    reset_command_registry()
+
+
+@pytest.fixture(scope="module")
+def flask_client_factory(commands):
+    flask = pytest.importorskip("flask")
+    import liquer.server.blueprint as bp
+
+    app = flask.Flask(__name__)
+    app.register_blueprint(bp.app, url_prefix="/liquer")
+    return app.test_client
+
+
+@pytest.fixture(scope="module")
+def fastapi_client_factory(commands):
+    fastapi = pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    from liquer.server.fastapi import router
+
+    app = fastapi.FastAPI()
+    app.include_router(router, prefix="/liquer")
+    return lambda: TestClient(app)
+
+
+def load(client_factory, urls):
+    def worker(urls):
+        client = client_factory()
+        return [client.get(url).status_code for url in urls]
+
+    chunks = [urls[i::WORKERS] for i in range(WORKERS)]
+    with ThreadPoolExecutor(WORKERS) as executor:
+        return [code for codes in executor.map(worker, chunks) for code in codes]
+
+
+def cached_urls():
+    return [f"/liquer/q/bench_hello-{i % 10}/bench_upper" for i in range(REQUESTS)]
+
+
+def uncached_urls(prefix):
+    return [f"/liquer/q/bench_hello-{prefix}{i}/bench_upper" for i in range(REQUESTS)]
+
+
+@pytest.mark.parametrize("server", ["flask", "fastapi"])
+def bench_cached_queries(benchmark, request, server):
+    client_factory = request.getfixturevalue(f"{server}_client_factory")
+    codes = benchmark(load, client_factory, cached_urls())
+    assert all(code == 200 for code in codes)
+
+
+@pytest.mark.parametrize("server", ["flask", "fastapi"])
+def bench_uncached_queries(benchmark, request, server):
+    client_factory = request.getfixturevalue(f"{server}_client_factory")
+    rounds = iter(range(1000000))
+
+    def setup():
+        return (client_factory, uncached_urls(f"{server}{next(rounds)}_")), {}
+
+    codes = benchmark.pedantic(load, setup=setup, rounds=5)
+    assert all(code == 200 for code in codes)
+
+
+@pytest.mark.parametrize("server", ["flask", "fastapi"])
+def bench_commands_json(benchmark, request, server):
+    client_factory = request.getfixturevalue(f"{server}_client_factory")
+    codes = benchmark(load, client_factory, ["/liquer/api/commands.json"] * REQUESTS)
+    assert all(code == 200 for code in codes)
@@ -0,0 +1,66 @@
+"""Benchmarks of the store operations"""
+import tempfile
+import pytest
+from liquer.store import MemoryStore, FileStore, MountPointStore
+
+SMALL = b"x" * 1000
+LARGE = b"x" * 10000000
+
+
+@pytest.fixture(params=["MemoryStore", "FileStore", "MountPointStore"])
+def store(request):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if request.param == "MemoryStore":
+            yield MemoryStore()
+        elif request.param == "FileStore":
+            yield FileStore(tmpdir)
+        else:
+            store = MountPointStore(default_store=MemoryStore())
+            store.mount("mnt", FileStore(tmpdir))
+            yield store
+
+
+def key(store, name):
+    return f"mnt/{name}" if isinstance(store, MountPointStore) else name
+
+
+@pytest.mark.parametrize("size", ["small", "large"])
+def bench_store_data(benchmark, store, size):
+    data = SMALL if size == "small" else LARGE
+    benchmark(store.store, key(store, "dir/data.bin"), data, {})
+
+
+@pytest.mark.parametrize("size", ["small", "large"])
+def bench_get_bytes(benchmark, store, size):
+    data = SMALL if size == "small" else LARGE
+    store.store(key(store, "dir/data.bin"), data, {})
+    assert benchmark(store.get_bytes, key(store, "dir/data.bin")) == data
+
+
+def bench_get_metadata(benchmark, store):
+    store.store(key(store, "dir/data.bin"), SMALL, dict(title="Data"))
+    assert benchmark(store.get_metadata, key(store, "dir/data.bin"))["title"] == "Data"
+
+
+def bench_store_metadata(benchmark, store):
+    store.store(key(store, "dir/data.bin"), SMALL, {})
+    benchmark(store.store_metadata, key(store, "dir/data.bin"), dict(title="Data"))
+
+
+def bench_listdir(benchmark, store):
+    for i in range(200):
+        store.store(key(store, f"dir/data{i}.bin"), SMALL, {})
+    assert len(benchmark(store.listdir, key(store, "dir"))) == 200
+
+
+def bench_keys(benchmark, store):
+    for i in range(20):
+        for j in range(10):
+            store.store(key(store, f"dir{i}/data{j}.bin"), SMALL, {})
+    assert len(benchmark(lambda: list(store.keys()))) >= 200
+
+
+def bench_get_many(benchmark, store):
+    keys = [key(store, f"dir/data{i}.bin") for i in range(100)]
+    store.store_many([(k, SMALL, {}) for k in keys])
+    assert len(benchmark(store.get_many, keys)) == 100
@@ -0,0 +1,33 @@
+"""Shared fixtures for the LiQuer benchmarks"""
+import pytest
+
+
+@pytest.fixture(scope="session")
+def small_df():
+    import pandas as pd
+
+    return pd.DataFrame(dict(a=range(100), b=[f"x{i}" for i in range(100)]))
+
+
+@pytest.fixture(scope="session")
+def large_df():
+    import numpy as np
+    import pandas as pd
+
+    n = 1000000
+    return pd.DataFrame(
+        dict(
+            a=np.arange(n),
+            b=np.random.random(n),
+            c=np.random.choice(["alpha", "beta", "gamma"], n),
+        )
+    )
+
+
+@pytest.fixture
+def no_cache():
+    from liquer.cache import set_cache, NoCache
+
+    set_cache(NoCache())
+    yield
+    set_cache(None)
@@ -15,15 +15,25 @@ while returning (besides the recovered state) the query remainder that needs to
 from os import makedirs
 import os.path
 import hashlib
-import json
+import liquer.json_codec as json_codec
 from liquer.state_types import state_types_registry
 from liquer.state import State
 from liquer.parser import all_splits, encode, decode
+from liquer.compression import (
+    COMPRESSION_KEY,
+    compression_policy,
+    compress,
+    decompress,
+    preserve_compression,
+    without_compression,
+)
 import logging
 import traceback
 import base64
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
 _cache = None
 
 
@@ -70,6 +80,26 @@ def cached_part(query, cache=None):
     return State(), encode(decode(query))
 
 
+def migrate_cache(cache=None):
+    """Re-serialize all the states in the cache with the current default formats
+    (e.g. dataframes pickled by older versions are converted to Arrow).
+    Cache must support the keys method. Returns the number of migrated states.
+    """
+    if cache is None:
+        cache = get_cache()
+    count = 0
+    for key in list(cache.keys()):
+        state = cache.get(key)
+        if state is None:
+            continue
+        cache.remove(key)
+        if cache.store(state):
+            count += 1
+        else:
+            logger.warning("Failed to migrate %s", key)
+    return count
+
+
 class CacheMixin:
     """Adds various cache combinator helpers"""
 
@@ -349,6 +379,24 @@ class CacheProxy:
         return f"CacheProxy({repr(self.cache)})"
 
 
+class RefreshCache(CacheProxy):
+    """Cache proxy which does not provide the cached states, but stores the new ones.
+    This forces the re-evaluation of queries (e.g. when profiling) while keeping the cache up to date.
+    """
+
+    def get(self, key):
+        return None
+
+    def contains(self, key):
+        return False
+
+    def __str__(self):
+        return f"Refresh of {str(self.cache)}"
+
+    def __repr__(self):
+        return f"RefreshCache({repr(self.cache)})"
+
+
 class NoCache(CacheMixin):
     """Trivial cache object which does not cache any state"""
     @classmethod
@@ -461,24 +509,35 @@ class FileCache(CacheMixin):
     Note that no mechanism for maintaining freshness or constraining file size
     is provided. This may lead to filling the space on the filesystem,
     therefore this is not ideal for long running public web-services.
+
+    Data files are written atomically (to a temporary file, which is then renamed),
+    hence the data can be read by memory-mapping the file (see StateType.from_file).
+    Data files written with a different default extension (e.g. pickle) are still recovered,
+    see also migrate_cache.
+
+    Optionally the data can be compressed - compression is either a codec name
+    or a compression policy (see liquer.compression). The codec is recorded in the metadata.
     """
 
-    def __init__(self, path):
+    supports_mmap = True
+
+    def __init__(self, path, compression=None):
         self.path = path
+        self.compression = compression_policy(compression)
         try:
             makedirs(path)
         except FileExistsError:
             pass
     @classmethod
     def from_config(cls, config):
-        return cls(config["path"])
+        return cls(config["path"], compression=config.get("compression"))
 
     def clean(self):
         import glob
 
-        print(f"Clean {self}")
+        logger.info("Clean %s", self)
         for f in glob.glob(os.path.join(self.path, "*")):
-            logging.debug(f"Removing cache file {f}")
+            logger.debug("Removing cache file %s", f)
             os.remove(f)
 
     def to_path(self, key, prefix="state_", extension="json"):
@@ -488,6 +547,25 @@ class FileCache(CacheMixin):
         digest = m.hexdigest()
         return os.path.join(self.path, f"{prefix}{digest}.{extension}")
 
+    def data_paths(self, key):
+        "Paths of all the data files for a key (possibly with different extensions)."
+        import glob
+
+        path = self.to_path(key, prefix="data_", extension="")
+        return [p for p in glob.glob(glob.escape(path) + "*") if not p.endswith(".tmp")]
+
+    def data_path(self, key, t):
+        """Path of an existing data file for a key and state type t.
+        File with the default extension of the state type is preferred,
+        but files written with other (legacy) default extensions are recognized as well.
+        Returns None if the data file does not exist.
+        """
+        path = self.to_path(key, prefix="data_", extension=t.default_extension())
+        if os.path.exists(path):
+            return path
+        paths = self.data_paths(key)
+        return paths[0] if len(paths) else None
+
     def encode(self, b):
         return b
 
@@ -509,31 +587,36 @@ class FileCache(CacheMixin):
     def get(self, key):
         metadata = self.get_metadata(key)
         if metadata is None:
-            print(f"(FileCache) Metadata missing: {key}")
+            logger.debug("(FileCache) Metadata missing: %s", key)
             return None
         if metadata.get("status") != "ready":
-            print(f"(FileCache) Not ready {key}; ", metadata.get("status"))
+            logger.debug("(FileCache) Not ready %s; %s", key, metadata.get("status"))
             return None
         state = State()
-        state.metadata = metadata
+        state.metadata = without_compression(metadata)
 
         t = state_types_registry().get(metadata["type_identifier"])
-        path = self.to_path(key, prefix="data_", extension=t.default_extension())
-        if os.path.exists(path):
+        path = self.data_path(key, t)
+        if path is not None:
             try:
-                state.data = t.from_bytes(self.decode(open(path, "rb").read()))
+                if metadata.get(COMPRESSION_KEY) is not None:
+                    b = self.decode(open(path, "rb").read())
+                    state.data = t.from_bytes(decompress(b, metadata))
+                elif self.supports_mmap:
+                    state.data = t.from_file(path)
+                else:
+                    state.data = t.from_bytes(self.decode(open(path, "rb").read()))
                 return state
             except:
-                traceback.print_exc()
-                logging.exception(f"Cache failed to recover {key}")
+                logger.exception("Cache failed to recover %s", key)
                 return None
 
     def _load_metadata(self, state_path):
         if os.path.exists(state_path):
             try:
-                return json.loads(self.decode_metadata(open(state_path, "rb").read()))
+                return json_codec.loads(self.decode_metadata(open(state_path, "rb").read()))
             except:
-                traceback.print_exc()
+                logger.exception("Failed to load cache metadata %s", state_path)
                 return None
         else:
             return None
@@ -545,11 +628,8 @@ class FileCache(CacheMixin):
         metadata = self.get_metadata(key)
         if metadata is None:
             return True
-        if "type_identifier" in metadata:
-            t = state_types_registry().get(metadata["type_identifier"])
-            path = self.to_path(key, prefix="data_", extension=t.default_extension())
-            if os.path.exists(path):
-                os.remove(path)
+        for path in self.data_paths(key):
+            os.remove(path)
 
         state_path = self.to_path(key)
         if os.path.exists(state_path):
@@ -590,27 +670,39 @@ class FileCache(CacheMixin):
             return None
         state.metadata["status"] = "ready"
 
-        if not self.store_metadata(state.metadata):
-            return False
-
         t = state_types_registry().get(state.type_identifier)
         path = self.to_path(
             state.query, prefix="data_", extension=t.default_extension()
         )
-        with open(path, "wb") as f:
-            try:
-                b, mime = t.as_bytes(state.data)
-                f.write(self.encode(b))
-            except NotImplementedError:
-                return False
+        try:
+            b, mime = t.as_bytes(state.data)
+        except NotImplementedError:
+            return False
+        b, metadata = compress(
+            b, state.metadata, self.compression, type_identifier=t.identifier()
+        )
+        if not self._write_metadata(metadata):
+            return False
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.encode(b))
+        os.replace(tmp_path, path)
         return True
 
     def store_metadata(self, metadata):
+        if self.compression is not None:
+            metadata = preserve_compression(
+                metadata, self.get_metadata(metadata["query"])
+            )
+        return self._write_metadata(metadata)
+
+    def _write_metadata(self, metadata):
         try:
             with open(self.to_path(metadata["query"]), "wb") as f:
-                f.write(self.encode_metadata(json.dumps(metadata)))
+                f.write(self.encode_metadata(json_codec.dumps(metadata)))
         except:
-            logging.exception(f"Cache writing error: {metadata['query']}")
+            logger.exception("Cache writing error: %s", metadata['query'])
             return False
         return True
 
@@ -624,33 +716,34 @@ class FileCache(CacheMixin):
 class StoreCache(CacheMixin):
     """Simple cache similar to FileCache, but using a store module instead of a local filesystem."""
 
-    def __init__(self, store, path, flat=False):
+    def __init__(self, store, path, flat=False, compression=None):
         self.storage = store
         self.path = path
         if not self.storage.is_dir(path):
             self.storage.makedir(path)
         self.flat = flat
+        self.compression = compression_policy(compression)
 
     @classmethod
     def from_config(cls, config):
-        return cls(path=config["path"])
+        return cls(path=config["path"], compression=config.get("compression"))
 
     def clean(self):
         import glob
 
-        print(f"Clean {self}")
+        logger.info("Clean %s", self)
         path = "" if self.path in (None, "") else self.path + "/"
         for key in self.storage.keys():
             if not self.storage.is_dir(key) and key.startswith(path):
-                logging.debug(f"Removing cache file {key}")
+                logger.debug("Removing cache file %s", key)
                 self.storage.remove(key)
         for _, key in sorted((-len(k.split("/")), k) for k in self.storage.keys()):
             if self.storage.is_dir(key) and key.startswith(path):
                 try:
-                    logging.debug(f"Removing cache dir {key}")
+                    logger.debug("Removing cache dir %s", key)
                     self.storage.removedir(key)
                 except:
-                    logging.debug(f"Failed to remove cache dir {key}")
+                    logger.debug("Failed to remove cache dir %s", key)
 
     def to_path(self, key, prefix="0state_"):
         "Construct file path from a key and optionally prefix and file extension."
@@ -684,27 +777,25 @@ class StoreCache(CacheMixin):
             raise Exception(f"Unsupported type: {type(s)}")
 
     def get(self, key):
-        print(f"GET {key}")
         metadata = self.get_metadata(key)
-        print(f"  METADATA {metadata}")
         if metadata is None:
-            print(f"(StoreCache) Metadata missing: {key}")
+            logger.debug("(StoreCache) Metadata missing: %s", key)
             return None
         if metadata.get("status") != "ready":
-            print(f"(StoreCache) Not ready {key}; ", metadata.get("status"))
+            logger.debug("(StoreCache) Not ready %s; %s", key, metadata.get("status"))
             return None
         state = State()
-        state.metadata = metadata
+        state.metadata = without_compression(metadata)
 
         t = state_types_registry().get(metadata["type_identifier"])
         path = self.to_path(key)
         if self.storage.contains(path):
             try:
-                state.data = t.from_bytes(self.decode(self.storage.get_bytes(path)))
+                b = self.decode(self.storage.get_bytes(path))
+                state.data = t.from_bytes(decompress(b, metadata))
                 return state
             except:
-                traceback.print_exc()
-                logging.exception(f"Cache failed to recover {key}")
+                logger.exception("Cache failed to recover %s", key)
                 return None
 
     def _load_metadata(self, state_path):
@@ -719,7 +810,7 @@ class StoreCache(CacheMixin):
             self.storage.remove(self.to_path(key))
             return True
         except:
-            traceback.print_exc()
+            logger.debug("Failed to remove %s from cache", key, exc_info=True)
             return False
 
     def contains(self, key):
@@ -745,7 +836,10 @@ class StoreCache(CacheMixin):
         if self.storage.is_supported(path):
             try:
                 b, mime = t.as_bytes(state.data)
-                metadata = dict(**state.metadata)
+                b, metadata = compress(
+                    b, state.metadata, self.compression, type_identifier=t.identifier()
+                )
+                metadata = dict(**metadata)
                 metadata["mimetype"] = mime
                 self.storage.store(path, b, metadata)
                 return True
@@ -757,10 +851,12 @@ class StoreCache(CacheMixin):
         try:
             key = self.to_path(metadata["query"])
             if self.storage.is_supported(key):
+                if self.compression is not None:
+                    metadata = preserve_compression(metadata, self._load_metadata(key))
                 self.storage.store_metadata(key, metadata)
                 return True
         except:
-            logging.exception(f"Cache metadata storing error: {metadata['query']}")
+            logger.exception("Cache metadata storing error: %s", metadata['query'])
             return False
         return False
 
@@ -772,6 +868,8 @@ class StoreCache(CacheMixin):
 
 
 class XORFileCache(FileCache):
+    supports_mmap = False
+
     def __init__(self, path, code):
         super().__init__(path)
         self.code = np.frombuffer(code, dtype=np.uint8)
@@ -791,6 +889,8 @@ class XORFileCache(FileCache):
 
 
 class FernetFileCache(FileCache):
+    supports_mmap = False
+
     def __init__(self, path, fernet_key):
         from cryptography.fernet import Fernet
 
@@ -818,8 +918,10 @@ class SQLCache(CacheMixin):
         state_data_type="BLOB",
         delete_before_insert=False,
         store_metadata_enabled=True,
+        compression=None,
     ):
         self.connection = connection
+        self.compression = compression_policy(compression)
         self.table = table
         self.metadata_type = metadata_type
         self.state_data_type = state_data_type
@@ -836,12 +938,11 @@ class SQLCache(CacheMixin):
                 state_data    {self.state_data_type}
             )
             """
-            print(query)
-            logging.debug(f"CACHE TABLE: {query}")
+            logger.debug("CACHE TABLE: %s", query)
             c = self.connection.cursor()
             c.execute(query)
         except:
-            traceback.print_exc()
+            logger.debug("Cache table %s not created", self.table, exc_info=True)
 
     @classmethod
     def from_sqlite(cls, path=":memory:", table="liquer_cache"):
@@ -865,8 +966,7 @@ class SQLCache(CacheMixin):
             try:
                 self._available_keys = [x[0] for x in c.fetchall()]
             except:
-                traceback.print_exc()
-                print("SQL available_keys failed")
+                logger.exception("SQL available_keys failed")
                 return None
         return self._available_keys
 
@@ -898,20 +998,20 @@ class SQLCache(CacheMixin):
 
         try:
             metadata, data = c.fetchone()
-            metadata = json.loads(metadata)
+            metadata = json_codec.loads(metadata)
             if metadata.get("status") != "ready":
                 return None
         except:
             return None
         try:
             state = State()
-            state = state.from_dict(metadata)
+            state = state.from_dict(without_compression(metadata))
 
             t = state_types_registry().get(state.type_identifier)
-            state.data = t.from_bytes(self.decode(data))
+            state.data = t.from_bytes(decompress(self.decode(data), metadata))
             return state
         except:
-            logging.exception(f"Cache failed to recover {key}")
+            logger.exception("Cache failed to recover %s", key)
             return None
 
     def get_metadata(self, key):
@@ -931,9 +1031,9 @@ class SQLCache(CacheMixin):
         except:
             return None
         try:
-            return json.loads(metadata)
+            return json_codec.loads(metadata)
         except:
-            logging.exception(f"Cache failed to recover metadata {key}")
+            logger.exception("Cache failed to recover metadata %s", key)
             return None
 
     def contains(self, key):
@@ -948,13 +1048,16 @@ class SQLCache(CacheMixin):
         state.metadata["status"] = "ready"
 
         key = state.query
-        metadata = json.dumps(state.as_dict())
 
         t = state_types_registry().get(state.type_identifier)
         try:
             b, mime = t.as_bytes(state.data)
         except NotImplementedError:
             return False
+        b, metadata = compress(
+            b, state.as_dict(), self.compression, type_identifier=t.identifier()
+        )
+        metadata = json_codec.dumps(metadata)
         self._available_keys = None
         if self.delete_before_insert:
             self.connection.execute(f"DELETE FROM {self.table} WHERE query=?", [key])
@@ -968,7 +1071,7 @@ class SQLCache(CacheMixin):
     def store_metadata(self, metadata):
         if self.store_metadata_enabled:
             key = metadata["query"]
-            metadata = json.dumps(metadata)
+            metadata = json_codec.dumps(metadata)
 
             self._available_keys = None
             if self.delete_before_insert:
@@ -1010,6 +1113,7 @@ class SQLStringCache(SQLCache):
         table="liquer_cache",
         text_type="STRING",
         delete_before_insert=False,
+        compression=None,
     ):
         super().__init__(
             connection=connection,
@@ -1017,6 +1121,7 @@ class SQLStringCache(SQLCache):
             metadata_type=text_type,
             state_data_type=text_type,
             delete_before_insert=delete_before_insert,
+            compression=compression,
         )
 
     @classmethod
@@ -32,6 +32,9 @@ from liquer.parser import (
     QueryException,
     ExpandedActionParameter,
 )
+import logging
+
+logger = logging.getLogger(__name__)
 
 CommandMetadata = namedtuple(
     "CommandMetadata",
@@ -128,12 +131,9 @@ class RegisterRemoteMixin:
     def decode_registration(cls, b):
         assert type(b) == bytes
         if b[0] == b"E"[0]:
-            print("DECODE E:", b[:20])
-            print()
+            logger.debug("DECODE E: %r", b[:20])
             b = base64.urlsafe_b64decode(b[1:])
-        print("DECODE B:", b[:20])
-        print()
-        print()
+        logger.debug("DECODE B: %r", b[:20])
         assert b[0] == b"B"[0]
         b = b[1:]
 
@@ -167,7 +167,7 @@ class RemoteCommandRegistry(RegisterRemoteMixin, object):
         if response.ok:
             response = response.json()
             if response["status"] != "OK":
-                print(response.get("traceback", ""))
+                logger.error("Remote traceback:\n%s", response.get("traceback", ""))
                 raise Exception(
                     "Remote registration failed: "
                     + response.get("message", f"Error registering {f.__name__}")
@@ -184,6 +184,8 @@ class CommandRegistry(RegisterRemoteMixin, object):
         self.executables = {}
         self.metadata = {}
         self.namespaces = {}
+        self.generation = 0  # Incremented on every change; used to invalidate cached query plans
+        self._resolved = {}
 
     def is_doubleregistered(self, executable, metadata):
         """Returns True if the same function is already registered as a command.
@@ -230,9 +232,17 @@ class CommandRegistry(RegisterRemoteMixin, object):
         if can_register:
             self.executables[ns][name] = executable
             self.metadata[ns][name] = metadata
+            self.changed()
         else:
             raise Exception(f"Command {name} is already registered")
 
+    def changed(self):
+        """Invalidate cached command resolutions and query plans.
+        Called automatically when a command is registered.
+        """
+        self.generation += 1
+        self._resolved = {}
+
     def as_dict(self):
         """Returns dictionary representation of the registry, safe to serialize as json"""
         return {
@@ -246,7 +256,7 @@ class CommandRegistry(RegisterRemoteMixin, object):
         command_name = qcommand[0]
         ns, command, metadata = self.resolve_command(state, command_name)
         if command is None:
-            print(f"Unknown command: {command_name}")
+            logger.debug("Unknown command: %s", command_name)
             return state.with_data(None).log_error(
                 message=f"Unknown command: {command_name}"
             )
@@ -254,7 +264,7 @@ class CommandRegistry(RegisterRemoteMixin, object):
             try:
                 state = command(state, *qcommand[1:])
             except Exception as e:
-                traceback.print_exc()
+                logger.debug("Command %s failed", command_name, exc_info=True)
                 state.log_exception(message=str(e), traceback=traceback.format_exc())
                 state.exception = e
         arguments = getattr(state, "arguments", None)
@@ -280,9 +290,21 @@ class CommandRegistry(RegisterRemoteMixin, object):
         return state
 
     def resolve_command(self, state, command_name):
-        for ns in state.vars.get("active_namespaces", ["root"]):
+        """Find the command in the active namespaces of the state.
+        Returns a tuple (namespace, executable, metadata), (None, None, None) if the command is not found.
+        Resolutions are cached until the registry changes.
+        """
+        key = (tuple(state.vars.get("active_namespaces", ["root"])), command_name)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            resolved = self._resolve_command(key[0], command_name)
+            self._resolved[key] = resolved
+        return resolved
+
+    def _resolve_command(self, namespaces, command_name):
+        for ns in namespaces:
             if ns not in self.executables:
-                print(f"Unknown namespace: {ns}")
+                logger.warning("Unknown namespace: %s", ns)
                 continue
             if command_name in self.executables[ns]:
                 break
@@ -292,7 +314,7 @@ class CommandRegistry(RegisterRemoteMixin, object):
             if command_name in self.metadata[ns]:
                 return ns, command, self.metadata[ns][command_name]
             else:
-                print(f"Unknown command (metadata): {command_name}")
+                logger.warning("Unknown command (metadata): %s", command_name)
                 return ns, command, None
 
         return None, None, None
@@ -760,6 +782,26 @@ def argument_parser_from_command_metadata(command_metadata):
     return ap
 
 
+def command_is_pure(metadata):
+    """True if the command (described by the command metadata) is declared as pure,
+    i.e. it does not modify its input and returns newly created data (or the input unchanged).
+    """
+    if metadata is None:
+        return False
+    return bool(metadata.attributes.get("pure", False))
+
+
+def command_mutates_input(metadata):
+    """True if the command (described by the command metadata) may modify its input data in place.
+    Unless the command declares pure=True or mutates_input=False, it is assumed to modify the input.
+    """
+    if metadata is None:
+        return True
+    return bool(
+        metadata.attributes.get("mutates_input", not command_is_pure(metadata))
+    )
+
+
 class CommandExecutable(object):
     """Wrapper around a registered command
     Adapts arbitrary function to be used as a command.
@@ -834,6 +876,10 @@ class CommandExecutable(object):
 
     def __call__(self, state, *args, context=None, **kwargs):
         argv, argmeta = self.parse_argv(args, kwargs=kwargs, context=context)
+        return self.execute(state, argv, argmeta)
+
+    def execute(self, state, argv, argmeta):
+        """Execute the command with already parsed arguments (see parse_argv)"""
         state_arg = state if self.metadata.state_argument["pass_state"] else state.get()
         result = self.f(state_arg, *argv)
         if isinstance(result, State):
@@ -847,8 +893,7 @@ class CommandExecutable(object):
 class FirstCommandExecutable(CommandExecutable):
     """Wrapper around a registered first command"""
 
-    def __call__(self, state, *args, context=None, **kwargs):
-        argv, argmeta = self.parse_argv(args, kwargs=kwargs, context=context)
+    def execute(self, state, argv, argmeta):
         result = self.f(*argv)
         if isinstance(result, State):
             result.arguments = argmeta
@@ -865,6 +910,11 @@ def command(*arg, **kwarg):
     This function typically can be used as a decorator.
     As a decorator it can be used directly (@command) or it can have parameters,
     e.g. @command(ns="MyNameSpace")
+
+    Commands can declare how they treat the input data, which allows to skip copying of the input:
+    - pure=True - the command does not modify the input and returns either newly created data
+      or the input unchanged,
+    - mutates_input=True - the command may modify the input in place (this is assumed by default).
     """
     if len(arg) == 1:
         assert callable(arg[0])
@@ -0,0 +1,409 @@
+"""
+Compression of cache and store payloads.
+
+Compression codecs are registered by name (gzip, bz2, lzma are always available,
+zstd and lz4 require the optional zstandard and lz4 packages).
+A CompressionPolicy selects a codec for a payload based on the state type identifier,
+the file extension and the payload size.
+The name of the codec used is recorded in the metadata (under the "compression" key),
+so the payload can be decoded transparently.
+
+Codecs support both compression of a complete payload (compress, decompress)
+and streaming compression (open), which is used for large blobs (e.g. Store.openbin).
+"""
+import io
+import logging
+import shutil
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_KEY = "compression"
+
+DEFAULT_SKIP_EXTENSIONS = {
+    "gz",
+    "bz2",
+    "xz",
+    "zst",
+    "lz4",
+    "zip",
+    "7z",
+    "png",
+    "jpg",
+    "jpeg",
+    "gif",
+    "webp",
+    "mp3",
+    "mp4",
+    "parquet",
+    "xlsx",
+    "docx",
+    "pptx",
+}
+
+_codecs = {}
+
+
+class CompressionException(Exception):
+    pass
+
+
+class Codec(object):
+    """Abstract compression codec"""
+
+    name = None
+
+    def is_available(self):
+        """Returns true if the codec can be used (i.e. the required package is installed)"""
+        return True
+
+    def compress(self, b: bytes) -> bytes:
+        raise NotImplementedError("Codec must define compress")
+
+    def decompress(self, b: bytes) -> bytes:
+        raise NotImplementedError("Codec must define decompress")
+
+    def open(self, fileobj, mode="rb"):
+        """Wrap a binary file object into a (de)compressing stream.
+        Closing the returned stream finishes the compression, but does not close fileobj.
+        """
+        raise NotImplementedError("Codec must define open")
+
+    def compress_stream(self, source, target, chunk_size=1024 * 1024):
+        """Compress all data from a source file object into a target file object"""
+        with self.open(target, "wb") as f:
+            shutil.copyfileobj(source, f, chunk_size)
+
+    def decompress_stream(self, source, target, chunk_size=1024 * 1024):
+        """Decompress all data from a source file object into a target file object"""
+        with self.open(source, "rb") as f:
+            shutil.copyfileobj(f, target, chunk_size)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+class GzipCodec(Codec):
+    name = "gzip"
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def compress(self, b):
+        import gzip
+
+        return gzip.compress(b, compresslevel=self.level, mtime=0)
+
+    def decompress(self, b):
+        import gzip
+
+        return gzip.decompress(b)
+
+    def open(self, fileobj, mode="rb"):
+        import gzip
+
+        return gzip.GzipFile(
+            fileobj=fileobj, mode=mode, compresslevel=self.level, mtime=0
+        )
+
+
+class Bz2Codec(Codec):
+    name = "bz2"
+
+    def compress(self, b):
+        import bz2
+
+        return bz2.compress(b)
+
+    def decompress(self, b):
+        import bz2
+
+        return bz2.decompress(b)
+
+    def open(self, fileobj, mode="rb"):
+        import bz2
+
+        return bz2.BZ2File(fileobj, mode=mode)
+
+
+class LzmaCodec(Codec):
+    name = "lzma"
+
+    def compress(self, b):
+        import lzma
+
+        return lzma.compress(b)
+
+    def decompress(self, b):
+        import lzma
+
+        return lzma.decompress(b)
+
+    def open(self, fileobj, mode="rb"):
+        import lzma
+
+        return lzma.LZMAFile(fileobj, mode=mode)
+
+
+class ZstdCodec(Codec):
+    """Zstandard codec, requires the zstandard package"""
+
+    name = "zstd"
+
+    def __init__(self, level=3):
+        self.level = level
+
+    def is_available(self):
+        try:
+            import zstandard
+
+            return True
+        except ImportError:
+            return False
+
+    def compress(self, b):
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=self.level).compress(b)
+
+    def decompress(self, b):
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompressobj().decompress(b)
+
+    def open(self, fileobj, mode="rb"):
+        import zstandard
+
+        if "w" in mode:
+            return zstandard.ZstdCompressor(level=self.level).stream_writer(
+                fileobj, closefd=False
+            )
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=False)
+
+
+class Lz4Codec(Codec):
+    """LZ4 frame codec, requires the lz4 package"""
+
+    name = "lz4"
+
+    def is_available(self):
+        try:
+            import lz4.frame
+
+            return True
+        except ImportError:
+            return False
+
+    def compress(self, b):
+        import lz4.frame
+
+        return lz4.frame.compress(b)
+
+    def decompress(self, b):
+        import lz4.frame
+
+        return lz4.frame.decompress(b)
+
+    def open(self, fileobj, mode="rb"):
+        import lz4.frame
+
+        return lz4.frame.LZ4FrameFile(fileobj, mode=mode)
+
+
+def register_codec(codec):
+    """Register a compression codec under its name"""
+    _codecs[codec.name] = codec
+
+
+def available_codecs():
+    """List of names of the codecs that can be used"""
+    return [name for name, codec in _codecs.items() if codec.is_available()]
+
+
+def best_codec_name():
+    """Name of the preferred available codec: zstd, lz4 or gzip (in this order)"""
+    for name in ("zstd", "lz4", "gzip"):
+        if name in _codecs and _codecs[name].is_available():
+            return name
+    return "gzip"
+
+
+def get_codec(name):
+    """Get a codec by name; "auto" selects the best available codec (see best_codec_name)"""
+    if name == "auto":
+        name = best_codec_name()
+    if name not in _codecs:
+        raise CompressionException(f"Unknown compression codec: {name}")
+    codec = _codecs[name]
+    if not codec.is_available():
+        raise CompressionException(
+            f"Compression codec {name} is not available (package missing)"
+        )
+    return codec
+
+
+register_codec(GzipCodec())
+register_codec(Bz2Codec())
+register_codec(LzmaCodec())
+register_codec(ZstdCodec())
+register_codec(Lz4Codec())
+
+
+class CompressionPolicy(object):
+    """Selects a compression codec for a payload.
+
+    The codec is selected
+    - by the state type identifier (type_codecs, e.g. dict(dataframe=None, text="gzip")),
+    - by the file extension (extension_codecs),
+    - otherwise the default codec is used, unless the extension is in skip_extensions
+      (already compressed formats).
+    None as a codec name disables the compression.
+    Payloads smaller than min_size are not compressed.
+    """
+
+    def __init__(
+        self,
+        codec="auto",
+        min_size=1024,
+        type_codecs=None,
+        extension_codecs=None,
+        skip_extensions=None,
+    ):
+        self.codec = codec
+        self.min_size = min_size
+        self.type_codecs = dict(type_codecs or {})
+        self.extension_codecs = dict(extension_codecs or {})
+        self.skip_extensions = set(
+            DEFAULT_SKIP_EXTENSIONS if skip_extensions is None else skip_extensions
+        )
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            codec=config.get("codec", "auto"),
+            min_size=config.get("min_size", 1024),
+            type_codecs=config.get("type_codecs"),
+            extension_codecs=config.get("extension_codecs"),
+            skip_extensions=config.get("skip_extensions"),
+        )
+
+    def select(self, size, type_identifier=None, extension=None):
+        """Return the name of the codec to be used or None if the payload should not be compressed"""
+        if type_identifier in self.type_codecs:
+            name = self.type_codecs[type_identifier]
+        elif extension in self.extension_codecs:
+            name = self.extension_codecs[extension]
+        elif extension in self.skip_extensions:
+            return None
+        else:
+            name = self.codec
+        if name is None or size < self.min_size:
+            return None
+        if name == "auto":
+            name = best_codec_name()
+        return name
+
+    def __repr__(self):
+        return f"CompressionPolicy(codec={repr(self.codec)}, min_size={self.min_size})"
+
+
+def compression_policy(spec):
+    """Create a compression policy from a specification:
+    None (no compression), codec name, dictionary (see CompressionPolicy.from_config)
+    or a CompressionPolicy instance.
+    """
+    if spec is None or isinstance(spec, CompressionPolicy):
+        return spec
+    if isinstance(spec, str):
+        return CompressionPolicy(codec=spec)
+    if isinstance(spec, dict):
+        return CompressionPolicy.from_config(spec)
+    raise CompressionException(f"Unsupported compression specification: {spec}")
+
+
+def compress(b, metadata, policy, type_identifier=None, extension=None):
+    """Compress bytes according to the policy.
+    Returns a tuple of (possibly) compressed bytes and metadata (a copy)
+    with the codec name recorded under the "compression" key (None if not compressed).
+    If the compression does not reduce the size, the original bytes are kept.
+    If the policy is None, bytes and metadata are returned unchanged.
+    """
+    if policy is None:
+        return b, metadata
+    metadata = dict(metadata)
+    metadata[COMPRESSION_KEY] = None
+    name = policy.select(len(b), type_identifier=type_identifier, extension=extension)
+    if name is None:
+        return b, metadata
+    compressed = get_codec(name).compress(b)
+    if len(compressed) >= len(b):
+        return b, metadata
+    logger.debug("Compressed %d to %d bytes with %s", len(b), len(compressed), name)
+    metadata[COMPRESSION_KEY] = name
+    return compressed, metadata
+
+
+def decompress(b, metadata):
+    """Decompress bytes compressed by the codec recorded in the metadata"""
+    name = None if metadata is None else metadata.get(COMPRESSION_KEY)
+    if name is None or b is None:
+        return b
+    return get_codec(name).decompress(b)
+
+
+def without_compression(metadata):
+    """Metadata without the compression record - e.g. metadata of a decompressed state"""
+    if metadata is None or COMPRESSION_KEY not in metadata:
+        return metadata
+    return {k: v for k, v in metadata.items() if k != COMPRESSION_KEY}
+
+
+def preserve_compression(metadata, old_metadata):
+    """Carry the compression record from the metadata of already stored data
+    into new metadata (e.g. when only the metadata are updated).
+    """
+    if COMPRESSION_KEY in metadata or old_metadata is None:
+        return metadata
+    if old_metadata.get(COMPRESSION_KEY) is None:
+        return metadata
+    metadata = dict(metadata)
+    metadata[COMPRESSION_KEY] = old_metadata[COMPRESSION_KEY]
+    return metadata
+
+
+class ClosingStream(io.RawIOBase):
+    """Compressed stream which on close closes both the codec stream and the underlying file object.
+    Optional on_close callback is called after closing.
+    """
+
+    def __init__(self, stream, fileobj, on_close=None):
+        self.stream = stream
+        self.fileobj = fileobj
+        self.on_close = on_close
+
+    def readable(self):
+        return self.stream.readable()
+
+    def writable(self):
+        return self.stream.writable()
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def readinto(self, b):
+        data = self.stream.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+    def write(self, b):
+        return self.stream.write(b)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.stream.close()
+            self.fileobj.close()
+        finally:
+            super().close()
+        if self.on_close is not None:
+            self.on_close()
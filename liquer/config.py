@@ -107,7 +107,8 @@ async def run_tornado(port=5000, index_link="index"):
         + [
             (r"/", IndexHandler),
             (r"/index.html", IndexHandler),
-        ]
+        ],
+        compress_response=True,
     )
 
     application.listen(port)
@@ -193,6 +194,7 @@ setup:
     server_type:       {"flask":<35} # Server type (flask, tornado, FastAPI ...)
     url_prefix:        {'"/liquer"':<35} # URL prefix for the server
     port:              {5000:<35} # Server port
+    profiling_enabled: {"false":<35} # Allow profiling by the _profile URL parameter
     index_link:        {"/liquer/q/index/index.html":<35} # Index query
 """
 
@@ -201,6 +203,8 @@ setup:
         If worker_environment is True, then initialize specifically the worker environment,
         i.e. the worker pool should not be initialized.
         """
+        self.initialize_logging(config)
+        self.initialize_profiling(config)
         self.load_modules(config)
         self.initialize_cache(config)
         self.initialize_store(config)
@@ -214,6 +218,27 @@ setup:
             raise Exception("No setup section in configuration")
         return config["setup"].get(name, default)
 
+    def initialize_logging(self, config):
+        """Initialize logging from configuration.
+        Log levels per module are taken from config["setup"]["log_levels"] (dictionary module -> level),
+        config["setup"]["debug_buffer"] (if specified) is the capacity of the ring buffer for debug entries.
+        """
+        from liquer.logs import set_log_levels, enable_debug_buffer
+
+        capacity = self.get_setup_parameter(config, "debug_buffer")
+        if capacity:
+            logger.info("Collecting debug entries in a ring buffer (capacity %s)", capacity)
+            enable_debug_buffer(int(capacity))
+        set_log_levels(self.get_setup_parameter(config, "log_levels", None) or {})
+
+    def initialize_profiling(self, config):
+        """Allow profiling of queries by the _profile URL parameter
+        if config["setup"]["profiling_enabled"] is true (default is false).
+        """
+        from liquer.profiling import enable_profiling
+
+        enable_profiling(self.get_setup_parameter(config, "profiling_enabled", False))
+
     def load_modules(self, config):
         """Load modules scpecified in the configuration
         List of modules is taken from config["setup"]["modules"]
@@ -277,6 +302,10 @@ setup:
         import liquer.cache
         import liquer.store
 
+        liquer.pool.set_worker_modules(
+            self.get_setup_parameter(config, "modules", self.modules)
+        )
+
         cache_concurrency = self.get_setup_parameter(config, "cache_concurrency")
         if cache_concurrency in ["off", "none", "no", None, False]:
             logger.info(f"Cache not configured for concurrency")
@@ -362,7 +391,10 @@ setup:
             import fastapi
             import fastapi.responses
 
+            from fastapi.middleware.gzip import GZipMiddleware
+
             app = fastapi.FastAPI()
+            app.add_middleware(GZipMiddleware, minimum_size=1024)
 
             # CORS - used to support e.g. integration of Godot web-applications 
             @app.middleware("http")
@@ -429,6 +461,7 @@ setup:
     server_type:       {"flask":<35} # Server type (flask, tornado, FastAPI ...)
     url_prefix:        {'"/liquer"':<35} # URL prefix for the server
     port:              {5000:<35} # Server port
+    profiling_enabled: {"false":<35} # Allow profiling by the _profile URL parameter
     index_query:       {"/liquer/web/gui":<35} # Index query
 """
     @classmethod
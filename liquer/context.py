@@ -31,8 +31,12 @@ from liquer.parser import (
     ExpandedActionParameter,
     LinkActionParameter,
 )
-from liquer.cache import NoCache, cached_part, get_cache
-from liquer.commands import command_registry
+from liquer.cache import NoCache, cached_part, get_cache, RefreshCache
+from liquer.commands import (
+    command_registry,
+    command_is_pure,
+    command_mutates_input,
+)
 from liquer.state_types import (
     encode_state_data,
     state_types_registry,
@@ -46,7 +50,22 @@ from liquer.constants import Status, mimetype_from_extension
 import liquer.util as util
 from liquer.util import timestamp
 from copy import deepcopy
-from liquer.metadata import Metadata
+from liquer.metadata import Metadata, copy_metadata
+from liquer.plan import query_planner
+from liquer.profiling import SamplingProfiler, is_profiling, PROFILE_KEY
+from liquer.instrumentation import (
+    Timer,
+    PARSE,
+    CACHE_GET,
+    PREDECESSOR,
+    ARGUMENTS,
+    COMMAND,
+    SERIALIZATION,
+    CACHE_STORE,
+    STORE_METADATA,
+    INDEX,
+)
+from liquer.dependencies import Dependencies
 from liquer.indexer import index, NullIndexer
 import logging
 
@@ -147,7 +166,7 @@ class MetadataContextMixin:
             if self.raw_query is None:
                 title = ""
             else:
-                p = parse(self.raw_query)
+                p = parse(self.raw_query) if self.query is None else self.query
                 if title in ("", None):
                     title = p.filename() or ""
 
@@ -183,7 +202,7 @@ class MetadataContextMixin:
                 direct_subqueries=self.direct_subqueries[:],
                 progress_indicators=self.progress_indicators[:],
                 child_progress_indicators=self.child_progress_indicators[:],
-                child_log=self.child_log,
+                child_log=self.child_log[:],
                 message=message,
                 started=self.started,
                 updated=self.now(),
@@ -192,10 +211,20 @@ class MetadataContextMixin:
                 vars=dict(self.vars),
                 html_preview=self.html_preview,
                 side_effect=False,
+                timings=dict(self.timings),
             )
         )
+        profile = getattr(self, "profile", None)
+        if profile is not None:
+            metadata[PROFILE_KEY] = profile
         return metadata
 
+    def timer(self, phase, query=None):
+        """Context manager measuring the time spent in an evaluation phase (see liquer.instrumentation).
+        The timing is attributed to the query (by default the query evaluated by the context).
+        """
+        return Timer(self.timings, phase, self.raw_query if query is None else query)
+
     def log_dict(self, d):
         "Put dictionary with a log entry into the log"
         d["timestamp"] = timestamp()
@@ -222,7 +251,7 @@ class MetadataContextMixin:
             logger.error(message)
         else:
             #print(f"{log_time()} ERROR:    ", message, f" at {position}")
-            logger.error(f"{message} at {position}")
+            logger.error("%s at %s", message, position)
         return self.log_dict(
             dict(
                 kind="error",
@@ -247,9 +276,9 @@ class MetadataContextMixin:
             #print(f"{log_time()} EXCEPTION:", message)
             logger.error(message)
         else:
-            logger.error(f"{message} at {position}")
+            logger.error("%s at %s", message, position)
             #print(f"{log_time()} EXCEPTION:", message, f" at {position}")
-        logger.error("TRACEBACK:\n%s"%traceback)
+        logger.error("TRACEBACK:\n%s", traceback)
         return self.log_dict(
             dict(
                 kind="error",
@@ -267,12 +296,18 @@ class MetadataContextMixin:
         self.log_dict(dict(kind="info", message=message))
         return self
 
-    def debug(self, message):
-        """Log a message (info)"""
+    def debug(self, message, *args):
+        """Log a debug message.
+        The message can be a %-format string with args; it is formatted only if the debug message is recorded
+        (debug_messages enabled or the liquer.context logger enabled for DEBUG).
+        """
+        if not self.debug_messages:
+            logger.debug(message, *args)
+            return self
+        if args:
+            message = message % args
         logger.debug(message)
-        if self.debug_messages:
-            #print(f"{log_time()} DEBUG:    ", message)
-            self.log_dict(dict(kind="debug", message=message))
+        self.log_dict(dict(kind="debug", message=message))
         return self
 
     @property
@@ -338,6 +373,8 @@ class Context(MetadataContextMixin, object):
         self.store_to = None
 
         self._metadata = Metadata()
+        self.timings = {}  # time spent in the evaluation phases (see liquer.instrumentation)
+        self.profile = None  # profile of the evaluation (see liquer.profiling)
         self.cwd_key=None
         self.evaluated_key=None
 
@@ -363,7 +400,7 @@ class Context(MetadataContextMixin, object):
             metadata["mimetype"] = mimetype
             store.store(key, b, metadata)
         except:
-            traceback.print_exc()
+            logger.exception("Failed to store %s", key)
             m = Metadata(metadata)
             m.status = Status.ERROR
             m.exception(
@@ -377,15 +414,18 @@ class Context(MetadataContextMixin, object):
         return index
 
     def index_state(self, state):
-        """Call indexer on the state object."""
+        """Call indexer on the state object.
+        This is the last step of the evaluation, lazy data characteristics are materialized.
+        """
         indexer = self.indexer()
         if not state.is_error:
-            metadata = indexer(
-                query=state.query, data=state.data, metadata=state.metadata
-            )
+            with self.timer(INDEX):
+                metadata = indexer(
+                    query=state.query, data=state.data, metadata=state.metadata
+                )
             if metadata is not None:
                 state.metadata = metadata
-        return state
+        return state.materialize_data_characteristics()
 
     def can_report(self):
         if self.last_report_time is None:
@@ -435,12 +475,13 @@ class Context(MetadataContextMixin, object):
     def store_metadata(self, force=False):
         if self.raw_query is not None and self.enable_store_metadata:
             if force or self.can_report():
-                metadata = self.metadata()
-                self.cache().store_metadata(self.metadata())
-                self.last_report_time = datetime.now()
-                if self.store_key is not None:
-                    store = self.store() if self.store_to is None else self.store_to
-                    store.store_metadata(self.store_key, metadata)
+                with self.timer(STORE_METADATA):
+                    metadata = self.metadata()
+                    self.cache().store_metadata(metadata)
+                    self.last_report_time = datetime.now()
+                    if self.store_key is not None:
+                        store = self.store() if self.store_to is None else self.store_to
+                        store.store_metadata(self.store_key, copy_metadata(metadata))
 
     def new_progress_indicator(self):
         self._progress_indicator_identifier += 1
@@ -598,7 +639,7 @@ class Context(MetadataContextMixin, object):
                         query=p.link.encode(),
                     )
                 )
-                self.debug(f"Expand absolute link parameter {p.link.encode()}")
+                self.debug("Expand absolute link parameter %s", p.link.encode())
                 value = self.evaluate(p.link)
                 if value.is_error:
                     self.error(
@@ -614,6 +655,7 @@ class Context(MetadataContextMixin, object):
                         position=p.position,
                         query=self.raw_query,
                     )
+                self._metadata.merge_dependencies(value.metadata.get("dependencies"))
                 pp = ExpandedActionParameter(value.get(), p.link, p.position)
                 return pp
             else:
@@ -624,7 +666,9 @@ class Context(MetadataContextMixin, object):
                     )
                 )
                 self.debug(
-                    f"Expand relative link parameter {p.link.encode()} on {self.parent_query}"
+                    "Expand relative link parameter %s on %s",
+                    p.link.encode(),
+                    self.parent_query,
                 )
                 value = self.apply(p.link)
                 if value.is_error:
@@ -641,6 +685,7 @@ class Context(MetadataContextMixin, object):
                         position=p.position,
                         query=self.raw_query,
                     )
+                self._metadata.merge_dependencies(value.metadata.get("dependencies"))
                 pp = ExpandedActionParameter(value.get(), p.link, p.position)
                 return pp
         else:
@@ -652,8 +697,16 @@ class Context(MetadataContextMixin, object):
                 query=self.raw_query,
             )
 
-    def evaluate_action(self, state: State, action, extra_parameters=None, cache=None):
-        self.debug(f"EVALUATE ACTION '{action}' on '{state.query}'")
+    def evaluate_action(
+        self, state: State, action, extra_parameters=None, cache=None, exclusive=False
+    ):
+        """Evaluate action on a state, returns a new state.
+        The input data are copied if the command may modify them, unless exclusive is True.
+        Exclusive should be set only by Context.evaluate for states it produced itself
+        (the data are not referenced outside of the evaluation); states held by the caller
+        are never modified.
+        """
+        self.debug("EVALUATE ACTION '%s' on '%s'", action, state.query)
         self.status = Status.EVALUATION
         self.store_metadata(force=True)
         cache = cache or self.cache()
@@ -668,13 +721,23 @@ class Context(MetadataContextMixin, object):
             assert action.is_action_request()
             action = action.query[0]
 
+        plan = query_planner().action_plan(cr, state, action)
+        ns, command, cmd_metadata = plan.ns, plan.command, plan.command_metadata
+
         is_volatile = state.is_volatile()
-        old_state = state if is_volatile else state.clone()
+        input_exclusive = exclusive
+        if is_volatile:
+            old_state = state
+        elif input_exclusive or not command_mutates_input(cmd_metadata):
+            # The input data is not shared or the command does not modify it - no need to copy
+            old_state = state.shallow_clone()
+        else:
+            old_state = state.clone()
+            input_exclusive = True
+        input_data = old_state.data
 
         state = state.next_state()
         state.context = self
-
-        ns, command, cmd_metadata = cr.resolve_command(state, action.name)
         if command is None:
             self.error(
                 f"Unknown action: '{action.name}'",
@@ -683,11 +746,13 @@ class Context(MetadataContextMixin, object):
             )
         else:
             self._metadata.add_command_dependency(ns, cmd_metadata)
+            self._metadata.merge_dependencies(old_state.metadata.get("dependencies"))
             parameters = []
             self.status = Status.EVALUATING_DEPENDENCIES
             self.store_metadata(force=True)
-            for p in action.parameters:
-                parameters.append(self.evaluate_parameter(p, action))
+            with self.timer(ARGUMENTS):
+                for p in action.parameters:
+                    parameters.append(self.evaluate_parameter(p, action))
             if extra_parameters is not None and len(extra_parameters) > 0:
                 if type(extra_parameters) == list:
                     self.warning(f"Using {len(extra_parameters)} extra parameters")
@@ -708,18 +773,33 @@ class Context(MetadataContextMixin, object):
             self.store_metadata(force=True)
 
             try:
-
-                state = command(
-                    old_state, *parameters, context=self, **extra_parameters_dict
-                )
+                if plan.is_compiled() and not extra_parameters:
+                    with self.timer(ARGUMENTS):
+                        argv, argmeta = plan.arguments(context=self)
+                elif hasattr(command, "parse_argv"):
+                    with self.timer(ARGUMENTS):
+                        argv, argmeta = command.parse_argv(
+                            parameters, kwargs=extra_parameters_dict, context=self
+                        )
+                else:
+                    argv = None
+                with self.timer(COMMAND):
+                    if argv is None:
+                        state = command(
+                            old_state, *parameters, context=self, **extra_parameters_dict
+                        )
+                    else:
+                        state = command.execute(old_state, argv, argmeta)
                 assert type(state.metadata) is dict
+                if state.data is input_data:
+                    state.exclusive = input_exclusive
+                else:
+                    state.exclusive = command_is_pure(cmd_metadata)
             except EvaluationException as ee:
-                print("EE:", ee)
-                # traceback.print_exc()
+                logger.debug("Evaluation exception: %s", ee)
                 state.is_error = True
                 state.exception = ee
             except Exception as e:
-                traceback.print_exc()
                 state.is_error = True
                 self.exception(
                     message=str(e),
@@ -749,24 +829,20 @@ class Context(MetadataContextMixin, object):
 
         metadata = self.metadata()
         metadata["type_identifier"] = state.type_identifier
-        metadata["commands"] = metadata.get("commands", []) + [action.to_list()]
+        metadata["commands"] = metadata.get("commands", []) + [list(plan.qcommand)]
         if (
             metadata.get("mimetype", "application/octet-stream")
             == "application/octet-stream"
         ):
             metadata["mimetype"] = state.mimetype()
 
-        try:
-            cmd_metadata_d = cmd_metadata._asdict()
-        except:
-            cmd_metadata_d = {}
         metadata["extended_commands"] = metadata.get("extended_commands", []) + [
             dict(
                 command_name=action.name,
                 ns=ns,
-                qcommand=action.to_list(),
-                action=f"{action.encode()} at {action.position}",
-                command_metadata=cmd_metadata_d,
+                qcommand=list(plan.qcommand),
+                action=plan.action_description,
+                command_metadata=plan.command_metadata_dict,
                 arguments=arguments,
             )
         ]
@@ -790,14 +866,14 @@ class Context(MetadataContextMixin, object):
         if is_error:
             self.status = Status.ERROR
             metadata["status"] = self.status.value
-            self.info(f"Action {action.encode()} at {action.position} failed")
+            self.info(f"Action {plan.action_description} failed")
             state.metadata.update(metadata)
             state.status = Status.ERROR.value
             state.is_error = True
         else:
             self.status = Status.READY
             metadata["status"] = self.status.value
-            self.info(f"Action {action.encode()} at {action.position} completed")
+            self.info(f"Action {plan.action_description} completed")
             state_vars = dict(self.vars)
             state_vars.update(state.vars)
             state_vars.update(self.vars.get_modified())
@@ -845,11 +921,12 @@ class Context(MetadataContextMixin, object):
                 else:
                     state.error(f"Metadata for key '{key}' not found in store")
 
-            if (
+            is_meta = (
                 resource_query.header is not None
                 and len(resource_query.header.parameters) > 0
                 and resource_query.header.parameters[-1].encode() == "meta"
-            ):
+            )
+            if is_meta:
                 self.info(f"Resource metadata query {resource_query}")
                 data = metadata
                 metadata = dict(
@@ -874,6 +951,10 @@ class Context(MetadataContextMixin, object):
 
             state = state.with_data(data)
             state.metadata["resource_metadata"] = metadata
+            dependencies = Dependencies(dict(query=resource_query.encode()))
+            if metadata is not None and data is not None and not is_meta:
+                dependencies.add_resource_dependency(key, metadata)
+            state.metadata["dependencies"] = dependencies.as_dict()
         except:
             if "log" not in state.metadata:
                 state.metadata["log"] = []
@@ -886,7 +967,6 @@ class Context(MetadataContextMixin, object):
                 position=resource_query.position,
                 query=resource_query.encode(),
             )
-            traceback.print_exc()
         return state
 
     def create_initial_state(self, input_value=None):
@@ -908,21 +988,21 @@ class Context(MetadataContextMixin, object):
         if query is None:
             return "", Query()
         if isinstance(query, str):
-            return query, parse(query)
+            return query, query_planner().parse(query)
         elif isinstance(query, Query):
             return query.encode(), query
         else:
             raise Exception(f"Unsupported query type: {type(query)}")
 
     def apply(self, query, description=None):
-        self.debug(f"APPLY {query}")
+        self.debug("APPLY %s", query)
         if self.parent_query in (None, "", "/"):
-            self.debug(f"  no parent query in apply {query}")
+            self.debug("  no parent query in apply %s", query)
             return self.evaluate(query, description=description)
         if isinstance(query, str):
             query = parse(query)
         if query.absolute:
-            self.debug(f"  absolute link in apply {query}")
+            self.debug("  absolute link in apply %s", query)
             return self.evaluate(query, description=description)
         tq = query.transform_query()
         if tq is None:
@@ -930,7 +1010,7 @@ class Context(MetadataContextMixin, object):
                 f"Only transform query supported in apply ({query} on {self.parent_query})"
             )
         q = (parse(self.parent_query) + tq).encode()
-        self.debug(f"apply {query} on {self.parent_query} yields {q}")
+        self.debug("apply %s on %s yields %s", query, self.parent_query, q)
         return self.evaluate(q, description=description)
 
     def _store_state(self, state):
@@ -944,15 +1024,16 @@ class Context(MetadataContextMixin, object):
                 reg = self.state_types_registry()
                 t = reg.get(type(data))
                 try:
-                    if state.metadata.get("extension") is None:
-                        b, mime, typeid = encode_state_data(data)
-                    else:
-                        b, mime, typeid = encode_state_data(
-                            data, extension=state.metadata["extension"]
-                        )
+                    with self.timer(SERIALIZATION):
+                        if state.metadata.get("extension") is None:
+                            b, mime, typeid = encode_state_data(data)
+                        else:
+                            b, mime, typeid = encode_state_data(
+                                data, extension=state.metadata["extension"]
+                            )
                     store.store(self.store_key, b, metadata)
                 except:
-                    traceback.print_exc()
+                    logger.exception("Failed to store %s", self.store_key)
                     m = Metadata(metadata)
                     m.status = Status.ERROR
                     m.exception(
@@ -971,6 +1052,7 @@ class Context(MetadataContextMixin, object):
         extra_parameters=None,
         input_value=None,
         input_value_specified=False,
+        profile=None,
     ):
         """Evaluate query, returns a State.
         This method can be used in a command to evaluate a subquery,
@@ -988,10 +1070,15 @@ class Context(MetadataContextMixin, object):
         This effectively renders the evaluation volatile. Note that the action needs correct amount of parameters.
 
         The input_value parameter can be used to specify the input value for the first action.
+
+        If profile is True (or None and the "profile" state variable is set), the evaluation runs
+        under a sampling profiler (see liquer.profiling) and the collapsed-stack profile is recorded
+        in the metadata under the "profile" key. The query and its predecessors are re-evaluated
+        (cached results are not used, but the new results are cached).
         """
         self.enable_store_metadata = False  # Prevents overwriting cache with metadata
         self.status = Status.EVALUATION
-        self.debug(f"EVALUATE {query} ")
+        self.debug("EVALUATE %s ", query)
 
         self.vars = Vars(vars_clone())
 
@@ -1000,7 +1087,7 @@ class Context(MetadataContextMixin, object):
 
         if self.query is not None:
             self.enable_store_metadata = True
-            self.debug(f"Subquery {query} called from {self.query.encode()}")
+            self.debug("Subquery %s called from %s", query, self.query.encode())
             state = self.child_context().evaluate(
                 query, store_key=store_key, store_to=store_to, input_value=input_value, input_value_specified=input_value_specified
             )
@@ -1017,7 +1104,31 @@ class Context(MetadataContextMixin, object):
             state = self.index_state(state)
             return state
 
-        raw_query, query = self.to_query(query)
+        self.profile = None
+        if profile is None:
+            profile = self.vars.get("profile", False)
+        if profile and not is_profiling():
+            with SamplingProfiler() as profiler:
+                state = self.evaluate(
+                    query,
+                    cache=RefreshCache(self.cache() if cache is None else cache),
+                    description=description,
+                    store_key=store_key,
+                    store_to=store_to,
+                    extra_parameters=extra_parameters,
+                    input_value=input_value,
+                    input_value_specified=input_value_specified,
+                    profile=False,
+                )
+            self.profile = profiler.as_dict()
+            state.metadata[PROFILE_KEY] = self.profile
+            self.enable_store_metadata = True
+            self.store_metadata(force=True)
+            return state
+
+        self.timings = {}
+        with self.timer(PARSE, query if isinstance(query, str) else query.encode()):
+            raw_query, query = self.to_query(query)
         self.raw_query = raw_query
         self.query = query
         self.store_key = store_key
@@ -1029,33 +1140,32 @@ class Context(MetadataContextMixin, object):
         if cache is None:
             if input_value_specified:
                 cache=NoCache()
-                self.debug(f"Input value specified, cache {repr(cache)}")
+                self.debug("Input value specified, cache %r", cache)
             else:
                 cache = self.cache()
-                self.debug(f"Default cache {repr(cache)}")
+                self.debug("Default cache %r", cache)
 
-        self.debug(f"Using cache {repr(cache)}")
-        self.debug(f"Try cache {query}")
+        self.debug("Using cache %r", cache)
+        self.debug("Try cache %s", query)
         if (extra_parameters is None or len(extra_parameters)==0) and input_value is None and not input_value_specified:
-            state = cache.get(query.encode())
+            with self.timer(CACHE_GET):
+                state = cache.get(query.encode())
             if state is not None:
-                self.debug(f"Cache hit {query}")
+                self.debug("Cache hit %s", query)
                 self._store_state(state)
                 state = self.index_state(state)
                 return state
         else:
             state=None
             if input_value is not None or input_value_specified:
-                print("Input value specified, cache disabled")
                 self.debug("Input value specified, cache disabled")
             else:
-                print("Extra parameters specified, cache disabled", extra_parameters)
-                self.debug("Extra parameters specified, cache disabled")
+                self.debug("Extra parameters %s specified, cache disabled", extra_parameters)
         self.enable_store_metadata = (
             True  # Metadata can be only written after trying to read from cache,
         )
         # so that cache does not get overwritten
-        self.debug(f"Cache miss {query}")
+        self.debug("Cache miss %s", query)
 
         if query.is_resource_query():
             state = self.evaluate_resource(query.resource_query())
@@ -1066,12 +1176,12 @@ class Context(MetadataContextMixin, object):
             return state
         else:
             p, r = query.predecessor()
-            self.debug(f"PROCESS Predecessor:{p} Action: {r}")
+            self.debug("PROCESS Predecessor:%s Action: %s", p, r)
             if p is None or p.is_empty():
                 self.parent_query = ""
                 state = self.create_initial_state(input_value=input_value)
                 state.metadata["created"] = self.now()
-                self.debug(f"INITIAL STATE")
+                self.debug("INITIAL STATE")
             else:
                 self.parent_query = p.encode()
                 self.status = Status.EVALUATING_PARENT
@@ -1079,20 +1189,21 @@ class Context(MetadataContextMixin, object):
                 c=self.child_context()
                 c.evaluated_key = self.evaluated_key
                 c.cwd_key = self.cwd_key
-                state = c.evaluate(p, cache=cache, input_value=input_value, input_value_specified=input_value_specified)
+                with self.timer(PREDECESSOR):
+                    state = c.evaluate(p, cache=cache, input_value=input_value, input_value_specified=input_value_specified)
             if state.is_error:
                 self.status = Status.ERROR
                 self.store_metadata()
                 state = state.next_state()
                 state.query = query.encode()
                 state.metadata["created"] = self.now()
-                self.debug(f"ERROR in '{state.query}'")
+                self.debug("ERROR in '%s'", state.query)
                 self._store_state(state)
                 state = self.index_state(state)
                 return state
         self.vars = Vars(state.vars)
         if r is None:
-            self.debug(f"RETURN '{query}' AFTER EMPTY ACTION ON '{state.query}'")
+            self.debug("RETURN '%s' AFTER EMPTY ACTION ON '%s'", query, state.query)
             state.query = query.encode()
             state.metadata["created"] = self.now()
             self._store_state(state)
@@ -1102,7 +1213,14 @@ class Context(MetadataContextMixin, object):
             state.metadata["filename"] = r.filename
             state.metadata["extension"] = ".".join(r.filename.split(".")[1:])
 
-        state = self.evaluate_action(state, r, extra_parameters=extra_parameters)
+        # The input state was created within this evaluation (initial state, cache or predecessor),
+        # hence the exclusive ownership of its data can be trusted
+        state = self.evaluate_action(
+            state,
+            r,
+            extra_parameters=extra_parameters,
+            exclusive=getattr(state, "exclusive", False),
+        )
         state.query = query.encode()
         state.metadata["created"] = self.now()
 
@@ -1115,15 +1233,16 @@ class Context(MetadataContextMixin, object):
             #            self.status = "cache"
             #            self.store_metadata()
             try:
-                cache.store(state)
+                with self.timer(CACHE_STORE):
+                    cache.store(state)
             except:
-                traceback.print_exc()
+                logger.debug("Cache failed", exc_info=True)
                 self.warning("Cache failed", traceback=traceback.format_exc())
         else:
             if state.is_error:
                 cache.store_metadata(state.metadata)
             else:
-                print("REMOVE CACHE", state.query)
+                logger.debug("Remove %s from cache", state.query)
                 if not cache.remove(state.query):
                     self.status = Status.EXPIRED
                     self.store_metadata()
@@ -1132,16 +1251,16 @@ class Context(MetadataContextMixin, object):
         try:
             state = self.index_state(state)
         except:
-            traceback.print_exc()
+            logger.debug("Indexer failed", exc_info=True)
             self.warning("Indexer failed", traceback=traceback.format_exc())
+        state.metadata["timings"] = dict(self.timings)
         return state
 
     def evaluate_on(self, value, query, description=None, extra_parameters=None):
         """Evaluate query on a given value.
         This is a convenience method, which creates a context, evaluates the query and returns the result.
         """
-        logger.debug(f"*** Evaluate on {value} query {query} started")
-        print(f"*** Evaluate on {value} query {query} started")
+        logger.debug("*** Evaluate on %s query %s started", value, query)
         return self.evaluate(query, input_value=value, cache=NoCache(), input_value_specified=True, description=description, extra_parameters=extra_parameters)
     
     def create_evaluate_on_state_function(self, query):
@@ -1179,10 +1298,10 @@ class Context(MetadataContextMixin, object):
         ):
             target_directory = "."
 
-        logger.debug(f"*** Evaluate and save {query} started")
+        logger.debug("*** Evaluate and save %s started", query)
         state = self.evaluate(query)
         if state.is_error:
-            logger.debug(f"*** Evaluate and save {query} failed")
+            logger.debug("*** Evaluate and save %s failed", query)
             if target_resource_directory is not None and target_file is not None:
                 filename = target_file
                 key = (
@@ -1222,7 +1341,7 @@ class Context(MetadataContextMixin, object):
             path = os.path.join(target_directory, filename)
 
         if target_directory is not None:
-            logger.debug(f"*** Evaluate and save {query} to {path}")
+            logger.debug("*** Evaluate and save %s to %s", query, path)
             with open(path, "wb") as f:
                 f.write(b)
 
@@ -1233,7 +1352,7 @@ class Context(MetadataContextMixin, object):
                 if target_resource_directory == ""
                 else target_resource_directory + "/" + filename
             )
-            logger.debug(f"*** Store evaluated {query} to {key}")
+            logger.debug("*** Store evaluated %s to %s", query, key)
             if store is None:
                 store = self.store()
 
@@ -38,6 +38,17 @@ class RecipeVersionCollisionException(VersionCollisionException):
         super().__init__(message=message, query=query)
 
 
+def copy_dependencies(dependencies):
+    """Copy of a dependencies dictionary.
+    Dependency records (versions, fingerprints) are immutable strings,
+    hence copying the nested dictionaries is equivalent to a deep copy, but much faster.
+    """
+    return {
+        key: dict(value) if type(value) is dict else value
+        for key, value in dependencies.items()
+    }
+
+
 class Dependencies:
     def __init__(self, dependencies=None):
         if dependencies is None:
@@ -52,12 +63,14 @@ class Dependencies:
         if "recipe" not in dependencies:
             dependencies["recipe"] = {}
         dependencies["recipe"]["version"] = dependencies["recipe"].get("version")
+        if "resources" not in dependencies:
+            dependencies["resources"] = {}
 
         self.dependencies = dependencies
         return self
 
     def as_dict(self):
-        return deepcopy(self.dependencies)
+        return copy_dependencies(self.dependencies)
 
     @property
     def query(self):
@@ -103,3 +116,102 @@ class Dependencies:
         self.dependencies["recipe"]["name"] = recipe_name
         self.dependencies["recipe"]["version"] = version
         return self
+
+    def add_resource_dependency(self, key, metadata, detect_collisions=True):
+        """Register a store resource (key) as a dependency.
+        The fingerprint of the resource is derived from its metadata (see resource_fingerprint).
+        """
+        fingerprint = resource_fingerprint(metadata)
+        if detect_collisions:
+            if key in self.dependencies["resources"]:
+                old_fingerprint = self.dependencies["resources"][key]
+                if old_fingerprint != fingerprint:
+                    raise VersionCollisionException(
+                        f"Version collision for resource '{key}'", query=self.query
+                    )
+        self.dependencies["resources"][key] = fingerprint
+        return self
+
+    def merge(self, dependencies):
+        """Merge command and resource dependencies from other dependencies
+        (e.g. dependencies of the input state or of a link parameter).
+        Recipe and query are not merged.
+        If the same dependency is recorded with a different version, the already recorded version is kept.
+        """
+        if dependencies is None:
+            return self
+        if isinstance(dependencies, Dependencies):
+            dependencies = dependencies.dependencies
+        for key, version in dependencies.get("commands", {}).items():
+            self.dependencies["commands"].setdefault(key, version)
+        for key, fingerprint in dependencies.get("resources", {}).items():
+            self.dependencies["resources"].setdefault(key, fingerprint)
+        return self
+
+    def outdated(self, store=None, recipe=None, command_registry=None):
+        """Return a list of reasons why the recorded dependencies are outdated.
+        Empty list means that all the dependencies that can be verified are up to date.
+        Command versions are compared with the command registry,
+        resource fingerprints with the metadata in the store (if store is provided)
+        and recipe version with the recipe (if recipe is provided).
+        """
+        if command_registry is None:
+            from liquer.commands import command_registry as get_command_registry
+
+            command_registry = get_command_registry()
+        reasons = []
+        for key, version in self.dependencies["commands"].items():
+            if not key.startswith("ns-") or "/" not in key:
+                continue
+            ns, name = key[3:].split("/", 1)
+            command_metadata = command_registry.metadata.get(ns, {}).get(name)
+            if command_metadata is None:
+                continue
+            if command_metadata.version != version:
+                reasons.append(f"Command '{name}' in namespace '{ns}' changed")
+        if store is not None:
+            for key, fingerprint in self.dependencies["resources"].items():
+                if fingerprint is None:
+                    continue
+                try:
+                    metadata = store.get_metadata(key)
+                except Exception:
+                    metadata = None
+                if metadata is None:
+                    reasons.append(f"Resource '{key}' is missing")
+                elif resource_fingerprint(metadata) != fingerprint:
+                    reasons.append(f"Resource '{key}' changed")
+        if recipe is not None:
+            version = self.dependencies["recipe"].get("version")
+            if version is not None and version != recipe.version():
+                reasons.append(f"Recipe '{recipe.recipe_name()}' changed")
+        return reasons
+
+
+def resource_fingerprint(metadata):
+    """Fingerprint of a store resource derived from its metadata.
+    The md5 checksum is used if available, otherwise the update timestamp and size.
+    Returns None if the resource can not be fingerprinted.
+    """
+    if metadata is None:
+        return None
+    fileinfo = metadata.get("fileinfo") or {}
+    if fileinfo.get("md5"):
+        return "md5:" + fileinfo["md5"]
+    if metadata.get("updated"):
+        return f"updated:{metadata['updated']}:{fileinfo.get('size')}"
+    return None
+
+
+def outdated_dependencies(metadata, store=None, recipe=None, command_registry=None):
+    """Return a list of reasons why the result described by the metadata is outdated.
+    Empty list means that the result is up to date as far as it can be verified.
+    """
+    if metadata is None:
+        return ["No metadata"]
+    dependencies = metadata.get("dependencies")
+    if dependencies is None:
+        return []
+    return Dependencies(deepcopy(dependencies)).outdated(
+        store=store, recipe=recipe, command_registry=command_registry
+    )
@@ -0,0 +1,427 @@
+"""Module liquer.distributed provides a coordinator and workers for distributed query evaluation.
+
+The coordinator keeps a queue of jobs (queries) together with a central store and cache.
+Workers (possibly on different hosts) connect to the coordinator over TCP,
+pull jobs from the queue, evaluate them and report the results back.
+Workers use the central store and cache of the coordinator, thus the progress
+of the evaluation and the results are visible in the cache metadata.
+
+The protocol is based on multiprocessing managers (authenticated by authkey),
+i.e. the same mechanism as used by liquer.pool for the central cache and store.
+
+The authkey has no default; it must be passed explicitly or set in the LIQUER_AUTHKEY
+environment variable. The coordinator listens on the loopback interface by default,
+listening on other interfaces (e.g. address=("0.0.0.0", 5050)) must be requested explicitly.
+
+Coordinator (e.g. in the process running the liquer server):
+
+    coordinator = Coordinator(store=get_store(), cache=get_cache())  # authkey from LIQUER_AUTHKEY
+    coordinator.start()
+    job = coordinator.submit("hello/greet")
+
+Worker (authkey from LIQUER_AUTHKEY):
+
+    python -m liquer.distributed --address coordinator-host:5050
+"""
+import heapq
+import logging
+import os
+import socket
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+from liquer import evaluate
+import liquer.util as util
+from liquer.cache import set_cache, NoCache
+from liquer.store import set_store, Store
+from liquer.pool import (
+    Job,
+    JobScheduler,
+    JobStatus,
+    SafeProxyStore,
+    TransportCacheProxy,
+    TransportCache,
+    TransportStore,
+)
+
+logger = logging.getLogger(__name__)
+worker_logger = logging.getLogger(__name__ + ".worker")
+
+AUTHKEY_ENVIRONMENT_VARIABLE = "LIQUER_AUTHKEY"
+DEFAULT_ADDRESS = ("127.0.0.1", 5050)
+
+
+def get_authkey(authkey=None):
+    """Return the authkey as bytes.
+    If authkey is None, it is taken from the LIQUER_AUTHKEY environment variable.
+    Raises an exception if no authkey is available.
+    """
+    if authkey is None:
+        authkey = os.environ.get(AUTHKEY_ENVIRONMENT_VARIABLE)
+    if not authkey:
+        raise Exception(
+            f"Authkey is required; pass it explicitly or set {AUTHKEY_ENVIRONMENT_VARIABLE}"
+        )
+    if isinstance(authkey, str):
+        authkey = authkey.encode("utf-8")
+    return authkey
+
+
+class JobQueue(JobScheduler):
+    """Pull-based priority job queue living in the coordinator.
+
+    Queueing, deduplication, prioritization, cancelling and the history of finished jobs
+    are inherited from JobScheduler, but instead of being dispatched to a pool,
+    the jobs are pulled by the workers (next_job).
+    A job is leased to a worker; if the worker does not report back (or send a heartbeat)
+    within lease_timeout seconds, the job is queued again.
+    Methods return plain dictionaries, so that they can be used via a manager proxy.
+    """
+
+    def __init__(self, max_queue_length=1000, lease_timeout=600, max_finished=1000):
+        super().__init__(max_queue_length=max_queue_length, max_finished=max_finished)
+        self.lease_timeout = lease_timeout
+        self.worker_config = {}
+        self.workers = {}
+        self._leases = {}
+        self._condition = threading.Condition(self._lock)
+
+    def submit(self, query, priority=0):
+        """Submit a query, returns the job as a dictionary.
+        If the query is already queued or running, the existing job is returned.
+        """
+        return super().submit(query, priority=priority).to_dict()
+
+    def _dispatch(self):
+        # Jobs are not pushed to a pool, waiting workers are notified instead
+        with self._condition:
+            self._condition.notify_all()
+
+    def _requeue_expired(self):
+        now = time.time()
+        for job_id, expires in list(self._leases.items()):
+            if expires < now:
+                job = self.jobs[job_id]
+                logger.warning(
+                    f"Job {job_id} ({job.query}) lease expired on worker {job.worker}, queued again"
+                )
+                del self._leases[job_id]
+                self._running -= 1
+                job.status = JobStatus.QUEUED
+                job.message = f"Queued again (worker {job.worker} did not respond)"
+                job.worker = None
+                heapq.heappush(self._queue, (-job.priority, next(self._counter), job_id))
+
+    def next_job(self, worker_id, timeout=1.0):
+        """Lease the next job to a worker.
+        Waits up to timeout seconds for a job, returns the job as a dictionary or None.
+        """
+        deadline = time.time() + timeout
+        with self._condition:
+            self.workers[worker_id] = time.time()
+            while True:
+                self._requeue_expired()
+                job = self._next_job()
+                if job is not None:
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(min(remaining, 1.0))
+            job.status = JobStatus.RUNNING
+            job.message = f"Running on {worker_id}"
+            job.started = util.now()
+            job.worker = worker_id
+            self._running += 1
+            self._leases[job.job_id] = time.time() + self.lease_timeout
+            return job.to_dict()
+
+    def heartbeat(self, worker_id, job_id=None):
+        """Worker is alive; renews the lease of the job (if specified)."""
+        with self._condition:
+            self.workers[worker_id] = time.time()
+            job = self.jobs.get(job_id)
+            if job is not None and job.worker == worker_id and job_id in self._leases:
+                self._leases[job_id] = time.time() + self.lease_timeout
+                return True
+            return False
+
+    def _finish(self, job_id, worker_id, status, message):
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job is None or job.worker != worker_id or job.status != JobStatus.RUNNING:
+                logger.warning(f"Ignoring result of job {job_id} from worker {worker_id}")
+                return False
+            self._leases.pop(job_id, None)
+            self._finish_job(job_id, status, message, result=message)
+            return True
+
+    def job_done(self, job_id, worker_id, message="Done"):
+        """Report a successfully finished job."""
+        return self._finish(job_id, worker_id, JobStatus.DONE, message)
+
+    def job_failed(self, job_id, worker_id, message="Failed"):
+        """Report a failed job."""
+        return self._finish(job_id, worker_id, JobStatus.ERROR, message)
+
+    def get_job(self, job_id):
+        """Get job as a dictionary or None."""
+        job = self.jobs.get(job_id)
+        return None if job is None else job.to_dict()
+
+    def wait(self, job_id, timeout=None):
+        """Wait for the job to finish, returns the job as a dictionary."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job.wait(timeout)
+        return job.to_dict()
+
+    def get_worker_config(self):
+        """Configuration for the workers (e.g. modules to import)."""
+        return dict(self.worker_config)
+
+    def status(self):
+        """Status of the queue as a dictionary."""
+        with self._condition:
+            return dict(
+                queued=self.queue_length(),
+                running=self._running,
+                max_queue_length=self.max_queue_length,
+                workers=dict(self.workers),
+                jobs=[job.to_dict() for job in self.jobs.values()],
+            )
+
+
+class CoordinatorManager(BaseManager):
+    """Multiprocessing manager serving the coordinator objects over TCP."""
+
+    pass
+
+
+_coordinator = None
+
+
+def _get_queue():
+    return _coordinator.queue
+
+
+def _get_store():
+    return _coordinator.store_proxy
+
+
+def _get_cache():
+    return _coordinator.cache_proxy
+
+
+CoordinatorManager.register("get_queue", callable=_get_queue)
+CoordinatorManager.register("get_store", callable=_get_store)
+CoordinatorManager.register("get_cache", callable=_get_cache)
+
+
+class Coordinator:
+    """Coordinator of distributed workers.
+    Serves the job queue, the central store and the central cache over TCP (address, authkey).
+    Only one coordinator can run in a process.
+    """
+
+    def __init__(
+        self,
+        address=DEFAULT_ADDRESS,
+        authkey=None,
+        store=None,
+        cache=None,
+        modules=None,
+        max_queue_length=1000,
+        lease_timeout=600,
+    ):
+        self.address = address
+        self.authkey = get_authkey(authkey)
+        self.store = Store() if store is None else store
+        self.cache = NoCache() if cache is None else cache
+        parent_store = self.store.parent_store
+        self.store_proxy = SafeProxyStore(self.store)
+        # The proxy is only a server-side adapter, the store hierarchy is left unchanged
+        self.store.parent_store = parent_store
+        self.cache_proxy = TransportCacheProxy(self.cache)
+        self.modules = list(modules or [])
+        self.queue = JobQueue(
+            max_queue_length=max_queue_length, lease_timeout=lease_timeout
+        )
+        self.queue.worker_config = dict(modules=self.modules)
+        self.server = None
+        self._thread = None
+
+    def start(self):
+        """Start serving in a background thread. Returns the (bound) address."""
+        global _coordinator
+        if _coordinator is not None and _coordinator is not self:
+            raise Exception("Coordinator is already running in this process")
+        _coordinator = self
+        manager = CoordinatorManager(address=self.address, authkey=self.authkey)
+        self.server = manager.get_server()
+        self.address = self.server.address
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        logger.info(f"Coordinator listening on {self.address}")
+        return self.address
+
+    def _serve(self):
+        try:
+            self.server.serve_forever()
+        except SystemExit:
+            # serve_forever calls sys.exit when stopped
+            pass
+
+    def stop(self):
+        """Stop serving."""
+        global _coordinator
+        if self.server is not None:
+            self.server.stop_event.set()
+            self.server.listener.close()
+            self.server = None
+        if _coordinator is self:
+            _coordinator = None
+
+    def submit(self, query, priority=0):
+        """Submit a query for evaluation by the workers, returns the job as a dictionary."""
+        return self.queue.submit(query, priority=priority)
+
+    def wait(self, job_id, timeout=None):
+        """Wait for a job to finish, returns the job as a dictionary."""
+        return self.queue.wait(job_id, timeout)
+
+    def status(self):
+        return self.queue.status()
+
+
+def parse_address(address):
+    """Parse address in the form host:port into a tuple."""
+    if isinstance(address, str):
+        host, port = address.rsplit(":", 1)
+        return (host, int(port))
+    return tuple(address)
+
+
+class Worker:
+    """Worker pulling jobs from a Coordinator.
+    Cache and store of the coordinator are used (set as the global cache and store).
+    If shared_filesystem is True, large payloads are transported via shared memory files
+    (only possible when the worker runs on the same host as the coordinator).
+    """
+
+    def __init__(
+        self,
+        address,
+        authkey=None,
+        worker_id=None,
+        heartbeat_interval=10,
+        shared_filesystem=False,
+    ):
+        self.address = parse_address(address)
+        self.authkey = get_authkey(authkey)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.heartbeat_interval = heartbeat_interval
+        self.shared_filesystem = shared_filesystem
+        self.jobs_done = 0
+        self.jobs_processed = 0
+        self.manager = None
+        self.queue = None
+
+    def connect(self):
+        """Connect to the coordinator and initialize cache, store and modules."""
+        self.manager = CoordinatorManager(address=self.address, authkey=self.authkey)
+        self.manager.connect()
+        self.queue = self.manager.get_queue()
+        threshold = None
+        if self.shared_filesystem:
+            from liquer.pool import TRANSPORT_THRESHOLD
+
+            threshold = TRANSPORT_THRESHOLD
+        set_store(TransportStore(self.manager.get_store(), transport_threshold=threshold))
+        set_cache(TransportCache(self.manager.get_cache(), transport_threshold=threshold))
+        for module in self.queue.get_worker_config().get("modules", []):
+            worker_logger.info(f"Loading module {module}")
+            __import__(module, fromlist=["*"])
+        worker_logger.info(f"Worker {self.worker_id} connected to {self.address}")
+        return self
+
+    def _heartbeat(self, job_id, stop):
+        # Proxies use a separate connection in each thread
+        while not stop.wait(self.heartbeat_interval):
+            self.queue.heartbeat(self.worker_id, job_id)
+
+    def run_job(self, job):
+        """Evaluate a job (dictionary) and report the result to the coordinator."""
+        job_id, query = job["job_id"], job["query"]
+        worker_logger.info(f"Worker {self.worker_id} evaluates {query} (job {job_id})")
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, stop), daemon=True)
+        heartbeat.start()
+        self.jobs_processed += 1
+        try:
+            state = evaluate(query)
+        except Exception as e:
+            worker_logger.exception(f"Job {job_id} failed")
+            self.queue.job_failed(job_id, self.worker_id, str(e))
+            return False
+        finally:
+            stop.set()
+        if state.is_error:
+            worker_logger.error(f"Job {job_id} failed: {state.metadata.get('message')}")
+            self.queue.job_failed(job_id, self.worker_id, state.metadata.get("message"))
+            return False
+        self.queue.job_done(job_id, self.worker_id, f"Done evaluating {query}")
+        self.jobs_done += 1
+        return True
+
+    def run(self, max_jobs=None, idle_timeout=None, poll_timeout=1.0):
+        """Pull and evaluate jobs.
+        Stops after max_jobs jobs (successful or failed) or after idle_timeout seconds without a job
+        (if specified). Returns the number of successfully finished jobs.
+        """
+        if self.queue is None:
+            self.connect()
+        idle_since = time.time()
+        while max_jobs is None or self.jobs_processed < max_jobs:
+            job = self.queue.next_job(self.worker_id, poll_timeout)
+            if job is None:
+                if idle_timeout is not None and time.time() - idle_since > idle_timeout:
+                    break
+                continue
+            self.run_job(job)
+            idle_since = time.time()
+        return self.jobs_done
+
+
+def run_worker(address, authkey=None, max_jobs=None, idle_timeout=None, **kwargs):
+    """Connect to a coordinator and run a worker."""
+    return Worker(address, authkey=authkey, **kwargs).run(
+        max_jobs=max_jobs, idle_timeout=idle_timeout
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Liquer distributed worker")
+    parser.add_argument("--address", "-a", type=str, required=True, help="Coordinator address (host:port)")
+    parser.add_argument(
+        "--authkey", "-k", type=str, default=None, help=f"Authentication key (default: ${AUTHKEY_ENVIRONMENT_VARIABLE})"
+    )
+    parser.add_argument("--worker-id", type=str, default=None, help="Worker identifier")
+    parser.add_argument("--max-jobs", type=int, default=None, help="Stop after a number of jobs")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="Stop when idle (seconds)")
+    parser.add_argument("--shared-filesystem", action="store_true", help="Worker runs on the coordinator host")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run_worker(
+        args.address,
+        authkey=args.authkey,
+        worker_id=args.worker_id,
+        max_jobs=args.max_jobs,
+        idle_timeout=args.idle_timeout,
+        shared_filesystem=args.shared_filesystem,
+    )
@@ -7,9 +7,80 @@ from liquer.state_types import (
     StateType,
     register_state_type,
 )
-from liquer.constants import mimetype_from_extension
+from liquer.constants import mimetype_from_extension, Status
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import threading
 import json
 
+PREFETCH_WORKERS = 4
+
+_prefetch_executor = None
+_prefetch_executor_lock = threading.Lock()
+
+
+def prefetch_executor():
+    """Thread pool used to prefetch the batches of the stored dataframe iterators"""
+    global _prefetch_executor
+    with _prefetch_executor_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                max_workers=PREFETCH_WORKERS, thread_name_prefix="liquer-prefetch"
+            )
+        return _prefetch_executor
+
+
+class BatchBuffer(object):
+    """Buffer of dataframes (batches).
+    Batches are collected in a list and concatenated only once when needed,
+    thus the rows are not copied repeatedly (as with concatenating the batches one by one).
+    """
+
+    def __init__(self):
+        self.frames = []
+        self.rows = 0
+        self.columns = None
+
+    def __len__(self):
+        return self.rows
+
+    def append(self, df):
+        """Add a dataframe to the buffer"""
+        if self.columns is None:
+            self.columns = df.columns
+        self.frames.append(df)
+        self.rows += len(df)
+
+    def concat(self):
+        """Concatenate the buffered dataframes into a single dataframe (with a new index)"""
+        if len(self.frames) == 0:
+            return pd.DataFrame()
+        if len(self.frames) == 1:
+            return self.frames[0].reset_index(drop=True)
+        return pd.concat(self.frames, ignore_index=True)
+
+    def split(self, batch_size):
+        """Remove the full batches of batch_size rows from the buffer and return them as a list.
+        The buffer is concatenated once and the batches are slices of the concatenated dataframe.
+        Rows not filling a whole batch stay in the buffer.
+        """
+        if self.rows < batch_size:
+            return []
+        df = self.concat()
+        n = (len(df) // batch_size) * batch_size
+        batches = [df.iloc[i : i + batch_size] for i in range(0, n, batch_size)]
+        rest = df.iloc[n:]
+        self.frames = [rest] if len(rest) else []
+        self.rows = len(rest)
+        return batches
+
+
+def _check_columns(buffer, df, context):
+    if buffer.columns is not None and len(df.columns) != len(buffer.columns):
+        context.warning(
+            f"Number of columns in the batches differs - before:{len(buffer.columns)}, now:{len(df.columns)}"
+        )
+
 
 @command
 def concat_batches(idf, max_batches=None, context=None):
@@ -27,28 +98,24 @@ def concat_batches(idf, max_batches=None, context=None):
         max_batches = 0
     else:
         max_batches = int(max_batches)
-    buffer = pd.DataFrame()
+    buffer = BatchBuffer()
     for df in context.progress_iter(idf):
         if not len(df):
             continue
         context.info(
             f"Receiving dataframe with {len(df)} rows and {len(df.columns)} columns"
         )
-        if len(buffer) > 0:
-            if len(df.columns) != len(buffer.columns):
-                context.warning(
-                    f"Number of columns in the batches differs - before:{len(buffer.columns)}, now:{len(df.columns)}"
-                )
+        _check_columns(buffer, df, context)
         batch_number += 1
         if max_batches:
             context.info(f"Concatenate batch {batch_number}/{max_batches}")
         else:
             context.info(f"Concatenate batch {batch_number}")
-        buffer = pd.concat([buffer, df], ignore_index=True)
+        buffer.append(df)
         if max_batches and batch_number >= max_batches:
             context.info(f"Maximum number of batches reached")
             break
-    return buffer
+    return buffer.concat()
 
 
 @command(volatile=True, cache=False)
@@ -65,7 +132,8 @@ def repackage_batches(idf, batch_size=1024, max_batches=0, context=None):
     if isinstance(idf, pd.DataFrame):
         context.info(f"Single dataframe received")
         idf = [idf]
-    buffer = pd.DataFrame()
+    batch_size = int(batch_size)
+    buffer = BatchBuffer()
     if max_batches in ("0", "", None):
         max_batches = 0
     else:
@@ -77,43 +145,25 @@ def repackage_batches(idf, batch_size=1024, max_batches=0, context=None):
         context.info(
             f"Receiving dataframe with {len(df)} rows and {len(df.columns)} columns"
         )
-        if len(buffer) > 0:
-            if len(df.columns) != len(buffer.columns):
-                context.warning(
-                    f"Number of columns in the batches differs - before:{len(buffer.columns)}, now:{len(df.columns)}"
-                )
-        buffer = pd.concat([buffer,df], ignore_index=True)
-        while len(buffer) >= batch_size:
+        _check_columns(buffer, df, context)
+        buffer.append(df)
+        for result in buffer.split(batch_size):
             batch_number += 1
             if max_batches:
                 context.info(f"Yield batch {batch_number}/{max_batches}")
             else:
                 context.info(f"Yield batch {batch_number}")
-            result = buffer.iloc[:batch_size, :]
-            buffer = buffer.iloc[batch_size:, :]
             yield result
             if max_batches and batch_number >= max_batches:
                 context.info(f"Maximum number of batches reached")
                 return
-    while len(buffer) >= batch_size:
-        batch_number += 1
-        if max_batches:
-            context.info(f"Yield batch {batch_number}/{max_batches} (finishing)")
-        else:
-            context.info(f"Yield batch {batch_number} (finishing)")
-        result = buffer.iloc[:batch_size, :]
-        buffer = buffer.iloc[batch_size:, :]
-        yield result
-        if max_batches and batch_number >= max_batches:
-            context.info(f"Maximum number of batches reached")
-            return
     if len(buffer):
         batch_number += 1
         if max_batches:
             context.info(f"Yield batch {batch_number}/{max_batches} (last)")
         else:
             context.info(f"Yield batch {batch_number} (last)")
-        yield buffer
+        yield buffer.concat()
 
 
 class StoredDataframeIterator(object):
@@ -125,13 +175,19 @@ class StoredDataframeIterator(object):
         number_format="%04d",
         batch_number=0,
         store=None,
+        prefetch=2,
     ):
+        """Iterator of dataframes (batches) stored in a store under the key (directory).
+        When iterating, up to prefetch next batches are fetched in the background (see prefetch_executor).
+        """
         self.key = key
         self.item_keys = item_keys or []
         self.extension = extension
         self.number_format = number_format
         self.batch_number = batch_number
+        self.prefetch = prefetch
         self.state_type = state_types_registry().get("dataframe")
+        self._prefetched = {}
 
         if store is None:
             store = get_store()
@@ -166,21 +222,26 @@ class StoredDataframeIterator(object):
             number_format=self.number_format,
             batch_number=self.batch_number,
             store=self.store,
+            prefetch=self.prefetch,
         )
 
-    def _key_to_value(self, key):
-        if not self.store.contains(key):
-            raise Exception(f"Batch {self.batch_number} failure: '{key}' not in store")
-        if self.store.is_dir(key):
-            raise Exception(
-                f"Batch {self.batch_number} failure: '{key}' is a directory"
-            )
-        metadata = self.store.get_metadata(key)
-        if metadata is None:
-            print(f"WARNING: Batch {self.batch_number}, key '{key}' missing metadata")
-        b = self.store.get_bytes(key)
+    def _key_to_value(self, key, batch_number=None):
+        # Only the data are fetched in the common case,
+        # contains and is_dir are used just to report a failure.
+        if batch_number is None:
+            batch_number = self.batch_number
+        try:
+            b = self.store.get_bytes(key)
+        except Exception:
+            b = None
         if b is None:
-            raise Exception(f"Batch {self.batch_number} failure: '{key}' has no data")
+            if not self.store.contains(key):
+                raise Exception(f"Batch {batch_number} failure: '{key}' not in store")
+            if self.store.is_dir(key):
+                raise Exception(
+                    f"Batch {batch_number} failure: '{key}' is a directory"
+                )
+            raise Exception(f"Batch {batch_number} failure: '{key}' has no data")
         assert type(b) == bytes
 
         v = key.split(".")
@@ -191,7 +252,10 @@ class StoredDataframeIterator(object):
         return df
 
     def new_key(self):
-        batch_number = len(self.item_keys) + 1
+        return self.batch_key(len(self.item_keys) + 1)
+
+    def batch_key(self, batch_number):
+        """Key of the batch with a given number (starting from 1)"""
         if self.number_format is None:
             name = str(batch_number)
         else:
@@ -204,23 +268,43 @@ class StoredDataframeIterator(object):
             raise Exception(f"New key '{key}' already exists")
         return key
 
-    def append(self, df):
-        key = self.new_key()
-        store = self.store
+    def encode(self, df):
+        """Serialize a batch, returns bytes and metadata"""
         b, mimetype = self.state_type.as_bytes(df, self.extension)
         dc = data_characteristics(df)
         assert dc["type_identifier"] == "dataframe"
         metadata = dict(
             type_identifier=dc.get("type_identifier"),
-            data_characteristics=data_characteristics(df),
+            data_characteristics=dc,
         )
-        store.store(key, b, metadata)
+        return b, metadata
+
+    def store_batch(self, key, df):
+        """Serialize and store a batch under the key"""
+        b, metadata = self.encode(df)
+        self.store.store(key, b, metadata)
+
+    def append(self, df):
+        key = self.new_key()
+        self.store_batch(key, df)
         self.item_keys.append(key)
 
     def rewind(self):
         self.batch_number = 0
+        self._prefetched = {}
         return self
 
+    def _schedule_prefetch(self):
+        executor = prefetch_executor()
+        for batch_number in range(
+            self.batch_number, min(self.batch_number + self.prefetch, len(self.item_keys))
+        ):
+            key = self.item_keys[batch_number]
+            if key not in self._prefetched:
+                self._prefetched[key] = executor.submit(
+                    self._key_to_value, key, batch_number + 1
+                )
+
     def __len__(self):
         return len(self.item_keys)
 
@@ -231,6 +315,11 @@ class StoredDataframeIterator(object):
         if len(self.item_keys) > self.batch_number:
             key = self.item_keys[self.batch_number]
             self.batch_number += 1
+            if self.prefetch:
+                future = self._prefetched.pop(key, None)
+                self._schedule_prefetch()
+                if future is not None:
+                    return future.result()
             return self._key_to_value(key)
         raise StopIteration
 
@@ -287,10 +376,119 @@ STORED_DATAFRAME_ITERATOR_STATE_TYPE = StoredDataframeIteratorStateType()
 register_state_type(StoredDataframeIterator, STORED_DATAFRAME_ITERATOR_STATE_TYPE)
 
 
-def _store_batches(idf, key, max_batches=None, context=None):
+class BatchWriter(object):
+    """Writes dataframes (batches) into a StoredDataframeIterator.
+    Batches are serialized in write (so the caller may modify or reuse the dataframe afterwards)
+    and stored in a thread pool with at most max_in_flight writes in progress.
+    Completed batches are added to the iterator in order, hence the iterator (manifest)
+    always describes a complete prefix of the batches.
+    The manifest is stored in key/dataframe_iterator.json every checkpoint batches
+    (if checkpoint is not 0) and when the writer is closed.
+    """
+
+    MANIFEST = "dataframe_iterator.json"
+
+    def __init__(
+        self, sdfi, max_workers=4, max_in_flight=8, checkpoint=10, context=None
+    ):
+        self.sdfi = sdfi
+        self.context = get_context(context)
+        self.manifest_key = sdfi.store.join_key(sdfi.key, self.MANIFEST)
+        self.max_in_flight = max(1, max_in_flight)
+        self.checkpoint = checkpoint
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="liquer-batches"
+        )
+        self.in_flight = deque()
+        self.written = 0
+        self.closed = False
+
+    def write(self, df):
+        """Submit a batch to be stored"""
+        key = self.sdfi.batch_key(len(self.sdfi.item_keys) + len(self.in_flight) + 1)
+        while len(self.in_flight) >= self.max_in_flight:
+            self._complete_oldest()
+        b, metadata = self.sdfi.encode(df)
+        self.in_flight.append(
+            (key, self.executor.submit(self.sdfi.store.store, key, b, metadata))
+        )
+        while len(self.in_flight) and self.in_flight[0][1].done():
+            self._complete_oldest()
+
+    def _complete_oldest(self):
+        key, future = self.in_flight[0]
+        future.result()
+        self.in_flight.popleft()
+        self.sdfi.item_keys.append(key)
+        self.written += 1
+        if self.checkpoint and self.written % self.checkpoint == 0:
+            self.store_manifest()
+
+    def store_manifest(self):
+        """Store the iterator (manifest) with the batches completed so far"""
+        b, mimetype = STORED_DATAFRAME_ITERATOR_STATE_TYPE.as_bytes(self.sdfi, "json")
+        dc = STORED_DATAFRAME_ITERATOR_STATE_TYPE.data_characteristics(self.sdfi)
+        metadata = self.context.metadata()
+        metadata.update(
+            dict(
+                type_identifier=STORED_DATAFRAME_ITERATOR_STATE_TYPE.identifier(),
+                data_characteristics=dc,
+                mimetype=mimetype,
+                side_effect=True,
+                status=Status.SIDE_EFFECT.value,
+            )
+        )
+        self.sdfi.store.store(self.manifest_key, b, metadata)
+
+    def close(self):
+        """Wait for the batches in flight and store the manifest.
+        If storing of a batch failed, only the batches preceding it are included in the manifest.
+        """
+        if self.closed:
+            return self.sdfi
+        self.closed = True
+        try:
+            while len(self.in_flight):
+                self._complete_oldest()
+        finally:
+            self.executor.shutdown(wait=True)
+            self.in_flight.clear()
+            self.store_manifest()
+        return self.sdfi
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Keep the manifest of the batches completed before the failure
+            try:
+                self.close()
+            except Exception:
+                pass
+        return False
+
+
+def _load_manifest(store, key):
+    sdfi_key = store.join_key(key, BatchWriter.MANIFEST)
+    if not store.contains(sdfi_key):
+        return None
+    sdfi = STORED_DATAFRAME_ITERATOR_STATE_TYPE.from_bytes(
+        store.get_bytes(sdfi_key), extension="json"
+    )
+    sdfi.store = store
+    return sdfi
+
+
+def _store_batches(idf, key, max_batches=None, resume=False, context=None, result=None):
     """Store iterator of dataframes (batches) in a store.
     The key specifies a directory in the store where the items will be stored.
-    Helper function yielding StoredDataframeIterator object and dataframes.
+    Helper function yielding the dataframes; batches are stored in the background by a BatchWriter.
+    If resume is True and a manifest (key/dataframe_iterator.json) exists, the batches already stored
+    are skipped (but yielded).
+    If result is a list, the StoredDataframeIterator is appended to it when the storing is finished.
     """
     context = get_context(context)
     context.info(f"Store iterator")
@@ -300,7 +498,10 @@ def _store_batches(idf, key, max_batches=None, context=None):
     else:
         max_batches = int(max_batches)
     store = context.store()
-    if store.contains(key):
+    sdfi = _load_manifest(store, key) if resume else None
+    if sdfi is not None:
+        context.info(f"Resuming after {len(sdfi)} stored batches")
+    elif store.contains(key):
         if store.is_dir(key):
             context.info(f"Cleaning {key}")
             for x in store.listdir_keys(key):
@@ -310,46 +511,49 @@ def _store_batches(idf, key, max_batches=None, context=None):
             raise Exception(
                 f"Can't store the iterator in '{key}'. The key exists and it is not a directory."
             )
-    sdfi_key = store.join_key(key, "dataframe_iterator.json")
-
-    sdfi = StoredDataframeIterator(key)
-    for df in context.progress_iter(idf):
-        if not len(df):
-            continue
-        batch_number += 1
-        if max_batches:
-            context.info(f"Storing batch {batch_number}/{max_batches}")
-        else:
-            context.info(f"Storing batch {batch_number}")
-        sdfi=pd.concat([sdfi,df])
-        context.store_data(sdfi_key, sdfi)
-        yield sdfi, df
-        #        sdfi_bytes, mimetype = STORED_DATAFRAME_ITERATOR_STATE_TYPE.as_bytes(sdfi)
-        #        dc = data_characteristics(sdfi)
-        #        sdfi_metadata = context.metadata()
-        #        sdfi_metadata.update(
-        #            dict(type_identifier=dc["type_identifier"], data_characteristics=dc)
-        #        )
-        #        store.store(sdfi_key, sdfi_bytes, sdfi_metadata)
-        if max_batches and batch_number > max_batches:
-            context.info(f"Maximum number of batches reached")
-            break
+    if sdfi is None:
+        sdfi = StoredDataframeIterator(key, store=store)
+    skip = len(sdfi)
+
+    with BatchWriter(sdfi, context=context) as writer:
+        for df in context.progress_iter(idf):
+            if not len(df):
+                continue
+            batch_number += 1
+            if batch_number <= skip:
+                context.info(f"Skipping stored batch {batch_number}")
+            else:
+                if max_batches:
+                    context.info(f"Storing batch {batch_number}/{max_batches}")
+                else:
+                    context.info(f"Storing batch {batch_number}")
+                writer.write(df)
+            yield df
+            if max_batches and batch_number >= max_batches:
+                context.info(f"Maximum number of batches reached")
+                break
+    if result is not None:
+        result.append(sdfi)
 
 
 @command
-def store_batches(idf, key, max_batches=None, context=None):
+def store_batches(idf, key, max_batches=None, resume=False, context=None):
     """Store iterator of dataframes (batches) in a store.
     The key specifies a directory in the store where the items will be stored.
     Results in a StoredDataframeIterator object after all batches have been processed.
     This object can be serialized or stored in the object.
-    After each iteration step, the StoredDataframeIterator is stored as well in key/dataframe_iterator.json as a side-effect.
-    Thus for long-running iterations, the partial data is stored even if the evaluation does not finish.
+    Batches are stored in parallel; the StoredDataframeIterator (manifest) is stored as a side-effect
+    in key/dataframe_iterator.json periodically and when all batches have been stored.
+    Thus for long-running iterations, the partial data is stored even if the evaluation does not finish
+    and the storing can be resumed (resume=True) - the batches listed in the manifest are not stored again.
     """
     context = get_context(context)
-    sdfi = StoredDataframeIterator(key)
-    for sdfi, df in _store_batches(idf, key, max_batches=max_batches, context=context):
+    result = []
+    for df in _store_batches(
+        idf, key, max_batches=max_batches, resume=resume, context=context, result=result
+    ):
         pass
-    return sdfi
+    return result[0]
 
 
 @command(cache=False, volatile=True)
@@ -358,8 +562,9 @@ def store_batches_pass_through(idf, key, max_batches=None, context=None):
     The key specifies a directory in the store where the items will be stored.
     Unlike store_batches, this immediately yields the dataframes,
     thus the result is a volatile iterator which can not be stored in cache.
-    The StoredDataframeIterator is, however, stored in key/dataframe_iterator.json as a side-effect after each iteration step.
+    The batches are stored in the background, the StoredDataframeIterator is stored
+    in key/dataframe_iterator.json as a side-effect periodically and at the end of the iteration.
     """
     context = get_context(context)
-    for sdfi, df in _store_batches(idf, key, max_batches=max_batches, context=context):
+    for df in _store_batches(idf, key, max_batches=max_batches, context=context):
         yield df
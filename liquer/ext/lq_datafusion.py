@@ -17,14 +17,53 @@ import pyarrow
 import pyarrow.parquet
 import pyarrow.csv
 import pyarrow.feather
+import pyarrow.ipc
+
+
+ARROW_MAGIC = b"ARROW1"
+PARQUET_MAGIC = b"PAR1"
+
+
+def arrow_table_to_bytes(table, extension):
+    """Serialize an Arrow table into an in-memory buffer (no temporary files)"""
+    output = pyarrow.BufferOutputStream()
+    if extension == "parquet":
+        pyarrow.parquet.write_table(table, output)
+    elif extension == "csv":
+        pyarrow.csv.write_csv(table, output)
+    elif extension == "feather":
+        pyarrow.feather.write_feather(table, output)
+    else:
+        raise Exception(
+            f"Serialization: file extension {extension} is not supported by DataFusion data-frame type."
+        )
+    return output.getvalue().to_pybytes()
+
+
+def arrow_table_from_source(source, extension):
+    """Read an Arrow table from a pyarrow buffer or a memory-mapped file"""
+    if extension == "parquet":
+        return pyarrow.parquet.read_table(source)
+    elif extension == "csv":
+        return pyarrow.csv.read_csv(source)
+    elif extension == "feather":
+        return pyarrow.ipc.open_file(source).read_all()
+    raise Exception(
+        f"Deserialization: file extension {extension} is not supported by DataFusion data-frame type."
+    )
 
 
 class DatafusionDataframeStateType(StateType):
+    """DataFusion data-frame state type.
+    Data-frames are serialized via Arrow in memory, by default in the Arrow IPC file format (feather).
+    Deserialized data-frames are registered in a new DataFusion session context.
+    """
+
     def identifier(self):
         return "datafusion_dataframe"
 
     def default_extension(self):
-        return "parquet"
+        return "feather"
 
     def is_type_of(self, data):
         return isinstance(data, daf.DataFrame)
@@ -34,37 +73,28 @@ class DatafusionDataframeStateType(StateType):
             extension = self.default_extension()
         assert self.is_type_of(data)
         mimetype = mimetype_from_extension(extension)
+        return arrow_table_to_bytes(data.to_arrow_table(), extension), mimetype
 
-        if extension == "parquet":
-            with TemporaryDirectory() as tmpdir:
-                path = Path(tmpdir) / f"data.{extension}"
-                table = pyarrow.Table.from_batches(data.collect())
-                pyarrow.parquet.write_table(table, str(path))
-                b = path.read_bytes()
-                return b, mimetype
-        elif extension == "csv":
-            with TemporaryDirectory() as tmpdir:
-                path = Path(tmpdir) / f"data.{extension}"
-                table = pyarrow.Table.from_batches(data.collect())
-                pyarrow.csv.write_csv(table, str(path))
-                b = path.read_bytes()
-                return b, mimetype
-        elif extension == "feather":
-            with TemporaryDirectory() as tmpdir:
-                path = Path(tmpdir) / f"data.{extension}"
-                table = pyarrow.Table.from_batches(data.collect())
-                pyarrow.feather.write_feather(table, str(path))
-                b = path.read_bytes()
-                return b, mimetype
-        else:
-            raise Exception(
-                f"Serialization: file extension {extension} is not supported by DataFusion data-frame type."
-            )
+    def detect_extension(self, b):
+        if b[:6] == ARROW_MAGIC:
+            return "feather"
+        if b[:4] == PARQUET_MAGIC:
+            return "parquet"
+        return self.default_extension()
 
     def from_bytes(self, b: bytes, extension=None):
-        raise Exception(
-            f"Deserialization is not supported by DataFusion data-frame type."
-        )
+        if extension is None:
+            extension = self.detect_extension(b)
+        source = pyarrow.BufferReader(b)
+        return daf.SessionContext().from_arrow(arrow_table_from_source(source, extension))
+
+    def from_file(self, path, extension=None):
+        if extension is None:
+            with open(path, "rb") as f:
+                extension = self.detect_extension(f.read(6))
+        with pyarrow.memory_map(str(path), "r") as source:
+            table = arrow_table_from_source(source, extension)
+        return daf.SessionContext().from_arrow(table)
 
     def copy(self, data):
         return self.from_bytes(self.as_bytes(data)[0])
@@ -111,8 +141,7 @@ register_state_type(daf.SessionContext, DATAFUSION_CONTEXT_STATE_TYPE)
 @command
 def datafusion_to_pandas(df):
     """Convert DataFusion data-frame to pandas data-frame"""
-    table = pyarrow.Table.from_batches(df.collect())
-    return table.to_pandas()
+    return df.to_arrow_table().to_pandas()
 
 
 class ParquetSQLRecipe(Recipe):
@@ -200,10 +229,7 @@ class ParquetSQLRecipe(Recipe):
             try:
                 ctx = self.make_context(tmpdir, store, context)
                 df = ctx.sql(self.data["sql"])
-                table = pyarrow.Table.from_batches(df.collect())
-                path = Path(tmpdir) / self.data["filename"]
-                pyarrow.parquet.write_table(table, str(path))
-                b = path.read_bytes()
+                b = arrow_table_to_bytes(df.to_arrow_table(), "parquet")
                 store.store(key, b, metadata)
             except:
                 m = Metadata(metadata)
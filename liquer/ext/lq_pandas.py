@@ -13,7 +13,14 @@ from liquer.recipes import Recipe, register_recipe
 from liquer.context import get_context
 from liquer.indexer import register_tool_for_type
 from liquer.metadata import Metadata
+from liquer.cache import CacheProxy
+from collections import OrderedDict
+import threading
+import weakref
 import traceback
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class ResilientBytesIO(BytesIO):
@@ -26,20 +33,113 @@ class ResilientBytesIO(BytesIO):
         super().close()
 
 
+ARROW_MAGIC = b"ARROW1"
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow
+        return True
+    except ImportError:
+        return False
+
+
 class DataframeStateType(StateType):
+    """Dataframe state type.
+    By default dataframes are serialized in the Arrow IPC file format (Feather v2),
+    which is fast to load and can be memory-mapped (see from_file).
+    Compression of the Arrow format can be set to None (default), "lz4" or "zstd".
+    Uncompressed files can be read with zero_copy=True - then the dataframe
+    is backed directly by the memory-mapped file (and is read-only).
+    Dataframes which can't be converted to Arrow without a loss (object columns containing
+    other values than strings or bytes, e.g. dictionaries, lists or mixed types) are pickled; when deserializing with the default extension, the format is detected automatically,
+    so caches created with the pickle default remain readable.
+    """
+
+    def __init__(self, compression=None, zero_copy=False):
+        self.compression = compression
+        self.zero_copy = zero_copy
+        self.arrow_available = _has_pyarrow()
+
     def identifier(self):
         return "dataframe"
 
     def default_extension(self):
-        return "pickle"
+        return "feather" if self.arrow_available else "pickle"
+
+    def arrow_as_bytes(self, data):
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        table = pa.Table.from_pandas(data)
+        output = pa.BufferOutputStream()
+        feather.write_feather(
+            table, output, compression=self.compression or "uncompressed"
+        )
+        return output.getvalue().to_pybytes()
+
+    def arrow_safe(self, data):
+        """Check whether the dataframe survives the Arrow round-trip unchanged.
+        Object columns and object index levels are only safe if they contain strings or bytes (and None).
+        """
+        import pyarrow as pa
+
+        index_levels = [
+            data.index.get_level_values(i) for i in range(data.index.nlevels)
+        ]
+        for column in [data[name] for name in data.columns] + index_levels:
+            if column.dtype != object:
+                continue
+            try:
+                t = pa.infer_type(column, from_pandas=True)
+            except Exception:
+                return False
+            if not (
+                pa.types.is_string(t)
+                or pa.types.is_large_string(t)
+                or pa.types.is_binary(t)
+                or pa.types.is_large_binary(t)
+                or pa.types.is_null(t)
+            ):
+                return False
+        return True
+
+    def arrow_table_to_pandas(self, table):
+        if self.zero_copy:
+            return table.to_pandas(split_blocks=True, self_destruct=True)
+        return table.to_pandas()
+
+    def arrow_from_bytes(self, b):
+        import pyarrow as pa
+
+        return self.arrow_table_to_pandas(pa.ipc.open_file(pa.py_buffer(b)).read_all())
+
+    def from_file(self, path, extension=None):
+        if extension is None:
+            with open(path, "rb") as f:
+                extension = "feather" if f.read(6) == ARROW_MAGIC else "pickle"
+        if extension == "feather" and self.arrow_available:
+            import pyarrow as pa
+
+            with pa.memory_map(path, "r") as source:
+                return self.arrow_table_to_pandas(pa.ipc.open_file(source).read_all())
+        return super().from_file(path, extension=extension)
 
     def is_type_of(self, data):
         return isinstance(data, pd.DataFrame)
 
     def as_bytes(self, data, extension=None):
+        assert self.is_type_of(data)
         if extension is None:
             extension = self.default_extension()
-        assert self.is_type_of(data)
+            if extension == "feather":
+                try:
+                    if self.arrow_safe(data):
+                        return self.arrow_as_bytes(data), mimetype_from_extension(extension)
+                except Exception:
+                    pass
+                logger.debug("Dataframe can't be converted to Arrow, using pickle")
+                extension = "pickle"
         mimetype = mimetype_from_extension(extension)
         if extension == "csv":
             output = StringIO()
@@ -70,6 +170,8 @@ class DataframeStateType(StateType):
             output.really_close()
             return b, mimetype
         elif extension == "feather":
+            if self.arrow_available:
+                return self.arrow_as_bytes(data), mimetype
             output = ResilientBytesIO()
             data.to_feather(output)
             b = output.getvalue()
@@ -92,7 +194,9 @@ class DataframeStateType(StateType):
 
     def from_bytes(self, b: bytes, extension=None):
         if extension is None:
-            extension = self.default_extension()
+            extension = "feather" if b[:6] == ARROW_MAGIC else "pickle"
+        if extension == "feather" and self.arrow_available:
+            return self.arrow_from_bytes(b)
         f = BytesIO()
         f.write(b)
         f.seek(0)
@@ -163,38 +267,192 @@ def df_from(url, extension=None):
         raise Exception(f"Unsupported file extension: {extension}")
 
 
-@command
+@command(pure=True)
 def append_df(df, url, extension=None):
     """Append dataframe from URL"""
     df1 = df_from(url, extension=extension).get()
     return pd.concat([df,df1], ignore_index=True)
 
 
-@command
-def eq(state, *column_values):
-    """Equals filter
-    Accepts one or more column-value pairs. Keep only rows where value in the column equals specified value.
-    Example: eq-column1-1
+def _split_keys_safe(series):
+    """Check whether the groups of a column can be identified by the string representation of the values
+    in the same way as the eq filter does (integers and strings only).
     """
-    df = state.get()
-    assert state.type_identifier == "dataframe"
+    if pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_bool_dtype(
+        series.dtype
+    ):
+        return True
+    if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+        return pd.api.types.infer_dtype(series, skipna=False) == "string"
+    return False
+
+
+def _compares_strings(dtype):
+    """True if the == operator of a column with the dtype compares strings as strings (without parsing)"""
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    return dtype == object or pd.api.types.is_string_dtype(dtype)
+
+
+def _equals(column, value):
+    """Vectorized equality of a column with a value (as a boolean array).
+    The result is the same as of the elementwise comparison x == value,
+    in particular strings are not parsed (e.g. as dates), thus they only match string values.
+    """
+    if isinstance(value, str) and not _compares_strings(column.dtype):
+        return np.zeros(len(column), bool)
+    try:
+        return (column == value).to_numpy(dtype=bool, na_value=False)
+    except Exception:
+        return np.array([x == value for x in column], bool)
+
+
+def eq_mask(df, column_values):
+    """Boolean mask of the rows selected by the eq filter.
+    Column-value pairs are combined into a single mask; the values (strings) are compared
+    with the column values as strings and (if possible) as numbers.
+    """
+    mask = np.ones(len(df), bool)
     for i in range(0, len(column_values), 2):
-        c = column_values[i]
+        column = df[column_values[i]]
         v = column_values[i + 1]
-        state.log_info(f"Equals: {c} == {v}")
-        index = np.array([x == v for x in df[c]], bool)
+        index = _equals(column, v)
         try:
             if int(v) == float(v):
-                index = index | (df[c] == int(v))
+                index = index | _equals(column, int(v))
             else:
-                index = index | (df[c] == float(v))
+                index = index | _equals(column, float(v))
         except:
             pass
-        df = df.loc[index, :]
-    return state.with_data(df)
+        mask &= index
+    return mask
 
 
-@command
+# Filter indices of the dataframes filtered by eq/teq (see filter_index):
+# (parent query, filter command, columns) -> (weak reference to the dataframe, filter index or None)
+# An index is used only for the very same dataframe object it was created for.
+FILTER_INDEX_MAXSIZE = 32
+_filter_indices = OrderedDict()
+_filter_index_requests = OrderedDict()
+_filter_index_lock = threading.Lock()
+
+
+def filter_index(df, columns, indices=None):
+    """Positions of the rows of the groups of a dataframe split by columns.
+    Returns a dictionary mapping a tuple of the column values (as strings, like in the eq filter)
+    to arrays of row positions or None if the groups can not be safely identified
+    by the string representation of the values (e.g. float or boolean columns or mixed types).
+    Groupby indices of the dataframe (if already available) can be passed as indices.
+    """
+    columns = list(columns)
+    if not all(_split_keys_safe(df[c]) for c in columns):
+        return None
+    if indices is None:
+        indices = df.groupby(by=columns, sort=False).indices
+    index = {}
+    for key, positions in indices.items():
+        if not isinstance(key, tuple):
+            key = (key,)
+        skey = tuple(str(x) for x in key)
+        if skey in index:
+            return None
+        index[skey] = positions
+    return index
+
+
+def _filter_index_key(state, kind, columns):
+    if state.query is None or state.data is None:
+        return None
+    return (state.query, kind, tuple(columns))
+
+
+def _put_filter_index(key, frame, index):
+    with _filter_index_lock:
+        _filter_indices[key] = (weakref.ref(frame), index)
+        _filter_indices.move_to_end(key)
+        while len(_filter_indices) > FILTER_INDEX_MAXSIZE:
+            _filter_indices.popitem(last=False)
+
+
+def _get_filter_index(key, frame):
+    """Filter index entry (a tuple with the index) for the dataframe frame or None"""
+    entry = _filter_indices.get(key)
+    if entry is not None and entry[0]() is frame:
+        _filter_indices.move_to_end(key)
+        return (entry[1],)
+    return None
+
+
+def register_filter_index(state, df, kind, columns, indices=None):
+    """Create the filter index used by the eq (kind="eq") or teq (kind="teq") filter
+    applied on the state (i.e. on the result of the state query).
+    The df is the filtered part of the state data (i.e. without the tag row for teq).
+    Groupby indices (if already available) can be passed as indices.
+    Returns the filter index or None if the dataframe can not be indexed.
+    """
+    key = _filter_index_key(state, kind, columns)
+    if key is None:
+        return None
+    with _filter_index_lock:
+        entry = _get_filter_index(key, state.data)
+    if entry is not None:
+        return entry[0]
+    index = filter_index(df, columns, indices)
+    _put_filter_index(key, state.data, index)
+    return index
+
+
+def _indexed_filter(state, df, kind, column_values):
+    """Row positions selected by the eq/teq filter found in the filter index
+    or None if the filter index is not available.
+    The filter index of a dataframe is created by the split commands (see evaluate_split)
+    or when the same filter columns are requested repeatedly on the same dataframe.
+    """
+    if len(column_values) % 2:
+        return None
+    columns = tuple(column_values[0::2])
+    key = _filter_index_key(state, kind, columns)
+    if key is None:
+        return None
+    with _filter_index_lock:
+        entry = _get_filter_index(key, state.data)
+        if entry is None:
+            request = _filter_index_requests.get(key)
+            requested = request is not None and request() is state.data
+            _filter_index_requests[key] = weakref.ref(state.data)
+            _filter_index_requests.move_to_end(key)
+            while len(_filter_index_requests) > FILTER_INDEX_MAXSIZE:
+                _filter_index_requests.popitem(last=False)
+            if not requested:
+                return None
+    if entry is None:
+        index = filter_index(df, columns)
+        _put_filter_index(key, state.data, index)
+    else:
+        index = entry[0]
+    if index is None:
+        return None
+    # Values not found (e.g. not in the canonical form like 01 for 1) are filtered by the mask
+    return index.get(tuple(str(v) for v in column_values[1::2]))
+
+
+@command(pure=True)
+def eq(state, *column_values):
+    """Equals filter
+    Accepts one or more column-value pairs. Keep only rows where value in the column equals specified value.
+    Example: eq-column1-1
+    """
+    df = state.get()
+    assert state.type_identifier == "dataframe"
+    for i in range(0, len(column_values), 2):
+        state.log_info(f"Equals: {column_values[i]} == {column_values[i + 1]}")
+    positions = _indexed_filter(state, df, "eq", column_values)
+    if positions is not None:
+        return state.with_data(df.iloc[positions])
+    return state.with_data(df.loc[eq_mask(df, column_values), :])
+
+
+@command(pure=True)
 def teq(state, *column_values):
     """Tag-Equals filter. Expects, that a first row contains tags and/or metadata
     Tag row is ignored in comparison, but prepended to the result (in order to maintain the first row in the results).
@@ -206,18 +464,12 @@ def teq(state, *column_values):
     df = df.iloc[1:, :]
     assert state.type_identifier == "dataframe"
     for i in range(0, len(column_values), 2):
-        c = column_values[i]
-        v = column_values[i + 1]
-        state.log_info(f"Equals: {c} == {v}")
-        index = np.array([x == v for x in df[c]], bool)
-        try:
-            if int(v) == float(v):
-                index = index | (df[c] == int(v))
-            else:
-                index = index | (df[c] == float(v))
-        except:
-            pass
-        df = df.loc[index, :]
+        state.log_info(f"Equals: {column_values[i]} == {column_values[i + 1]}")
+    positions = _indexed_filter(state, df, "teq", column_values)
+    if positions is not None:
+        df = df.iloc[positions]
+    else:
+        df = df.loc[eq_mask(df, column_values), :]
     #df = tags.append(df, ignore_index=True)
     df = pd.concat([tags, df], ignore_index=True)
     return state.with_data(df)
@@ -232,10 +484,12 @@ def qsplit_df(state, *columns):
     can be overriden by query_column state variable.
     """
     df = state.get()
+    indices = df.groupby(by=list(columns)).indices
     if len(columns) == 1:
-        keys = [(x,) for x in sorted(df.groupby(by=list(columns)).groups.keys())]
+        keys = [(x,) for x in sorted(indices.keys())]
     else:
-        keys = sorted(df.groupby(by=list(columns)).groups.keys())
+        keys = sorted(indices.keys())
+    register_filter_index(state, df, "eq", columns, indices)
 
     query_column = state.vars.get("query_column")
     if query_column is None:
@@ -267,10 +521,12 @@ def qtsplit_df(state, *columns):
     tags = df.iloc[0]
     df = df.iloc[1:]
 
+    indices = df.groupby(by=list(columns)).indices
     if len(columns) == 1:
-        keys = [(x,) for x in sorted(df.groupby(by=list(columns)).groups.keys())]
+        keys = [(x,) for x in sorted(indices.keys())]
     else:
-        keys = sorted(df.groupby(by=list(columns)).groups.keys())
+        keys = sorted(indices.keys())
+    register_filter_index(state, df, "teq", columns, indices)
 
     query_column = state.vars.get("query_column")
     if query_column is None:
@@ -354,12 +610,123 @@ def tsplit_df(state, *columns):
     return state.with_data(df)
 
 
+class _PrefetchedStateCache(CacheProxy):
+    """Cache proxy returning already evaluated states (e.g. the parent of the split queries)
+    without consulting the underlying cache.
+    """
+
+    def __init__(self, cache, states):
+        super().__init__(cache)
+        self.states = states
+
+    def get(self, key):
+        state = self.states.get(key)
+        if state is not None:
+            return state
+        return self.cache.get(key)
+
+
+def evaluate_split(state, columns, kind="eq", query_column="query", context=None):
+    """Evaluate all the split queries (see qsplit_df and qtsplit_df) in one pass.
+    The state is the (already evaluated) dataframe to be split,
+    the split queries are taken from the query_column of the split dataframe.
+    The dataframe is split by a single groupby into a filter index (see register_filter_index),
+    which is used by the eq/teq filters instead of filtering the whole dataframe for each group,
+    thus the cache is populated with the results of all the split queries at once.
+    Returns the split dataframe (like qsplit_df or qtsplit_df).
+    """
+    context = get_context(context)
+    split_command = qtsplit_df if kind == "teq" else qsplit_df
+    # The split commands do not modify the input, the filter index they create is reused
+    sdf = split_command(state.shallow_clone(), *columns).get()
+    queries = list(sdf[query_column])
+    df = state.get()
+    if kind == "teq":
+        queries = queries[1:]
+        df = df.iloc[1:]
+
+    if register_filter_index(state, df, kind, columns) is None:
+        context.warning(
+            f"Dataframe can't be split by {', '.join(columns)} in one pass, queries are evaluated one by one"
+        )
+    cache = _PrefetchedStateCache(context.cache(), {state.query: state})
+    for query in context.progress_iter(queries):
+        context.child_context().evaluate(query, cache=cache)
+    return sdf
+
+
+def fanout(
+    query,
+    *columns,
+    downstream=None,
+    tags=False,
+    background=True,
+    priority=0,
+    query_column="query",
+    context=None,
+):
+    """Fan-out evaluation of a dataframe split.
+    The dataframe resulting from the query is split by columns (like qsplit_df or qtsplit_df if tags is True),
+    all the split queries are evaluated in one pass (see evaluate_split) and cached.
+    If downstream (a query string) is specified, it is appended to every split query,
+    e.g. downstream="groupby_mean-x-y" evaluates split_query/groupby_mean-x-y for every group.
+    The downstream queries are submitted to the worker pool (see liquer.pool.evaluate_in_background)
+    with the given priority if background is True, otherwise they are evaluated in the current process.
+    Returns a tuple (split dataframe, list of jobs or states of the downstream queries).
+    """
+    from liquer.parser import parse
+
+    context = get_context(context)
+    state = context.evaluate(query)
+    if state.is_error:
+        raise Exception(f"Failed to evaluate {query}")
+    kind = "teq" if tags else "eq"
+    sdf = evaluate_split(state, columns, kind=kind, query_column=query_column, context=context)
+    queries = list(sdf[query_column])
+    if tags:
+        queries = queries[1:]
+    results = []
+    if downstream is not None:
+        tq = parse(downstream).transform_query()
+        if tq is None:
+            raise Exception(f"Downstream query must be a transformation query: {downstream}")
+        if background:
+            from liquer.pool import evaluate_in_background
+
+        for q in queries:
+            dq = (parse(q) + tq).encode()
+            if background:
+                results.append(evaluate_in_background(dq, priority=priority))
+            else:
+                results.append(context.evaluate(dq))
+    return sdf, results
+
+
 @command
+def fanout_split_df(state, *columns, context=None):
+    """Split of dataframe by columns with fan-out evaluation of the split queries.
+    Creates the same dataframe as qsplit_df, but all the split queries are evaluated (and cached)
+    in a single pass over the dataframe.
+    """
+    sdf = evaluate_split(state, columns, kind="eq", context=context)
+    return state.with_data(sdf)
+
+
+@command
+def fanout_tsplit_df(state, *columns, context=None):
+    """Split of dataframe by columns with fan-out evaluation of the split queries
+    (version of fanout_split_df expecting a first row with tags).
+    """
+    sdf = evaluate_split(state, columns, kind="teq", context=context)
+    return state.with_data(sdf)
+
+
+@command(pure=True)
 def df_columns(df):
     return list(df.columns)
 
 
-@command
+@command(pure=True)
 def columns_info(df):
     if len(df):
         tags = {str(key): str(value) for key, value in dict(df.iloc[0, :]).items()}
@@ -384,7 +751,7 @@ def head_df(df, count=50):
         return df
 
 
-@command
+@command(pure=True)
 def groupby_mean(df, mean_column, *groupby_columns):
     return (
         df.groupby(groupby_columns)
@@ -468,7 +835,7 @@ class PandasConcatRecipe(Recipe):
 
 register_recipe(PandasConcatRecipe)
 
-@command
+@command(pure=True)
 def describe_df(df):
     """Wrapper around pandas describe"""
     return df.describe().reset_index()
@@ -8,13 +8,90 @@ from liquer.context import get_context
 import pandas as pd
 import polars as pl
 
+ARROW_MAGIC = b"ARROW1"
+PARQUET_MAGIC = b"PAR1"
+
+
+def detect_extension(b: bytes, default="feather"):
+    """Detect the binary data-frame format (feather or parquet) from the magic bytes"""
+    if b[:6] == ARROW_MAGIC:
+        return "feather"
+    if b[:4] == PARQUET_MAGIC:
+        return "parquet"
+    return default
+
+
+def read_polars(source, extension):
+    """Read a Polars data-frame from bytes or a file path.
+    Bytes are read directly (without copying into an intermediate buffer),
+    Arrow IPC (feather) files are memory-mapped by Polars when read from a path.
+    """
+    if extension == "feather":
+        return pl.read_ipc(source)
+    elif extension == "parquet":
+        return pl.read_parquet(source)
+    elif extension == "csv":
+        return pl.read_csv(source)
+    elif extension == "json":
+        return pl.read_json(source if isinstance(source, str) else BytesIO(source))
+    elif extension == "ndjson":
+        return pl.read_ndjson(source)
+    raise Exception(
+        f"Deserialization: file extension {extension} is not supported by polars data-frame type."
+    )
+
+
+def write_polars(data, extension):
+    """Serialize a Polars data-frame or lazy-frame to bytes.
+    Lazy-frames are streamed into the buffer (sink), so they are only evaluated when serialized.
+    """
+    output = BytesIO()
+    if isinstance(data, pl.LazyFrame):
+        if extension == "feather":
+            data.sink_ipc(output)
+        elif extension == "parquet":
+            data.sink_parquet(output)
+        elif extension == "csv":
+            data.sink_csv(output)
+        elif extension == "ndjson":
+            data.sink_ndjson(output)
+        elif extension == "json":
+            data.collect().write_json(output)
+        else:
+            raise Exception(
+                f"Serialization: file extension {extension} is not supported by polars lazy-frame type."
+            )
+        return output.getvalue()
+
+    if extension == "feather":
+        data.write_ipc(output)
+    elif extension == "parquet":
+        data.write_parquet(output)
+    elif extension == "csv":
+        data.write_csv(output)
+    elif extension == "json":
+        data.write_json(output)
+    elif extension == "ndjson":
+        data.write_ndjson(output)
+    else:
+        raise Exception(
+            f"Serialization: file extension {extension} is not supported by polars data-frame type."
+        )
+    return output.getvalue()
+
 
 class PolarsDataframeStateType(StateType):
+    """Polars data-frame state type.
+    Default serialization is the Arrow IPC file format (feather);
+    when deserializing with the default extension, the format (feather or parquet) is detected,
+    hence data cached with the former parquet default remain readable.
+    """
+
     def identifier(self):
         return "polars_dataframe"
 
     def default_extension(self):
-        return "parquet"
+        return "feather"
 
     def is_type_of(self, data):
         return isinstance(data, pl.DataFrame)
@@ -23,49 +100,21 @@ class PolarsDataframeStateType(StateType):
         if extension is None:
             extension = self.default_extension()
         assert self.is_type_of(data)
-        mimetype = mimetype_from_extension(extension)
-
-        if extension == "csv":
-            output = BytesIO()
-            data.write_csv(output)
-            return output.getvalue(), mimetype
-        elif extension == "parquet":
-            output = BytesIO()
-            data.write_parquet(output)
-            return output.getvalue(), mimetype
-        elif extension == "json":
-            output = BytesIO()
-            data.write_json(output)
-            return output.getvalue(), mimetype
-        elif extension == "ndjson":
-            output = BytesIO()
-            data.write_ndjson(output)
-            return output.getvalue(), mimetype
-        else:
-            raise Exception(
-                f"Serialization: file extension {extension} is not supported by polars data-frame type."
-            )
+        return write_polars(data, extension), mimetype_from_extension(extension)
 
     def from_bytes(self, b: bytes, extension=None):
         if extension is None:
-            extension = self.default_extension()
-        f = BytesIO()
-        f.write(b)
-        f.seek(0)
-        if extension == "csv":
-            return pl.read_csv(f)
-        elif extension == "parquet":
-            return pl.read_parquet(f)
-        elif extension == "json":
-            return pl.read_json(f)
-        elif extension == "ndjson":
-            return pl.read_ndjson(f)
-        raise Exception(
-            f"Deserialization: file extension {extension} is not supported by polars data-frame type."
-        )
-    
+            extension = detect_extension(b)
+        return read_polars(b, extension)
+
+    def from_file(self, path, extension=None):
+        if extension is None:
+            with open(path, "rb") as f:
+                extension = detect_extension(f.read(6))
+        return read_polars(str(path), extension)
+
     def copy(self, data):
-        return pl.from_pandas(data.to_pandas().copy())
+        return data.clone()
 
     def data_characteristics(self, data):
         return dict(
@@ -80,11 +129,17 @@ POLARS_DATAFRAME_STATE_TYPE = PolarsDataframeStateType()
 register_state_type(pl.DataFrame, POLARS_DATAFRAME_STATE_TYPE)
 
 class PolarsLazyframeStateType(StateType):
+    """Polars lazy-frame state type.
+    Lazy-frames stay lazy (copy and data characteristics do not collect them);
+    the query plan is executed only when the lazy-frame is serialized, e.g. by the cache.
+    Default serialization is the Arrow IPC file format (feather), see PolarsDataframeStateType.
+    """
+
     def identifier(self):
         return "polars_lazyframe"
 
     def default_extension(self):
-        return "parquet"
+        return "feather"
 
     def is_type_of(self, data):
         return isinstance(data, pl.LazyFrame)
@@ -93,55 +148,28 @@ class PolarsLazyframeStateType(StateType):
         if extension is None:
             extension = self.default_extension()
         assert self.is_type_of(data)
-        mimetype = mimetype_from_extension(extension)
-
-        if extension == "csv":
-            output = BytesIO()
-            data.collect().write_csv(output)
-            return output.getvalue(), mimetype
-        elif extension == "parquet":
-            output = BytesIO()
-            data.collect().write_parquet(output)
-            return output.getvalue(), mimetype
-        elif extension == "json":
-            output = BytesIO()
-            data.collect().write_json(output)
-            return output.getvalue(), mimetype
-        elif extension == "ndjson":
-            output = BytesIO()
-            data.collect().write_ndjson(output)
-            return output.getvalue(), mimetype
-        else:
-            raise Exception(
-                f"Serialization: file extension {extension} is not supported by polars lazy-frame type."
-            )
+        return write_polars(data, extension), mimetype_from_extension(extension)
 
     def from_bytes(self, b: bytes, extension=None):
         if extension is None:
-            extension = self.default_extension()
-        f = BytesIO()
-        f.write(b)
-        f.seek(0)
-        if extension == "csv":
-            return pl.scan_csv(f)
-        elif extension == "parquet":
-            return pl.scan_parquet(f)
-        elif extension == "json":
-            return pl.read_json(f).lazy()
-        elif extension == "ndjson":
-            return pl.scan_ndjson(f)
-        raise Exception(
-            f"Deserialization: file extension {extension} is not supported by polars lazy-frame type."
-        )
-    
+            extension = detect_extension(b)
+        return read_polars(b, extension).lazy()
+
+    def from_file(self, path, extension=None):
+        if extension is None:
+            with open(path, "rb") as f:
+                extension = detect_extension(f.read(6))
+        return read_polars(str(path), extension).lazy()
+
     def copy(self, data):
-        return pl.from_pandas(data.collect().to_pandas().copy()).lazy()
+        return data.clone()
 
     def data_characteristics(self, data):
+        columns = data.collect_schema().names()
         return dict(
-            description=f"Polars lazy-frame with {data.width} columns.",
-            columns=list(data.columns),
-            number_of_columns=data.width,
+            description=f"Polars lazy-frame with {len(columns)} columns.",
+            columns=columns,
+            number_of_columns=len(columns),
             number_of_rows=None,
         )
 
@@ -181,21 +209,7 @@ class PolarsSQLContextStateType(StateType):
         if extension in ["pkl", "pickle"]:
             return pickle.loads(b)
 
-        f = BytesIO()
-        f.write(b)
-        f.seek(0)
-        if extension == "csv":
-            df = pl.read_csv(f)
-        elif extension == "parquet":
-            df = pl.read_parquet(f)
-        elif extension == "json":
-            df = pl.read_json(f)
-        elif extension == "ndjson":
-            df = pl.read_ndjson(f)
-        else:
-            raise Exception(f"Unsupported file extension: {extension}")
-        
-        return pl.SQLContext(df=df)
+        return pl.SQLContext(df=read_polars(b, extension))
     
     
     def copy(self, data):
@@ -111,28 +111,34 @@ def add(title, description, characteristics, key, type_identifier, client=None):
 def store_content_batch_generator(context, batch_size=16):
     store = context.store()
     batch=[]
-    for key in store.keys():
-        metadata = store.get_metadata(key)
-        print(f"Adding {key} to index")
-        description=metadata.get("description", "")
-        title=metadata.get("title", "")
-        if len(description)>0 or len(title)>0:
-            if len(title):
-                text=f"{title}\n\n{description}"
-            else:
-                text=description
-
-            batch.append(dict(
-                title=title,
-                description=description,
-                characteristics=metadata.get("characteristics", ""),
-                key=key,
-                type_identifier=metadata.get("type_identifier", ""),
-                text=text
-            ))
-        if len(batch)>=batch_size:
-            yield batch
-            batch=[]
+    keys = list(store.keys())
+    for i in range(0, len(keys), batch_size):
+        chunk = keys[i:i+batch_size]
+        metadata_many = store.get_metadata_many(chunk)
+        for key in chunk:
+            metadata = metadata_many.get(key)
+            if metadata is None:
+                continue
+            print(f"Adding {key} to index")
+            description=metadata.get("description", "")
+            title=metadata.get("title", "")
+            if len(description)>0 or len(title)>0:
+                if len(title):
+                    text=f"{title}\n\n{description}"
+                else:
+                    text=description
+
+                batch.append(dict(
+                    title=title,
+                    description=description,
+                    characteristics=metadata.get("characteristics", ""),
+                    key=key,
+                    type_identifier=metadata.get("type_identifier", ""),
+                    text=text
+                ))
+            if len(batch)>=batch_size:
+                yield batch
+                batch=[]
 
     if len(batch)>0:
         yield batch
@@ -10,6 +10,7 @@ from whoosh.query import Every
 
 _schema = None
 _ix = None
+REINDEX_BATCH_SIZE = 256
 
 
 def init(dir="whoosh_index"):
@@ -77,18 +78,24 @@ def reindex_store(context=None):
 
     with get_writer() as writer:
         store = context.store()
-        for key in store.keys():
-            metadata = store.get_metadata(key)
-            print(f"Adding {key} to index")
-            add(
-                title=metadata.get("title", ""),
-                description=metadata.get("description", ""),
-                characteristics=metadata.get("characteristics", ""),
-                key=key,
-                type_identifier=metadata.get("type_identifier", ""),
-                commit=False,
-                writer=writer,
-            )
+        keys = list(store.keys())
+        for i in range(0, len(keys), REINDEX_BATCH_SIZE):
+            chunk = keys[i : i + REINDEX_BATCH_SIZE]
+            metadata_many = store.get_metadata_many(chunk)
+            for key in chunk:
+                metadata = metadata_many.get(key)
+                if metadata is None:
+                    continue
+                print(f"Adding {key} to index")
+                add(
+                    title=metadata.get("title", ""),
+                    description=metadata.get("description", ""),
+                    characteristics=metadata.get("characteristics", ""),
+                    key=key,
+                    type_identifier=metadata.get("type_identifier", ""),
+                    commit=False,
+                    writer=writer,
+                )
         # writer.commit()
 
 
@@ -3,7 +3,7 @@ from liquer.query import evaluate_template
 import liquer.ext.basic
 from liquer.context import *
 import traceback
-import json
+import liquer.json_codec as json_codec
 
 
 @first_command(ns="meta")
@@ -63,7 +63,15 @@ def metadata(state):
 @command(ns="meta")
 def metadata_txt(state):
     """Returns dictionary with all metadata for the resulting state"""
-    return json.dumps({**state.metadata}, indent=2)
+    return json_codec.dumps({**state.metadata}, indent=2)
+
+
+@command(ns="meta")
+def profile_txt(state):
+    """Returns the collapsed-stack profile of the state (if it was evaluated with profiling enabled).
+    The result can be used to create a flame graph, e.g. by flamegraph.pl or speedscope.
+    """
+    return state.metadata.get("profile", {}).get("collapsed", "")
 
 
 @command(ns="meta")
@@ -217,11 +225,18 @@ def dir_status(metadata, context=None):
     store = context.store()
     data = []
     if store.is_dir(key):
-        for name in store.listdir(key):
-            try:
-                metadata = store.get_metadata(store.join_key(key, name))
-            except:
-                context.warning(f"Can't read metadata for {store.join_key(key, name)}", traceback=traceback.format_exc())
+        names = store.listdir(key) or []
+        try:
+            metadata_many = store.get_metadata_many(
+                [store.join_key(key, name) for name in names]
+            )
+        except:
+            context.warning(f"Can't read metadata in {key}", traceback=traceback.format_exc())
+            metadata_many = {}
+        for name in names:
+            metadata = metadata_many.get(store.join_key(key, name))
+            if metadata is None:
+                context.warning(f"Can't read metadata for {store.join_key(key, name)}")
                 continue
             fileinfo = metadata.get("fileinfo", {})
             data.append(
@@ -327,6 +342,9 @@ def clean_recipes(metadata, recursive=False, context=None):
 def make_recipes(metadata, recursive=False, context=None):
     """Make all the data in the directory of a store that has a recipe.
     This is supposed to be used together with a RecipeStore, that creates has_recipe flag in the metadata.
+    Only data that are not made yet, failed or are outdated (EXPIRED) are made.
+    Outdated data are detected when the store is synchronized (see RecipeSpecStore.mark_outdated),
+    which is done before making the recipes.
     Data can be optionally cleaned recursively in all the subdirectories.
     """
     context = get_context(context)
@@ -336,6 +354,7 @@ def make_recipes(metadata, recursive=False, context=None):
 
     key = metadata["key"]
     store = context.store()
+    store.sync()
     processed = []
     if store.is_dir(key):
         if key in ("", None):
@@ -358,7 +377,10 @@ def make_recipes(metadata, recursive=False, context=None):
                 Status.ERROR.value,
                 Status.EXPIRED.value,
             ):
-                context.info(f"Make {key}")
+                if metadata.get("outdated"):
+                    context.info(f"Make {key} (outdated: {'; '.join(metadata['outdated'])})")
+                else:
+                    context.info(f"Make {key}")
                 store.remove(key)
                 store.get_bytes(key)
                 processed.append(key)
@@ -0,0 +1,171 @@
+"""Instrumentation of the query evaluation.
+
+Evaluation of a query is split into phases (see PHASES):
+parsing, cache lookup, evaluation of the predecessor, argument parsing (including the evaluation of links),
+command execution, serialization (when storing the result), cache store, metadata writes and indexing.
+
+The time spent in each phase is accumulated per evaluated query by the context
+and recorded in the metadata under the "timings" key (in seconds).
+Timing hooks - callables taking the phase, duration (in seconds) and query - can be registered by add_timing_hook
+to collect the timings. The Metrics collector (see enable_metrics) aggregates the timings per phase
+and exports them in the Prometheus/OpenMetrics text format, which is served by the /api/metrics endpoint.
+"""
+import logging
+import threading
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+PARSE = "parse"
+CACHE_GET = "cache_get"
+PREDECESSOR = "predecessor"
+ARGUMENTS = "arguments"
+COMMAND = "command"
+SERIALIZATION = "serialization"
+CACHE_STORE = "cache_store"
+STORE_METADATA = "store_metadata"
+INDEX = "index"
+
+PHASES = [
+    PARSE,
+    CACHE_GET,
+    PREDECESSOR,
+    ARGUMENTS,
+    COMMAND,
+    SERIALIZATION,
+    CACHE_STORE,
+    STORE_METADATA,
+    INDEX,
+]
+
+_timing_hooks = []
+
+
+def add_timing_hook(hook):
+    """Register a timing hook - a callable hook(phase, duration, query) called after each timed phase"""
+    if hook not in _timing_hooks:
+        _timing_hooks.append(hook)
+    return hook
+
+
+def remove_timing_hook(hook):
+    """Unregister a timing hook"""
+    if hook in _timing_hooks:
+        _timing_hooks.remove(hook)
+
+
+def record_timing(timings, phase, duration, query=None):
+    """Add the duration of a phase to the timings dictionary and call the timing hooks"""
+    timings[phase] = timings.get(phase, 0.0) + duration
+    for hook in _timing_hooks:
+        try:
+            hook(phase, duration, query)
+        except Exception:
+            logger.exception("Timing hook %r failed", hook)
+
+
+class Timer(object):
+    """Context manager measuring the duration of a phase, see record_timing"""
+
+    __slots__ = ("timings", "phase", "query", "start")
+
+    def __init__(self, timings, phase, query=None):
+        self.timings = timings
+        self.phase = phase
+        self.query = query
+        self.start = None
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        record_timing(
+            self.timings, self.phase, perf_counter() - self.start, self.query
+        )
+        return False
+
+
+DEFAULT_BUCKETS = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0, 60.0)
+
+
+class Metrics(object):
+    """Timing hook aggregating the phase durations: count, sum and histogram per phase"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix="liquer_evaluation_phase"):
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.count = {}
+            self.sum = {}
+            self.histogram = {}
+
+    def __call__(self, phase, duration, query=None):
+        with self.lock:
+            self.count[phase] = self.count.get(phase, 0) + 1
+            self.sum[phase] = self.sum.get(phase, 0.0) + duration
+            histogram = self.histogram.get(phase)
+            if histogram is None:
+                histogram = self.histogram[phase] = [0] * len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram[i] += 1
+
+    def as_dict(self):
+        """Aggregated timings as a dictionary: phase -> dict(count, sum)"""
+        with self.lock:
+            return {
+                phase: dict(count=count, sum=self.sum[phase])
+                for phase, count in self.count.items()
+            }
+
+    def to_openmetrics(self):
+        """Metrics in the Prometheus/OpenMetrics text exposition format"""
+        name = f"{self.prefix}_seconds"
+        lines = [
+            f"# HELP {name} Time spent in the query evaluation phases.",
+            f"# TYPE {name} histogram",
+        ]
+        with self.lock:
+            for phase in sorted(self.count):
+                label = f'phase="{phase}"'
+                for bound, value in zip(self.buckets, self.histogram[phase]):
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {value}')
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {self.count[phase]}')
+                lines.append(f"{name}_count{{{label}}} {self.count[phase]}")
+                lines.append(f"{name}_sum{{{label}}} {self.sum[phase]}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+_metrics = None
+
+
+def enable_metrics(metrics=None):
+    """Start collecting the evaluation metrics (served by the /api/metrics endpoint).
+    Returns the Metrics object.
+    """
+    global _metrics
+    disable_metrics()
+    _metrics = Metrics() if metrics is None else metrics
+    add_timing_hook(_metrics)
+    return _metrics
+
+
+def disable_metrics():
+    """Stop collecting the evaluation metrics"""
+    global _metrics
+    if _metrics is not None:
+        remove_timing_hook(_metrics)
+    _metrics = None
+
+
+def get_metrics():
+    """Return the Metrics object or None if metrics are not enabled"""
+    return _metrics
@@ -0,0 +1,192 @@
+"""Pluggable JSON codec used for metadata and JSON-serialized states.
+
+The fastest available implementation is used by default: orjson, msgspec or the standard json module.
+The implementation can be selected explicitly by set_json_codec.
+
+Fast codecs fall back to the standard json module for the (rare) cases they do not support
+- e.g. integers exceeding 64 bits, indentation other than 2, or NaN in the parsed input,
+hence the results are compatible with the standard json module.
+Note that fast codecs produce compact JSON (without spaces after separators)
+and serialize NaN as null.
+"""
+import json
+from collections.abc import Mapping
+
+JSONDecodeError = json.JSONDecodeError
+
+_codecs = {}
+_json_codec = None
+
+
+def _default(obj):
+    """Serialize mappings which are not dictionaries (e.g. lazy data characteristics)"""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_dumpb(obj, indent=None, sort_keys=False):
+    return json.dumps(obj, indent=indent, sort_keys=sort_keys, default=_default).encode(
+        "utf-8"
+    )
+
+
+class JsonCodec(object):
+    """JSON codec based on the standard json module"""
+
+    name = "json"
+
+    def is_available(self):
+        return True
+
+    def dumps(self, obj, indent=None, sort_keys=False):
+        """Serialize obj to a JSON string"""
+        return json.dumps(obj, indent=indent, sort_keys=sort_keys, default=_default)
+
+    def dumpb(self, obj, indent=None, sort_keys=False):
+        """Serialize obj to JSON encoded as utf-8 bytes"""
+        return self.dumps(obj, indent=indent, sort_keys=sort_keys).encode("utf-8")
+
+    def loads(self, s):
+        """Deserialize JSON from a string or (utf-8) bytes"""
+        return json.loads(s)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+class OrjsonCodec(JsonCodec):
+    """JSON codec based on orjson"""
+
+    name = "orjson"
+
+    def is_available(self):
+        try:
+            import orjson
+
+            return True
+        except ImportError:
+            return False
+
+    def dumpb(self, obj, indent=None, sort_keys=False):
+        import orjson
+
+        if indent not in (None, 2):
+            return _stdlib_dumpb(obj, indent=indent, sort_keys=sort_keys)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except TypeError:
+            return _stdlib_dumpb(obj, indent=indent, sort_keys=sort_keys)
+
+    def dumps(self, obj, indent=None, sort_keys=False):
+        return self.dumpb(obj, indent=indent, sort_keys=sort_keys).decode("utf-8")
+
+    def loads(self, s):
+        import orjson
+
+        try:
+            return orjson.loads(s)
+        except ValueError:
+            return json.loads(s)
+
+
+class MsgspecCodec(JsonCodec):
+    """JSON codec based on msgspec"""
+
+    name = "msgspec"
+
+    def __init__(self):
+        self._encoder = None
+        self._sorted_encoder = None
+        self._decoder = None
+
+    def is_available(self):
+        try:
+            import msgspec
+
+            return True
+        except ImportError:
+            return False
+
+    def dumpb(self, obj, indent=None, sort_keys=False):
+        import msgspec
+
+        if self._encoder is None:
+            self._encoder = msgspec.json.Encoder(enc_hook=_default)
+            self._sorted_encoder = msgspec.json.Encoder(
+                enc_hook=_default, order="sorted"
+            )
+        try:
+            b = (self._sorted_encoder if sort_keys else self._encoder).encode(obj)
+        except (TypeError, OverflowError, msgspec.EncodeError):
+            return _stdlib_dumpb(obj, indent=indent, sort_keys=sort_keys)
+        if indent is not None:
+            b = msgspec.json.format(b, indent=indent)
+        return b
+
+    def dumps(self, obj, indent=None, sort_keys=False):
+        return self.dumpb(obj, indent=indent, sort_keys=sort_keys).decode("utf-8")
+
+    def loads(self, s):
+        import msgspec
+
+        if self._decoder is None:
+            self._decoder = msgspec.json.Decoder()
+        try:
+            return self._decoder.decode(s)
+        except msgspec.DecodeError:
+            return json.loads(s)
+
+
+def register_json_codec(codec):
+    """Register a JSON codec under its name"""
+    _codecs[codec.name] = codec
+
+
+register_json_codec(JsonCodec())
+register_json_codec(OrjsonCodec())
+register_json_codec(MsgspecCodec())
+
+
+def set_json_codec(name=None):
+    """Select the JSON codec by name (json, orjson or msgspec).
+    If name is None, the fastest available codec is selected.
+    """
+    global _json_codec
+    if name is None:
+        for name in ("orjson", "msgspec", "json"):
+            if _codecs[name].is_available():
+                break
+    if name not in _codecs:
+        raise Exception(f"Unknown JSON codec: {name}")
+    if not _codecs[name].is_available():
+        raise Exception(f"JSON codec {name} is not available (package missing)")
+    _json_codec = _codecs[name]
+    return _json_codec
+
+
+def get_json_codec():
+    """Get the current JSON codec"""
+    if _json_codec is None:
+        set_json_codec()
+    return _json_codec
+
+
+def dumps(obj, indent=None, sort_keys=False):
+    """Serialize obj to a JSON string with the current JSON codec"""
+    return get_json_codec().dumps(obj, indent=indent, sort_keys=sort_keys)
+
+
+def dumpb(obj, indent=None, sort_keys=False):
+    """Serialize obj to utf-8 encoded JSON bytes with the current JSON codec"""
+    return get_json_codec().dumpb(obj, indent=indent, sort_keys=sort_keys)
+
+
+def loads(s):
+    """Deserialize JSON string or bytes with the current JSON codec"""
+    return get_json_codec().loads(s)
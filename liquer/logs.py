@@ -0,0 +1,114 @@
+"""Logging support.
+
+LiQuer logs through the standard logging module; each module uses its own logger
+(e.g. liquer.context, liquer.cache), hence the verbosity can be set per module (see set_log_levels).
+Messages are formatted lazily (logger.debug("... %s", x)), i.e. disabled messages cost only a level check.
+
+Debug entries can be collected in a ring buffer (see enable_debug_buffer) instead of being written
+to the standard output, which keeps the most recent entries available for inspection
+without flooding the logs.
+"""
+import logging
+import threading
+from collections import deque
+
+ROOT_LOGGER = "liquer"
+
+
+def set_log_level(level, module=ROOT_LOGGER):
+    """Set the log level of a module (logger name), e.g. set_log_level("DEBUG", "liquer.cache")"""
+    if isinstance(level, str):
+        level = level.upper()
+    logging.getLogger(module).setLevel(level)
+
+
+def set_log_levels(levels):
+    """Set log levels per module from a dictionary module -> level"""
+    for module, level in levels.items():
+        set_log_level(level, module)
+
+
+class RingBufferHandler(logging.Handler):
+    """Logging handler keeping the most recent log records in a ring buffer.
+    Messages are formatted when the record is emitted (i.e. only for enabled levels),
+    so that the buffer does not keep references to the arguments, which may change
+    (or be large) before the entries are requested.
+    """
+
+    def __init__(self, capacity=1000, level=logging.DEBUG):
+        super().__init__(level)
+        self.buffer = deque(maxlen=capacity)
+        self.buffer_lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        return self.buffer.maxlen
+
+    def emit(self, record):
+        try:
+            message = record.getMessage()
+        except Exception:
+            message = str(record.msg)
+        record.msg = message
+        record.args = None
+        with self.buffer_lock:
+            self.buffer.append(record)
+
+    def clear(self):
+        with self.buffer_lock:
+            self.buffer.clear()
+
+    def records(self):
+        """List of the buffered log records"""
+        with self.buffer_lock:
+            return list(self.buffer)
+
+    def entries(self):
+        """Buffered log entries as (JSON-able) dictionaries"""
+        return [
+            dict(
+                time=record.created,
+                level=record.levelname,
+                logger=record.name,
+                message=record.msg,
+            )
+            for record in self.records()
+        ]
+
+    def __len__(self):
+        return len(self.buffer)
+
+
+_debug_buffer = None
+
+
+def enable_debug_buffer(capacity=1000, module=ROOT_LOGGER):
+    """Collect debug entries of a module (and its submodules) in a ring buffer.
+    The log level of the module is set to DEBUG. The records are still propagated
+    to the parent loggers, whose handlers apply their own levels
+    (the default handler of the standard logging module only reports warnings and errors).
+    Returns the RingBufferHandler.
+    """
+    global _debug_buffer
+    disable_debug_buffer()
+    _debug_buffer = RingBufferHandler(capacity)
+    _debug_buffer.module = module
+    logger = logging.getLogger(module)
+    logger.addHandler(_debug_buffer)
+    logger.setLevel(logging.DEBUG)
+    return _debug_buffer
+
+
+def disable_debug_buffer():
+    """Stop collecting the debug entries in the ring buffer"""
+    global _debug_buffer
+    if _debug_buffer is not None:
+        logger = logging.getLogger(_debug_buffer.module)
+        logger.removeHandler(_debug_buffer)
+        logger.setLevel(logging.NOTSET)
+    _debug_buffer = None
+
+
+def get_debug_buffer():
+    """Return the RingBufferHandler collecting the debug entries or None if not enabled"""
+    return _debug_buffer
@@ -12,9 +12,74 @@ This should slowly be replaced by the Metadata class, which provides high-level
 """
 from liquer.constants import Status
 from liquer.util import timestamp
-from liquer.dependencies import Dependencies
-from copy import deepcopy
-import json
+from liquer.dependencies import Dependencies, copy_dependencies
+import liquer.json_codec as json_codec
+from typing import Any, Dict, List, Optional, TypedDict
+
+
+class MetadataDict(TypedDict, total=False):
+    """Typed schema of the metadata dictionary (core fields).
+    Metadata may contain additional fields (e.g. title, mimetype, data_characteristics, fileinfo).
+    """
+
+    query: Optional[str]
+    key: Optional[str]
+    status: str
+    type_identifier: Optional[str]
+    message: str
+    is_error: bool
+    log: List[Dict[str, Any]]
+    child_log: List[Dict[str, Any]]
+    dependencies: Dict[str, Any]
+
+
+# Required metadata fields: name -> (allowed types, default value factory)
+METADATA_SCHEMA = dict(
+    log=((list,), list),
+    child_log=((list,), list),
+    query=((str, type(None)), lambda: None),
+    status=((str,), lambda: Status.NONE.value),
+    type_identifier=((str, type(None)), lambda: None),
+    message=((str, type(None)), lambda: ""),
+    is_error=((bool,), lambda: False),
+)
+
+
+def validate_metadata(metadata):
+    """Check the metadata dictionary against the METADATA_SCHEMA.
+    Returns a list of problems (empty if metadata are valid).
+    """
+    if not isinstance(metadata, dict):
+        return [f"Metadata must be a dictionary, not {type(metadata)}"]
+    problems = []
+    for name, (types, default) in METADATA_SCHEMA.items():
+        if name not in metadata:
+            problems.append(f"Missing field {name}")
+        elif not isinstance(metadata[name], types):
+            problems.append(
+                f"Field {name} has a wrong type {type(metadata[name]).__name__}"
+            )
+    return problems
+
+
+def copy_metadata(metadata):
+    """Copy a metadata dictionary sharing the values with the original (structural sharing).
+    Top-level lists and dictionaries (e.g. log, vars, attributes) are copied,
+    so they can be appended to or updated without affecting the original,
+    but their items (e.g. log entries) are shared - log entries are never modified once logged.
+    Dependencies are copied as well, since they are updated in place.
+    Unlike a deep copy, the cost does not depend on the size of the log entries
+    and no copies of the nested structures are made.
+    """
+    metadata = {
+        key: list(value)
+        if type(value) is list
+        else (dict(value) if type(value) is dict else value)
+        for key, value in metadata.items()
+    }
+    if type(metadata.get("dependencies")) is dict:
+        metadata["dependencies"] = copy_dependencies(metadata["dependencies"])
+    return metadata
 
 
 class Metadata:
@@ -32,24 +97,17 @@ class Metadata:
 
     @classmethod
     def from_string(cls, string):
-        return cls(json.loads(string))
+        return cls(json_codec.loads(string))
+
+    def to_string(self):
+        """Serialize metadata to a JSON string"""
+        return json_codec.dumps(self.metadata)
 
     def set_metadata(self, metadata):
         """Fills the missing fields and sets the metadata from a dictionary"""
-        if "log" not in metadata:
-            metadata["log"] = []
-        if "child_log" not in metadata:
-            metadata["child_log"] = []
-        if "query" not in metadata:
-            metadata["query"] = None
-        if "status" not in metadata:
-            metadata["status"] = Status.NONE.value
-        if "type_identifier" not in metadata:
-            metadata["type_identifier"] = None
-        if "message" not in metadata:
-            metadata["message"] = ""
-        if "is_error" not in metadata:
-            metadata["is_error"] = False
+        for name, (types, default) in METADATA_SCHEMA.items():
+            if name not in metadata:
+                metadata[name] = default()
         metadata["dependencies"] = Dependencies(
             metadata.get("dependencies", dict(query=metadata["query"]))
         ).as_dict()
@@ -128,19 +186,34 @@ class Metadata:
     def as_dict(self):
         """Represent metadata as a dictionary - suitable for json serialization
         State data is NOT part of the returned dictionary.
+        The returned dictionary is a snapshot sharing the log entries with the metadata (see copy_metadata).
         """
-        return deepcopy(self.metadata)
+        return copy_metadata(self.metadata)
+
+    def validate(self):
+        """Returns a list of problems found by validating against METADATA_SCHEMA"""
+        return validate_metadata(self.metadata)
 
     def add_command_dependency(self, ns, command_metadata, detect_collisions=True):
-        dependencies = Dependencies(self.metadata["dependencies"])
-        dependencies.add_command_dependency(ns, command_metadata, detect_collisions)
-        self.metadata["dependencies"] = dependencies.as_dict()
+        Dependencies(self.metadata["dependencies"]).add_command_dependency(
+            ns, command_metadata, detect_collisions
+        )
         return self
 
     def add_recipe_dependency(self, recipe, detect_collisions=True):
-        dependencies = Dependencies(self.metadata["dependencies"])
-        dependencies.add_recipe_dependency(recipe, detect_collisions)
-        self.metadata["dependencies"] = dependencies.as_dict()
+        Dependencies(self.metadata["dependencies"]).add_recipe_dependency(
+            recipe, detect_collisions
+        )
+        return self
+
+    def add_resource_dependency(self, key, metadata, detect_collisions=True):
+        Dependencies(self.metadata["dependencies"]).add_resource_dependency(
+            key, metadata, detect_collisions
+        )
+        return self
+
+    def merge_dependencies(self, dependencies):
+        Dependencies(self.metadata["dependencies"]).merge(dependencies)
         return self
 
     def clear_log(self):
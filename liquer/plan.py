@@ -0,0 +1,165 @@
+"""Compiled query plans.
+
+Besides the work done by the commands, evaluation of a query involves parsing the query string,
+resolving the commands in the active namespaces and parsing the action arguments.
+For short, frequently evaluated queries this overhead dominates.
+The query planner caches the results of these steps:
+
+* parsed queries (by the query string) - the cached Query objects are shared, hence must not be modified,
+* action plans - resolved command executable and metadata, arguments pre-parsed from the constant
+  (string) action parameters and precomputed metadata describing the action.
+
+Plans are tied to a command registry and invalidated when the registry changes
+(i.e. when a command is registered). The active namespaces are part of the plan key.
+"""
+import threading
+from collections import OrderedDict
+from liquer.parser import parse, StringActionParameter
+
+
+class _ContextPlaceholder(object):
+    """Stands for the context argument while pre-parsing the arguments of an action.
+    The placeholder is replaced by the actual context when the action is executed.
+    """
+
+    raw_query = None
+
+    def debug(self, message, *args):
+        pass
+
+    def warning(self, message, traceback=None):
+        pass
+
+
+_CONTEXT_PLACEHOLDER = _ContextPlaceholder()
+
+
+class ActionPlan(object):
+    """Compiled action: resolved command and (if possible) pre-parsed arguments"""
+
+    def __init__(self, action, ns, command, command_metadata):
+        self.action = action
+        self.ns = ns
+        self.command = command
+        self.command_metadata = command_metadata
+        self.qcommand = action.to_list()
+        self.action_description = f"{action.encode()} at {action.position}"
+        try:
+            self.command_metadata_dict = command_metadata._asdict()
+        except:
+            self.command_metadata_dict = {}
+        self.argv = None
+        self.argmeta = None
+        if command is not None and all(
+            isinstance(p, StringActionParameter) for p in action.parameters
+        ):
+            try:
+                self.argv, self.argmeta = command.parse_argv(
+                    action.parameters, context=_CONTEXT_PLACEHOLDER
+                )
+            except Exception:
+                # Parsing errors are reported when the action is evaluated
+                self.argv, self.argmeta = None, None
+
+    def is_compiled(self):
+        """True if the arguments are pre-parsed, i.e. the action can be executed by execute"""
+        return self.argv is not None
+
+    def arguments(self, context=None):
+        """Pre-parsed arguments and argument metadata with the context filled in"""
+
+        def fill(x):
+            if x is _CONTEXT_PLACEHOLDER:
+                return context
+            if type(x) is list:
+                return list(x)
+            return x
+
+        argv = [fill(x) for x in self.argv]
+        argmeta = [(fill(value), meta) for value, meta in self.argmeta]
+        return argv, argmeta
+
+    def execute(self, state, context=None):
+        """Execute the command with the pre-parsed arguments on a state"""
+        argv, argmeta = self.arguments(context)
+        return self.command.execute(state, argv, argmeta)
+
+    def __repr__(self):
+        return f"ActionPlan({repr(self.qcommand)}, ns={repr(self.ns)}, compiled={self.is_compiled()})"
+
+
+class QueryPlanner(object):
+    """Cache of parsed queries and compiled action plans"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.queries = OrderedDict()
+        self.plans = OrderedDict()
+        self.registry = None
+        self.generation = None
+
+    def clear(self):
+        with self.lock:
+            self.queries.clear()
+            self.plans.clear()
+
+    def _get(self, cache, key):
+        with self.lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _put(self, cache, key, value):
+        with self.lock:
+            cache[key] = value
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+
+    def parse(self, query):
+        """Parse a query string; the returned Query object is shared and must not be modified"""
+        parsed = self._get(self.queries, query)
+        if parsed is None:
+            parsed = parse(query)
+            self._put(self.queries, query, parsed)
+        return parsed
+
+    def action_plan(self, registry, state, action):
+        """Get (possibly cached) plan of an action evaluated on a state"""
+        generation = getattr(registry, "generation", None)
+        if registry is not self.registry or generation != self.generation:
+            with self.lock:
+                self.plans.clear()
+                self.registry = registry
+                self.generation = generation
+        if not all(isinstance(p, StringActionParameter) for p in action.parameters):
+            ns, command, command_metadata = registry.resolve_command(
+                state, action.name
+            )
+            return ActionPlan(action, ns, command, command_metadata)
+        key = (
+            tuple(state.vars.get("active_namespaces", ["root"])),
+            action.name,
+            tuple(p.string for p in action.parameters),
+            str(action.position),
+        )
+        plan = self._get(self.plans, key)
+        if plan is None:
+            ns, command, command_metadata = registry.resolve_command(
+                state, action.name
+            )
+            plan = ActionPlan(action, ns, command, command_metadata)
+            self._put(self.plans, key, plan)
+        return plan
+
+
+_query_planner = None
+
+
+def query_planner():
+    """Return the global query planner"""
+    global _query_planner
+    if _query_planner is None:
+        _query_planner = QueryPlanner()
+    return _query_planner
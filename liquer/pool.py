@@ -3,13 +3,37 @@ Use *evaluate_in_background* and *evaluate_and_save_in_background* to run Liquer
 using a pool.
 
 The pool module relies on liquer.config to configure the cache and store.
+
+Pool workers are initialized once (modules, cache and store) by the pool initializer
+and the configured objects are reused by all the tasks running in the worker.
+Every change of the worker configuration increments the configuration version;
+a worker re-initializes itself when it receives a task with a newer configuration version.
+
+Central cache and store live in a manager process (PoolManager). To keep the manager responsive,
+large payloads (states and data) are not sent through the manager connection:
+they are written to a temporary file (in /dev/shm, i.e. shared memory, if available),
+only the file name is passed to the manager and the receiving side reads the file via mmap.
+The manager serves each connection in a separate thread, thus the workers are not blocked
+by each other while transferring large payloads.
 """
 import multiprocessing as mp
 from multiprocessing.managers import BaseManager
 from os import getpid
+import os
 from time import sleep
-from liquer.cache import set_cache, CacheProxy, NoCache
-from liquer.store import set_store, ProxyStore, Store
+from collections import deque
+from enum import Enum
+import heapq
+import itertools
+import mmap
+import pickle
+import tempfile
+import threading
+import uuid
+import liquer.util as util
+from liquer.cache import set_cache, CacheProxy, CacheMixin, NoCache
+from liquer.store import set_store, ProxyStore, Store, KeyNotSupportedStoreException
+from io import BytesIO
 from liquer import *
 from liquer.constants import *
 import logging
@@ -17,11 +41,176 @@ import logging
 logger = logging.getLogger(__name__)
 worker_logger = logging.getLogger(__name__ + ".worker")
 
-class SafeProxyStore(ProxyStore):
+TRANSPORT_THRESHOLD = 1024 * 1024
+
+
+def transport_directory():
+    """Directory used for transporting large payloads between processes.
+    Shared memory filesystem (/dev/shm) is used if available.
+    """
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def pack_payload(obj, threshold=TRANSPORT_THRESHOLD):
+    """Pickle an object for the transport between processes.
+    Small objects are returned inline as ("inline", bytes),
+    objects larger than threshold are written to a temporary file and ("file", path) is returned.
+    The file is owned (and removed) by the receiver, see unpack_payload.
+    """
+    b = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    if threshold is None or len(b) < threshold:
+        return ("inline", b)
+    fd, path = tempfile.mkstemp(prefix="liquer-", suffix=".payload", dir=transport_directory())
+    with os.fdopen(fd, "wb") as f:
+        f.write(b)
+    return ("file", path)
+
+
+def unpack_payload(payload):
+    """Unpickle an object packed by pack_payload, the temporary file is removed."""
+    kind, value = payload
+    if kind == "inline":
+        return pickle.loads(value)
+    try:
+        with open(value, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return pickle.loads(m)
+    finally:
+        os.remove(value)
+
+
+class TransportMixin:
+    """Server side of the payload transport (see pack_payload).
+    Method transported_call is exposed by the manager proxy.
+    """
+
+    def transported_call(self, method, payload, threshold=TRANSPORT_THRESHOLD):
+        """Call a method with arguments from a packed payload, return packed result.
+        The threshold for the result is chosen by the client; None means that the result is always inline
+        (needed when the client does not share the filesystem, e.g. a remote worker).
+        """
+        args, kwargs = unpack_payload(payload)
+        result = getattr(self, method)(*args, **kwargs)
+        return pack_payload(result, threshold)
+
+
+class TransportClientMixin:
+    """Client side of the payload transport.
+    The proxy (a manager proxy of an object with TransportMixin) is expected in self._proxy.
+    """
+
+    transport_threshold = TRANSPORT_THRESHOLD
+
+    def _transported_call(self, method, *args, **kwargs):
+        payload = pack_payload((args, kwargs), self.transport_threshold)
+        try:
+            result = self._proxy.transported_call(
+                method, payload, self.transport_threshold
+            )
+        except:
+            if payload[0] == "file" and os.path.exists(payload[1]):
+                os.remove(payload[1])
+            raise
+        return unpack_payload(result)
+
+
+class SafeProxyStore(ProxyStore, TransportMixin):
     """Proxy store that fixes non-picklable results."""
     def keys(self):
         return list(super().keys())
 
+
+class TransportCacheProxy(CacheProxy, TransportMixin):
+    """Cache proxy supporting the payload transport."""
+    pass
+
+
+class TransportCache(TransportClientMixin, CacheMixin):
+    """Cache accessing a central cache (TransportCacheProxy in a PoolManager)
+    with states transported outside of the manager connection (see pack_payload).
+    """
+
+    def __init__(self, proxy, transport_threshold=TRANSPORT_THRESHOLD):
+        self._proxy = proxy
+        self.transport_threshold = transport_threshold
+
+    def clean(self):
+        self._proxy.clean()
+
+    def get(self, key):
+        return self._transported_call("get", key)
+
+    def get_metadata(self, key):
+        return self._proxy.get_metadata(key)
+
+    def store(self, state):
+        return self._transported_call("store", state)
+
+    def store_metadata(self, metadata):
+        return self._proxy.store_metadata(metadata)
+
+    def remove(self, key):
+        return self._proxy.remove(key)
+
+    def contains(self, key):
+        return self._proxy.contains(key)
+
+    def keys(self):
+        return self._proxy.keys()
+
+    def __str__(self):
+        return f"Transport cache of {str(self._proxy)}"
+
+    def __repr__(self):
+        return f"TransportCache({repr(self._proxy)})"
+
+
+class TransportStore(TransportClientMixin, ProxyStore):
+    """Store accessing a central store (SafeProxyStore in a PoolManager)
+    with data transported outside of the manager connection (see pack_payload).
+    """
+
+    def __init__(self, proxy, transport_threshold=TRANSPORT_THRESHOLD):
+        self._proxy = proxy
+        self._store = proxy
+        self.transport_threshold = transport_threshold
+
+    def get_bytes(self, key):
+        return self._transported_call("get_bytes", key)
+
+    def get_many(self, keys):
+        return self._transported_call("get_many", list(keys))
+
+    def store(self, key, data, metadata):
+        self._transported_call("store", key, data, metadata)
+        self.on_data_changed(key)
+        self.on_metadata_changed(key)
+
+    def store_many(self, items):
+        items = list(items)
+        self._transported_call("store_many", items)
+        for key, data, metadata in items:
+            self.on_data_changed(key)
+            self.on_metadata_changed(key)
+
+    def openbin(self, key, mode="r", buffering=-1):
+        mode = dict(r="rb", w="wb").get(mode, mode)
+        if mode == "rb":
+            return BytesIO(self.get_bytes(key))
+        raise KeyNotSupportedStoreException(key=key, store=self)
+
+    def clone(self):
+        """Clone the store."""
+        return self.__class__(self._proxy, self.transport_threshold)
+
+    def __str__(self):
+        return f"Transport store of {self._proxy}"
+
+    def __repr__(self):
+        return f"TransportStore({repr(self._proxy)})"
+
 class PoolManager(BaseManager):
     """Multiprocessing manager for the pool.
     Makes available the cache proxy to the pool workers.
@@ -29,7 +218,7 @@ class PoolManager(BaseManager):
     pass
 
 
-PoolManager.register("CacheProxy", CacheProxy)
+PoolManager.register("CacheProxy", TransportCacheProxy)
 PoolManager.register("ProxyStore", SafeProxyStore)
 
 _pool = None
@@ -39,9 +228,14 @@ def start_pool(processes=None):
     """Initializes/starts a multiprocessing pool.
     If a pool is not running, this function is called automatically by the *get_pool*,
     thus this does not need to be called by the user.
+    Workers are initialized with the current worker configuration (see *_initialize_worker*).
     """
     global _pool
-    _pool = mp.Pool(processes=processes)
+    _pool = mp.Pool(
+        processes=processes,
+        initializer=_initialize_worker,
+        initargs=(_worker_config, _worker_config_version),
+    )
     return _pool
 
 
@@ -56,6 +250,56 @@ def get_pool():
 
 
 _worker_config = None
+_worker_config_version = 0
+
+# Version of the configuration the current worker process has been initialized with
+_worker_initialized_version = None
+
+
+def _update_worker_config(**kwarg):
+    """Update the worker configuration and increment the configuration version."""
+    global _worker_config, _worker_config_version
+    if _worker_config is None:
+        _worker_config = {}
+    _worker_config.update(kwarg)
+    _worker_config_version += 1
+
+
+def get_worker_config_version():
+    """Get the current version of the worker configuration."""
+    return _worker_config_version
+
+
+def set_worker_modules(modules):
+    """Set modules to be imported by the pool workers when they are initialized.
+    This is needed for the workers not created by fork (e.g. spawn start method),
+    where the commands need to be registered again.
+    """
+    _update_worker_config(modules=list(modules))
+
+
+def _initialize_worker(worker_config, version):
+    """Initialize the worker process: import modules, set cache and store.
+    This is used as the pool initializer and it is called again by *_ensure_worker*
+    when the worker configuration changes.
+    """
+    global _worker_initialized_version
+    worker_logger.info("Initialize worker %s (configuration version %s)", getpid(), version)
+    if worker_config is not None:
+        for module in worker_config.get("modules", []):
+            worker_logger.debug("Loading module %s", module)
+            __import__(module, fromlist=["*"])
+    set_cache(get_cache(worker_config, is_worker=True))
+    worker_logger.debug("Cache configured in worker %s", getpid())
+    set_store(get_store(worker_config, is_worker=True))
+    worker_logger.debug("Store configured in worker %s", getpid())
+    _worker_initialized_version = version
+
+
+def _ensure_worker(worker_config, version):
+    """Make sure that the worker is initialized with the given configuration version."""
+    if _worker_initialized_version != version:
+        _initialize_worker(worker_config, version)
 
 
 def get_cache(worker_config, is_worker=False):
@@ -126,12 +370,7 @@ def set_local_cache_constructor(constructor, arg=None, kwarg=None):
     In general this is a less secure solution. Even for FileCache there might be collisions if multiple workers
     try to access the same file. The set_central_cache should be a safe alternative.
     """
-    global _worker_config
-    if _worker_config is None:
-        _worker_config = {}
-    _worker_config.update(
-        dict(cache_constructor=constructor, cache_arg=arg, cache_kwarg=kwarg)
-    )
+    _update_worker_config(cache_constructor=constructor, cache_arg=arg, cache_kwarg=kwarg)
     if arg is None:
         arg = []
     if kwarg is None:
@@ -148,12 +387,7 @@ def set_local_store_constructor(constructor, arg=None, kwarg=None):
     In general this is a less secure solution. Even for FileStore there might be collisions if multiple workers
     try to access the same file. The set_central_store should be a safe alternative.
     """
-    global _worker_config
-    if _worker_config is None:
-        _worker_config = {}
-    _worker_config.update(
-        dict(store_constructor=constructor, store_arg=arg, store_kwarg=kwarg)
-    )
+    _update_worker_config(store_constructor=constructor, store_arg=arg, store_kwarg=kwarg)
     if arg is None:
         arg = []
     if kwarg is None:
@@ -169,8 +403,9 @@ def set_central_cache(cache, manager=None, use_cache_proxy_locally=True):
 
     Limitations:
     - The cached objects have to support pickle.
-    - Large objects may fail to transfer between processes due to limitations of IPC buffer (see https://docs.python.org/3/library/multiprocessing.html#connection-objects)
-    - Large objects may be slow to transfer between processes.
+    - Large objects (larger than TRANSPORT_THRESHOLD when pickled) are not sent through the IPC connection,
+      but through temporary files in shared memory (see pack_payload), which requires a shared filesystem,
+      i.e. the workers need to run on the same machine as the manager.
 
     In general this is a more secure solution, but it requires all data to support pickle.
     It has to be noted that the cache lives in a single process and relies on IPC to work, thus this solution
@@ -181,14 +416,11 @@ def set_central_cache(cache, manager=None, use_cache_proxy_locally=True):
 
     The use_cache_proxy_locally controls if cache is proxied when used locally (which should be the safe choice).
     """
-    global _worker_config
     if manager is None:
         manager = PoolManager()
         manager.start()
-    if _worker_config is None:
-        _worker_config = {}
-    cache_proxy = manager.CacheProxy(cache)
-    _worker_config.update(dict(cache=cache_proxy))
+    cache_proxy = TransportCache(manager.CacheProxy(cache))
+    _update_worker_config(cache=cache_proxy)
     if use_cache_proxy_locally:
         set_cache(cache_proxy)
     else:
@@ -202,8 +434,9 @@ def set_central_store(store, manager=None, use_store_proxy_locally=True):
 
     Limitations:
     - The stored objects have to support pickle.
-    - Large objects may fail to transfer between processes due to limitations of IPC buffer (see https://docs.python.org/3/library/multiprocessing.html#connection-objects)
-    - Large objects may be slow to transfer between processes.
+    - Large objects (larger than TRANSPORT_THRESHOLD when pickled) are not sent through the IPC connection,
+      but through temporary files in shared memory (see pack_payload), which requires a shared filesystem,
+      i.e. the workers need to run on the same machine as the manager.
     
     In general this is a more secure solution, but it requires all data to support pickle.
     It has to be noted that the store lives in a single process and relies on IPC to work, thus this solution
@@ -214,14 +447,11 @@ def set_central_store(store, manager=None, use_store_proxy_locally=True):
 
     The use_store_proxy_locally controls if store is proxied when used locally (which should be the safe choice).
     """
-    global _worker_config
     if manager is None:
         manager = PoolManager()
         manager.start()
-    if _worker_config is None:
-        _worker_config = {}
-    store_proxy = manager.ProxyStore(store)
-    _worker_config.update(dict(store=store_proxy))
+    store_proxy = TransportStore(manager.ProxyStore(store))
+    _update_worker_config(store=store_proxy)
     if use_store_proxy_locally:
         set_store(store_proxy)
     else:
@@ -229,31 +459,306 @@ def set_central_store(store, manager=None, use_store_proxy_locally=True):
     return manager
 
 
-def _evaluate_worker(query, worker_config):
+def _evaluate_worker(query, worker_config, version=None):
     """Internal function called by the worker to evaluate a query."""    
-    worker_logger.info(f"Evaluate worker started for {query}")
-    set_cache(get_cache(worker_config, is_worker=True))
-    worker_logger.debug(f"Cache configured for {query}")
-    set_store(get_store(worker_config, is_worker=True))
-    worker_logger.debug(f"Store configured for {query}")
-    evaluate(query)
-    worker_logger.info(f"Evaluate worker finished for {query}")
+    worker_logger.info("Evaluate worker started for %s", query)
+    _ensure_worker(worker_config, version)
+    state = evaluate(query)
+    if state.is_error:
+        raise Exception(state.metadata.get("message") or f"Evaluation of {query} failed")
+    worker_logger.info("Evaluate worker finished for %s", query)
     return f"Done evaluating {query}"
 
 
-def _evaluate_and_save_worker(query, target_directory, target_file, worker_config):
+def _evaluate_and_save_worker(
+    query, target_directory, target_file, worker_config, version=None
+):
     """Internal function called by the worker to evaluate and save a query."""    
-    worker_logger.info(f"Evaluate and save worker started for {query}")
-    set_cache(get_cache(worker_config, is_worker=True))
-    worker_logger.debug(f"Cache configured for {query}")
-    set_store(get_store(worker_config, is_worker=True))
-    worker_logger.debug(f"Store configured for {query}")
-    evaluate_and_save(query, target_directory=target_directory, target_file=target_file)
-    worker_logger.info(f"Evaluate and save worker finished for {query}")
+    worker_logger.info("Evaluate and save worker started for %s", query)
+    _ensure_worker(worker_config, version)
+    state = evaluate_and_save(
+        query, target_directory=target_directory, target_file=target_file
+    )
+    if state.is_error:
+        raise Exception(state.metadata.get("message") or f"Evaluation of {query} failed")
+    worker_logger.info("Evaluate and save worker finished for %s", query)
     return f"Done evaluate and save {query}"
 
 
-def evaluate_in_background(query):
+class JobQueueFullException(Exception):
+    """Raised when a job is submitted to a full job queue."""
+
+    def __init__(self, message=None, query=None):
+        if message is None:
+            message = "Job queue is full"
+            if query is not None:
+                message += f", query '{query}' rejected"
+        super().__init__(message)
+        self.query = query
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    ERROR = "error"
+    CANCELLED = "cancelled"
+
+
+class Job:
+    """Background job submitted to the JobScheduler.
+    Job can be used like an AsyncResult: *wait* for the job to finish and *get* the result.
+    """
+
+    def __init__(self, job_id, query, priority=0, task=None, args=None):
+        self.job_id = job_id
+        self.query = query
+        self.priority = priority
+        self.task = task
+        self.args = args or []
+        self.status = JobStatus.QUEUED
+        self.message = "Queued"
+        self.worker = None
+        self.submitted = util.now()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self._event = threading.Event()
+
+    def is_active(self):
+        """True if the job is queued or running."""
+        return self.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+
+    def ready(self):
+        """True if the job is finished (done, failed or cancelled)."""
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Wait for the job to finish, returns True if it finished."""
+        return self._event.wait(timeout)
+
+    def get(self, timeout=None):
+        """Wait for the job and return the result (like AsyncResult.get)."""
+        if not self.wait(timeout):
+            raise TimeoutError(f"Job {self.job_id} ({self.query}) not finished")
+        if self.status == JobStatus.ERROR:
+            raise Exception(self.message)
+        if self.status == JobStatus.CANCELLED:
+            raise Exception(f"Job {self.job_id} ({self.query}) was cancelled")
+        return self.result
+
+    def _finish(self, status, message, result=None):
+        self.status = status
+        self.message = message
+        self.result = result
+        self.finished = util.now()
+        self._event.set()
+
+    def to_dict(self):
+        return dict(
+            job_id=self.job_id,
+            query=self.query,
+            priority=self.priority,
+            status=self.status.value,
+            message=self.message,
+            submitted=self.submitted,
+            started=self.started,
+            finished=self.finished,
+            worker=self.worker,
+        )
+
+    def __repr__(self):
+        return f"Job({repr(self.job_id)}, {repr(self.query)}, status={self.status.value})"
+
+
+class JobScheduler:
+    """Priority queue of background jobs executed in the pool.
+
+    - jobs are identified by job_id,
+    - submitting a query that is already queued or running returns the existing job (deduplication);
+      if the new priority is higher, the queued job is re-prioritized,
+    - jobs with higher priority are started first, jobs with the same priority in the submission order,
+    - at most max_running jobs are sent to the pool at once, the rest is waiting in the queue
+      (so that the queue can be prioritized and cancelled),
+    - if the queue contains max_queue_length jobs, new jobs are rejected with JobQueueFullException,
+    - queued jobs can be cancelled; running jobs can not be interrupted,
+    - up to max_finished finished jobs are kept for status queries.
+    """
+
+    def __init__(self, max_queue_length=1000, max_running=None, max_finished=1000):
+        self.max_queue_length = max_queue_length
+        self.max_running = max_running or os.cpu_count() or 1
+        self.max_finished = max_finished
+        self.jobs = {}
+        self._active = {}
+        self._finished = deque()
+        self._queue = []
+        self._counter = itertools.count()
+        self._running = 0
+        self._lock = threading.RLock()
+
+    def queue_length(self):
+        """Number of queued jobs."""
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if job.status == JobStatus.QUEUED)
+
+    def running(self):
+        """Number of running jobs."""
+        return self._running
+
+    def submit(self, query, priority=0, task=None, args=None, dedup_key=None):
+        """Submit a job evaluating the query.
+        Task is a function called in the pool worker with args (by default _evaluate_worker).
+        Jobs with the same dedup_key are considered duplicates,
+        by default it is the query for evaluation and (task name, args) otherwise.
+        Returns the Job object.
+        """
+        if task is None:
+            task = _evaluate_worker
+            args = [query]
+            if dedup_key is None:
+                dedup_key = query
+        if dedup_key is None:
+            dedup_key = (task.__name__, tuple(args))
+        with self._lock:
+            job_id = self._active.get(dedup_key)
+            if job_id is not None:
+                job = self.jobs[job_id]
+                logger.info("Query %s already submitted as job %s", query, job_id)
+                if job.status == JobStatus.QUEUED and priority > job.priority:
+                    job.priority = priority
+                    heapq.heappush(self._queue, (-priority, next(self._counter), job_id))
+                return job
+            if self.queue_length() >= self.max_queue_length:
+                raise JobQueueFullException(query=query)
+            job = Job(uuid.uuid4().hex, query, priority=priority, task=task, args=args)
+            job.dedup_key = dedup_key
+            self.jobs[job.job_id] = job
+            self._active[dedup_key] = job.job_id
+            heapq.heappush(self._queue, (-priority, next(self._counter), job.job_id))
+        self._dispatch()
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a queued job. Returns True if the job was cancelled."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != JobStatus.QUEUED:
+                return False
+            self._active.pop(job.dedup_key, None)
+            job._finish(JobStatus.CANCELLED, "Cancelled")
+            self._register_finished(job)
+            return True
+
+    def active_job(self, dedup_key):
+        """Get a queued or running Job with the dedup_key (query by default) or None."""
+        with self._lock:
+            job_id = self._active.get(dedup_key)
+            return None if job_id is None else self.jobs.get(job_id)
+
+    def get_job(self, job_id):
+        """Get a Job object by job_id or None."""
+        return self.jobs.get(job_id)
+
+    def status(self):
+        """Status of the scheduler as a dictionary."""
+        with self._lock:
+            return dict(
+                queued=self.queue_length(),
+                running=self._running,
+                max_queue_length=self.max_queue_length,
+                max_running=self.max_running,
+                jobs=[job.to_dict() for job in self.jobs.values()],
+            )
+
+    def wait(self, timeout=None):
+        """Wait until all submitted jobs are finished."""
+        for job in list(self.jobs.values()):
+            job.wait(timeout)
+
+    def _register_finished(self, job):
+        self._finished.append(job.job_id)
+        while len(self._finished) > self.max_finished:
+            self.jobs.pop(self._finished.popleft(), None)
+
+    def _next_job(self):
+        while self._queue:
+            priority, _, job_id = heapq.heappop(self._queue)
+            job = self.jobs.get(job_id)
+            if job is not None and job.status == JobStatus.QUEUED and -priority == job.priority:
+                return job
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if self._running >= self.max_running:
+                    return
+                job = self._next_job()
+                if job is None:
+                    return
+                job.status = JobStatus.RUNNING
+                job.message = "Running"
+                job.started = util.now()
+                self._running += 1
+            self._start(job)
+
+    def _start(self, job):
+        if _worker_config is None:
+            logger.warning("Evaluated in main process")
+            logger.warning(
+                "Please configure the cache using set_local_cache_constructor or set_central_cache"
+            )
+            try:
+                self._done(job.job_id, job.task(*job.args, None))
+            except Exception as e:
+                self._error(job.job_id, e)
+            return
+        get_pool().apply_async(
+            job.task,
+            list(job.args) + [_worker_config, _worker_config_version],
+            callback=lambda result: self._done(job.job_id, result),
+            error_callback=lambda e: self._error(job.job_id, e),
+        )
+
+    def _finish_job(self, job_id, status, message, result=None):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            self._running -= 1
+            self._active.pop(job.dedup_key, None)
+            job._finish(status, message, result)
+            self._register_finished(job)
+        self._dispatch()
+
+    def _done(self, job_id, result):
+        logger.info(result)
+        self._finish_job(job_id, JobStatus.DONE, "Done", result)
+
+    def _error(self, job_id, e):
+        logger.error("Job %s failed: %s", job_id, e)
+        self._finish_job(job_id, JobStatus.ERROR, str(e))
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    """Get the job scheduler used for background evaluation."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = JobScheduler()
+    return _scheduler
+
+
+def set_scheduler(scheduler):
+    """Set the job scheduler used for background evaluation."""
+    global _scheduler
+    _scheduler = scheduler
+
+
+def evaluate_in_background(query, priority=0):
     """Like evaluate, but returns immediately and runs in the background.
     This creates immediately a submitted state in the cache,
     which is replaced by a resulting state once available.    
@@ -262,43 +767,37 @@ def evaluate_in_background(query):
     then either there is no cache or the resulting state is volatile.
     This can be used by GUI to identify situations when waiting for the result to appear
     in the cache is not a viable strategy, but requesting the object directly is necessary.
-    """
-    global _worker_config
-    print(f"Evaluate {query} in background")
-    metadata = get_context().metadata()
-    metadata["query"] = query
-    metadata["status"] = Status.SUBMITTED.value
-    cache = get_cache(_worker_config)
-    cache.store_metadata(metadata)
-
-    if _worker_config is None:
-        logger.warning("Evaluated in main process")
-        logger.warning(
-            "Please configure the cache using set_local_cache_constructor or set_central_cache"
-        )
-        return evaluate(query)
-    else:
-        return get_pool().apply_async(
-            _evaluate_worker, [query, _worker_config], callback=logger.info
-        )
 
-
-def evaluate_and_save_in_background(query, target_directory=None, target_file=None):
+    The query is submitted to the job scheduler (see get_scheduler) with the given priority.
+    If the same query is already queued or running, the existing job is returned.
+    Returns a Job object; raises JobQueueFullException if the job queue is full.
+    """
+    scheduler = get_scheduler()
+    logger.info("Evaluate %s in background", query)
+    if scheduler.active_job(query) is None:
+        metadata = get_context().metadata()
+        metadata["query"] = query
+        metadata["status"] = Status.SUBMITTED.value
+        cache = get_cache(_worker_config)
+        cache.store_metadata(metadata)
+    try:
+        return scheduler.submit(query, priority=priority)
+    except JobQueueFullException:
+        get_cache(_worker_config).remove(query)
+        raise
+
+
+def evaluate_and_save_in_background(
+    query, target_directory=None, target_file=None, priority=0
+):
     """Like evaluate_and_save, but returns immediately and runs in the background.
     Note that the saving occurs on o worker. Eventual remote workers will save the results in their local filesystem.
+    Returns a Job object (see evaluate_in_background).
     """
-    global _worker_config
-    logger.info(f"Evaluate and save {query} in background")
-    if _worker_config is None:
-        logger.warning("Evaluated in main process")
-        logger.warning(
-            "Please configure the cache using set_local_cache_constructor or set_central_cache"
-        )
-        return evaluate_and_save(
-            query, target_directory=target_directory, target_file=target_file
-        )
-    return get_pool().apply_async(
-        _evaluate_and_save_worker,
-        [query, target_directory, target_file, _worker_config],
-        callback=logger.info,
+    logger.info("Evaluate and save %s in background", query)
+    return get_scheduler().submit(
+        query,
+        priority=priority,
+        task=_evaluate_and_save_worker,
+        args=[query, target_directory, target_file],
     )
@@ -0,0 +1,148 @@
+"""Per-query profiling.
+
+When profiling is enabled for a query (see Context.evaluate), the evaluation runs under a sampling profiler.
+The profiler periodically samples the call stack of the evaluating thread and counts identical stacks.
+The result is recorded in the metadata (under the "profile" key) as a compact collapsed-stack profile:
+lines "frame1;frame2;...;frameN count", which can be turned into a flame graph
+e.g. by flamegraph.pl, speedscope or inferno.
+
+Profiling is enabled by the profile argument of Context.evaluate, by the "profile" state variable
+or (in the servers) by the reserved _profile URL parameter, e.g. /liquer/q/QUERY?_profile=1.
+The URL parameter is honoured only if profiling is enabled on the server (see enable_profiling
+and the profiling_enabled setup parameter); it is off by default.
+When profiling is disabled, there is no overhead besides checking the flag.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_KEY = "profile"
+PROFILE_PARAMETER = "_profile"
+
+_profiling = threading.local()
+_profiling_enabled = False
+
+
+def enable_profiling(enabled=True):
+    """Allow clients to request profiling by the _profile URL parameter"""
+    global _profiling_enabled
+    _profiling_enabled = bool(enabled)
+
+
+def is_profiling_enabled():
+    """True if clients are allowed to request profiling by the _profile URL parameter"""
+    return _profiling_enabled
+
+
+def is_profiling():
+    """True if the current thread is being profiled"""
+    return getattr(_profiling, "active", False)
+
+
+def frame_name(code):
+    """Name of a frame in the collapsed stack"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler(object):
+    """Sampling profiler collecting the call stacks of a thread.
+    Only the frames called from the frame where the profiler was started are recorded.
+    Use as a context manager:
+
+        with SamplingProfiler() as profiler:
+            ...
+        print(profiler.collapsed())
+    """
+
+    def __init__(self, interval=0.001, max_depth=100):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.thread_id = None
+        self.root = None
+        self.started = None
+        self.duration = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, root=None):
+        """Start sampling the current thread.
+        Only the frames called from the root frame (by default the caller) are recorded.
+        """
+        self.thread_id = threading.get_ident()
+        self.root = sys._getframe(1) if root is None else root
+        self.started = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="liquer-profiler", daemon=True
+        )
+        self._thread.start()
+        _profiling.active = True
+        return self
+
+    def stop(self):
+        """Stop sampling"""
+        _profiling.active = False
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.duration = time.perf_counter() - self.started
+        self.root = None
+        return self
+
+    def __enter__(self):
+        return self.start(sys._getframe(1))
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+        return False
+
+    def sample(self):
+        """Record the current stack of the profiled thread"""
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None and frame is not self.root:
+            stack.append(frame_name(frame.f_code))
+            frame = frame.f_back
+        if frame is None or len(stack) == 0:
+            return  # Not inside the profiled block
+        if len(stack) > self.max_depth:
+            stack = stack[-self.max_depth :]
+        self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                pass
+
+    def collapsed(self, max_stacks=500):
+        """Profile in the collapsed-stack format (most frequent stacks first)"""
+        return "\n".join(
+            f"{stack} {count}" for stack, count in self.samples.most_common(max_stacks)
+        )
+
+    def as_dict(self, max_stacks=500):
+        """Profile as a (JSON-able) dictionary to be stored in the metadata"""
+        return dict(
+            kind="sampling",
+            interval=self.interval,
+            duration=self.duration,
+            samples=sum(self.samples.values()),
+            collapsed=self.collapsed(max_stacks),
+        )
+
+
+def profile_parameter(parameters):
+    """Remove the _profile parameter (e.g. an URL parameter) from the parameters dictionary.
+    Returns True if profiling was requested, None if the parameter is not present
+    or if profiling is not enabled on the server (see enable_profiling).
+    """
+    value = parameters.pop(PROFILE_PARAMETER, None)
+    if value is None or not _profiling_enabled:
+        return None
+    return str(value).lower() not in ("", "0", "false", "no", "off")
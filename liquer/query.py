@@ -4,9 +4,13 @@ import os.path
 from liquer.context import get_context, find_queries_in_template
 
 
-def evaluate(query, extra_parameters=None):
-    """Evaluate query, returns a State, cache the output in supplied cache"""
-    return get_context().evaluate(query, extra_parameters=extra_parameters)
+def evaluate(query, extra_parameters=None, profile=None):
+    """Evaluate query, returns a State, cache the output in supplied cache.
+    If profile is True, the evaluation is profiled (see liquer.profiling).
+    """
+    return get_context().evaluate(
+        query, extra_parameters=extra_parameters, profile=profile
+    )
 
 
 def evaluate_and_save(
@@ -28,8 +28,10 @@ from liquer.context import get_context
 from liquer.parser import parse
 from liquer.constants import Status
 from liquer.metadata import Metadata, StoreSyncMetadata
+from liquer.dependencies import outdated_dependencies
 import json
 import hashlib
+import logging
 
 from copy import deepcopy
 import traceback
@@ -40,6 +42,8 @@ try:
 except ImportError:
     from yaml import Loader, Dumper
 
+logger = logging.getLogger(__name__)
+
 
 class RecipeException(Exception):
     def __init__(self, message, key=None):
@@ -645,6 +649,7 @@ class NewRecipeSpecStore(Store):
 
     def sync(self):
         self.update_recipes()
+        self.mark_outdated()
         self.update_all_status_files()
         self.substore.sync()
 
@@ -712,6 +717,51 @@ class NewRecipeSpecStore(Store):
 
         return metadata
 
+    def check_outdated(self, key, metadata):
+        """Check whether the data made by a recipe is outdated.
+        Recorded dependencies (command versions, resource fingerprints and recipe version)
+        are compared with the current state. If any of them changed,
+        status of the returned metadata is set to EXPIRED and the reasons are listed in "outdated".
+        Data are not removed, so they can be still served until the recipe is made again.
+        """
+        if metadata.get("status") != Status.READY.value:
+            return metadata
+        recipe = self.recipes().get(key)
+        if recipe is None:
+            return metadata
+        reasons = outdated_dependencies(
+            metadata, store=self.root_store(), recipe=recipe
+        )
+        if len(reasons):
+            metadata = dict(metadata)
+            metadata["status"] = Status.EXPIRED.value
+            metadata["outdated"] = reasons
+            metadata["message"] = "Outdated: " + "; ".join(reasons)
+        return metadata
+
+    def mark_outdated(self):
+        """Check all the data made by recipes (see check_outdated) and store the outdated ones as EXPIRED.
+        Checking requires the metadata of all the dependencies, hence it is done only on sync
+        (e.g. by make_recipes), not when reading the metadata.
+        Returns the list of keys marked as outdated.
+        """
+        outdated = []
+        for key in self.recipes():
+            if self.ignore(key):
+                continue
+            try:
+                metadata = self.substore.get_metadata(key)
+            except KeyNotFoundStoreException:
+                continue
+            if metadata is None:
+                continue
+            checked = self.check_outdated(key, metadata)
+            if checked is not metadata:
+                logger.info("Recipe result %s is outdated: %s", key, checked["message"])
+                self.substore.store_metadata(key, checked)
+                outdated.append(key)
+        return outdated
+
     def is_supported(self, key):
         if self.ignore(key):
             return False
@@ -749,6 +799,24 @@ class NewRecipeSpecStore(Store):
             return self.finalize_metadata(metadata, key=key, is_dir=False)
         raise KeyNotFoundStoreException(key=key, store=self)
 
+    def get_metadata_many(self, keys):
+        """Get metadata for multiple keys.
+        Metadata are fetched from the substore in bulk,
+        only the keys missing in the substore (directories, recipes not made yet) are resolved one by one.
+        """
+        keys = [key for key in keys if not self.ignore(key)]
+        result = {}
+        for key, metadata in self.substore.get_metadata_many(keys).items():
+            if metadata is not None:
+                result[key] = metadata
+        for key in keys:
+            if key not in result:
+                try:
+                    result[key] = self.get_metadata(key)
+                except KeyNotFoundStoreException:
+                    pass
+        return result
+
     def store(self, key, data, metadata):
         if self.ignore(key):
             raise Exception(f"Key {key} is ignored, can't store into it")
@@ -914,12 +982,12 @@ class NewRecipeSpecStore(Store):
     def create_status_text(self, dir_key):
         txt = ""
         if self.substore.is_dir(dir_key):
-            for d in self.listdir(dir_key):
-                key = f"{dir_key}/{d}" if len(dir_key) else d
-                if d == self.STATUS_FILE:
-                    continue
-                if not self.is_dir(key):
-                    metadata = self.get_metadata(key)
+            names = [d for d in self.listdir(dir_key) if d != self.STATUS_FILE]
+            keys = [f"{dir_key}/{d}" if len(dir_key) else d for d in names]
+            metadata_many = self.get_metadata_many(keys)
+            for d, key in zip(names, keys):
+                metadata = metadata_many.get(key)
+                if metadata is None or not metadata.get("fileinfo", {}).get("is_dir"):
                     if metadata is None:
                         txt += "%-14s %-30s %s\n" % ("MISSING", d, "Missing metadata")
                     else:
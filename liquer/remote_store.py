@@ -1,17 +1,60 @@
 """Defines a RemoteStore, a store implementation that can connect to a remote liquer server
 via liquer server store API.
 """
-from liquer.store import Store, StoreException
+from liquer.store import Store, StoreException, key_name
+from io import BytesIO
+import base64
+import liquer.json_codec as json_codec
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_session(retries=3, pool_maxsize=10, backoff_factor=0.2):
+    """Create a requests session with a connection pool (keep-alive) and retries.
+    All store operations are idempotent, hence POST requests are retried too.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=None,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 class RemoteStore(Store):
     """RemoteStore is a store implementation that can connect to a remote liquer server
     via liquer server store API.
+
+    All requests share a pooled session (keep-alive connections, retries on transient errors);
+    compressed (gzip) responses are decoded transparently.
+    A custom requests session can be supplied via the session argument.
+    If cache_store is specified (e.g. a FileStore or MemoryStore), data are cached locally
+    and revalidated with the server using ETag (If-None-Match), so unchanged data are not transferred again.
     """
 
-    def __init__(self, url_api_prefix="/liquer/api/"):
+    def __init__(
+        self,
+        url_api_prefix="/liquer/api/",
+        session=None,
+        retries=3,
+        pool_maxsize=10,
+        cache_store=None,
+    ):
         self.url_api_prefix = url_api_prefix
+        self.retries = retries
+        self.pool_maxsize = pool_maxsize
+        if session is None:
+            session = create_session(retries=retries, pool_maxsize=pool_maxsize)
+        self.session = session
+        self.cache_store = cache_store
 
     @classmethod
     def concat_api(cls, api, key):
@@ -20,8 +63,8 @@ class RemoteStore(Store):
             key = "/" + key
         return api + key
 
-    def fetch(self, api):
-        response = requests.get(self.url_api_prefix + api)
+    def fetch(self, api, headers=None):
+        response = self.session.get(self.url_api_prefix + api, headers=headers)
         response.raise_for_status()
         return response
 
@@ -32,12 +75,12 @@ class RemoteStore(Store):
         return self.fetch(api).content
 
     def post_json(self, api, json):
-        response = requests.post(self.url_api_prefix + api, json=json)
+        response = self.session.post(self.url_api_prefix + api, json=json)
         response.raise_for_status()
         return response
 
     def post_bytes(self, api, data):
-        response = requests.post(
+        response = self.session.post(
             self.url_api_prefix + api,
             data=data,
             headers={"Content-Type": "application/octet-stream"},
@@ -46,21 +89,54 @@ class RemoteStore(Store):
         return response
 
     def get_bytes(self, key):
-        return self.fetch_bytes(self.concat_api("store/data", key))
+        api = self.concat_api("store/data", key)
+        if self.cache_store is None:
+            return self.fetch_bytes(api)
+
+        headers = {}
+        try:
+            etag = self.cache_store.get_metadata(key).get("etag")
+            if etag is not None:
+                headers["If-None-Match"] = etag
+        except StoreException:
+            pass
+        response = self.session.get(self.url_api_prefix + api, headers=headers)
+        if response.status_code == 304:
+            return self.cache_store.get_bytes(key)
+        response.raise_for_status()
+        data = response.content
+        etag = response.headers.get("ETag")
+        if etag is not None:
+            self.cache_store.store(key, data, dict(etag=etag))
+        return data
 
     def get_metadata(self, key):
         metadata = self.fetch_json(self.concat_api("store/metadata", key))
-        return self.finalize_metadata(metadata, key=key, is_dir=self.is_dir(key))
+        is_dir = metadata.get("fileinfo", {}).get("is_dir", False)
+        return self.finalize_metadata(metadata, key=key, is_dir=is_dir)
 
     def store(self, key, data, metadata):
+        """Store data and metadata in a single request (store/upload API with metadata)."""
         metadata = self.finalize_metadata(metadata, key=key, is_dir=False, data=data)
-        self.post_json(self.concat_api("store/metadata", key), metadata)
-        self.post_bytes(self.concat_api("store/data", key), data)
+        response = self.session.post(
+            self.url_api_prefix + self.concat_api("store/upload", key),
+            files=dict(file=(key_name(key) or "data", data)),
+            data=dict(metadata=json_codec.dumps(metadata)),
+        )
+        response.raise_for_status()
+        res = response.json()
+        if res["status"] != "OK":
+            raise StoreException(res["message"], key=key, store=self)
         self.on_data_changed(key)
         self.on_metadata_changed(key)
 
     def store_metadata(self, key, metadata):
-        metadata = self.finalize_metadata(metadata, key=key, is_dir=False, data=data)
+        metadata = self.finalize_metadata(
+            metadata,
+            key=key,
+            is_dir=metadata.get("fileinfo", {}).get("is_dir", False),
+            update=True,
+        )
         self.post_json(self.concat_api("store/metadata", key), metadata)
         self.on_metadata_changed(key)
 
@@ -68,8 +144,58 @@ class RemoteStore(Store):
         res = self.fetch_json(self.concat_api("store/remove", key))
         if res["status"] != "OK":
             raise StoreException(res["message"], key=key, store=self)
+        if self.cache_store is not None:
+            self.cache_store.remove(key)
         self.on_removed(key)
 
+    def get_many(self, keys):
+        """Get data for multiple keys in a single request (store/get_many API)."""
+        keys = list(keys)
+        if len(keys) == 0:
+            return {}
+        res = self.post_json("store/get_many", dict(keys=keys)).json()
+        if res["status"] != "OK":
+            raise StoreException(res["message"], store=self)
+        return {key: base64.b64decode(b) for key, b in res["data"].items()}
+
+    def get_metadata_many(self, keys):
+        """Get metadata for multiple keys in a single request (store/get_metadata_many API)."""
+        keys = list(keys)
+        if len(keys) == 0:
+            return {}
+        res = self.post_json("store/get_metadata_many", dict(keys=keys)).json()
+        if res["status"] != "OK":
+            raise StoreException(res["message"], store=self)
+        return {
+            key: self.finalize_metadata(
+                metadata,
+                key=key,
+                is_dir=metadata.get("fileinfo", {}).get("is_dir", False),
+            )
+            for key, metadata in res["metadata"].items()
+        }
+
+    def store_many(self, items):
+        """Store multiple items in a single request (store/store_many API)."""
+        items = [
+            dict(
+                key=key,
+                data=base64.b64encode(data).decode("ascii"),
+                metadata=self.finalize_metadata(
+                    metadata, key=key, is_dir=False, data=data
+                ),
+            )
+            for key, data, metadata in items
+        ]
+        if len(items) == 0:
+            return
+        res = self.post_json("store/store_many", dict(items=items)).json()
+        if res["status"] != "OK":
+            raise StoreException(res["message"], store=self)
+        for item in items:
+            self.on_data_changed(item["key"])
+            self.on_metadata_changed(item["key"])
+
     def removedir(self, key, recursive=False):
         if key in ("", None):
             return
@@ -85,7 +211,7 @@ class RemoteStore(Store):
         self.on_removed(key)
 
     def contains(self, key):
-        res = self.fetch_json(self.concat_api("store/remove", key))
+        res = self.fetch_json(self.concat_api("store/contains", key))
         if res["status"] != "OK":
             raise StoreException(res["message"], key=key, store=self)
         return res["contains"]
@@ -109,9 +235,9 @@ class RemoteStore(Store):
         return res["listdir"]
 
     def makedir(self, key):
-        while key not in (None, ""):
-            self.directories.add(key)
-            key = self.parent_key(key)
+        res = self.fetch_json(self.concat_api("store/makedir", key))
+        if res["status"] != "OK":
+            raise StoreException(res["message"], key=key, store=self)
         self.on_data_changed(key)
         self.on_metadata_changed(key)
 
@@ -124,8 +250,17 @@ class RemoteStore(Store):
     def is_supported(self, key):
         return True
 
+    def clone(self):
+        """Clone the store."""
+        return self.__class__(
+            self.url_api_prefix,
+            retries=self.retries,
+            pool_maxsize=self.pool_maxsize,
+            cache_store=self.cache_store,
+        )
+
     def __str__(self):
         return f"Remote store in {self.url_api_prefix}"
 
     def __repr__(self):
-        return f"MemoryStore('{self.url_api_prefix}')"
+        return f"RemoteStore('{self.url_api_prefix}')"
@@ -1,22 +1,54 @@
 """Defines S3Store class with the Liquer store interface.
 S3Store is a store using Amazon S3 buckets."""
-from liquer.store import Store, parent_key
+from liquer.store import Store, parent_key, KeyNotFoundStoreException
 from liquer.metadata import Metadata
-import json
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import liquer.json_codec as json_codec
+import traceback
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+
+def _is_not_found(e):
+    """Check whether a botocore ClientError signals a missing object."""
+    code = str(e.response.get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
 
 
 class S3Store(Store):
     """S3Store class with the Liquer store interface.
-    S3Store is a store using Amazon S3 buckets."""
+    S3Store is a store using Amazon S3 buckets.
+
+    Listings are paginated (list_objects_v2) and use the delimiter to list only a single "directory" level.
+    Data larger than multipart_threshold bytes are uploaded using a (concurrent) multipart upload.
+    """
     DELIMITER = "/"
+    MAX_WORKERS = 16
+    MULTIPART_THRESHOLD = 8 * 1024 * 1024
+    MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
 
-    def __init__(self, bucket_name, prefix="", s3_resource=None):
+    def __init__(
+        self,
+        bucket_name,
+        prefix="",
+        s3_resource=None,
+        multipart_threshold=None,
+        multipart_chunksize=None,
+    ):
         if s3_resource is None:
             s3_resource = boto3.resource("s3")
         self.bucket_name = bucket_name
         self.prefix = prefix
         self.s3_resource = s3_resource
+        self.multipart_threshold = multipart_threshold or self.MULTIPART_THRESHOLD
+        self.multipart_chunksize = multipart_chunksize or self.MULTIPART_CHUNKSIZE
+        self.transfer_config = TransferConfig(
+            multipart_threshold=self.multipart_threshold,
+            multipart_chunksize=self.multipart_chunksize,
+            max_concurrency=self.MAX_WORKERS,
+        )
         if len(self.prefix) and self.prefix[-1] != self.DELIMITER:
             self.prefix += self.DELIMITER
         self.data_prefix = self.prefix + "data" + self.DELIMITER
@@ -38,35 +70,142 @@ class S3Store(Store):
             bucket_name=self.bucket_name, key=self.metadata_prefix + key + ".json"
         )
 
+    @property
+    def client(self):
+        return self.s3_resource.meta.client
+
     def get_bytes(self, key):
-        return self.object_for_key(key).get()["Body"].read()
+        try:
+            return self._get_object_bytes(self.data_prefix + key)
+        except ClientError as e:
+            if _is_not_found(e):
+                raise KeyNotFoundStoreException(key=key, store=self)
+            raise
 
     def get_metadata(self, key):
-        is_dir = self.is_dir(key)
-        metadata = self.default_metadata(key, is_dir)
+        if key in ("", None):
+            return self.finalize_metadata(
+                self.default_metadata(key, True), key=key, is_dir=True
+            )
+        try:
+            metadata_bin = self._get_object_bytes(self.metadata_prefix + key + ".json")
+        except ClientError as e:
+            if not _is_not_found(e):
+                raise
+            if self.is_dir(key):
+                return self.finalize_metadata(
+                    self.default_metadata(key, True), key=key, is_dir=True
+                )
+            raise KeyNotFoundStoreException(key=key, store=self)
 
-        if is_dir:
-            return self.finalize_metadata(metadata, key=key, is_dir=True)
-        else:
+        metadata = self.default_metadata(key, False)
+        try:
+            metadata.update(json_codec.loads(metadata_bin))
+        except:
+            traceback.print_exc()
+            print(f"Removing {key} due to corrupted metadata (a)")
+            self.remove(key)
+            raise KeyNotFoundStoreException(key=key, store=self)
+
+        return self.finalize_metadata(metadata, key=key, is_dir=False)
+
+    def _map_concurrently(self, f, keys):
+        """Call f(key) for all keys in a thread pool.
+        Returns a dictionary key -> result, keys of missing objects are omitted.
+        Other errors (e.g. access denied, throttling or network errors) are raised.
+        """
+        keys = list(keys)
+        if len(keys) == 0:
+            return {}
+        missing = object()
+
+        def call(key):
             try:
-                metadata_bin = self.metadata_object_for_key(key).get()["Body"].read()
-            except:
-                raise KeyNotFoundStoreException(key=key, store=self)
+                return f(key)
+            except ClientError as e:
+                if _is_not_found(e):
+                    return missing
+                raise
+
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(keys))) as executor:
+            results = executor.map(call, keys)
+        return {key: r for key, r in zip(keys, results) if r is not missing}
+
+    def _get_object_bytes(self, s3key):
+        # boto3 clients (unlike resources) are thread safe
+        return self.client.get_object(Bucket=self.bucket_name, Key=s3key)[
+            "Body"
+        ].read()
 
+    def _put_object(self, s3key, data):
+        if len(data) >= self.multipart_threshold:
+            self.client.upload_fileobj(
+                BytesIO(data), self.bucket_name, s3key, Config=self.transfer_config
+            )
+        else:
+            self.client.put_object(Bucket=self.bucket_name, Key=s3key, Body=data)
+
+    def get_many(self, keys):
+        """Get data for multiple keys, objects are fetched concurrently."""
+        return self._map_concurrently(
+            lambda key: self._get_object_bytes(self.data_prefix + key), keys
+        )
+
+    def get_metadata_many(self, keys):
+        """Get metadata for multiple keys, metadata objects are fetched concurrently.
+        Keys without a metadata object (e.g. directories) fall back to get_metadata.
+        """
+        keys = list(keys)
+        metadata_bin = self._map_concurrently(
+            lambda key: self._get_object_bytes(self.metadata_prefix + key + ".json"),
+            keys,
+        )
+        result = {}
+        for key in keys:
+            if key in metadata_bin:
+                try:
+                    metadata = self.default_metadata(key, False)
+                    metadata.update(json_codec.loads(metadata_bin[key]))
+                    result[key] = self.finalize_metadata(metadata, key=key, is_dir=False)
+                    continue
+                except:
+                    traceback.print_exc()
             try:
-                metadata.update(json.loads(metadata_bin))
-            except:
-                traceback.print_exc()
-                print(f"Removing {key} due to corrupted metadata (a)")
-                self.remove(key)
-                raise KeyNotFoundStoreException(key=key, store=self)
+                result[key] = self.get_metadata(key)
+            except KeyNotFoundStoreException:
+                pass
+        return result
 
-        return self.finalize_metadata(metadata, key=key, is_dir=False)
+    def store_many(self, items):
+        """Store multiple items, objects are uploaded concurrently."""
+        items = [
+            (key, data, self.finalize_metadata(metadata, key=key, is_dir=False, data=data))
+            for key, data, metadata in items
+        ]
+
+        def put(item):
+            key, data, metadata = item
+            self._put_object(self.data_prefix + key, data)
+            self._put_object(
+                self.metadata_prefix + key + ".json",
+                json_codec.dumpb(metadata),
+            )
+
+        if len(items):
+            with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(items))) as executor:
+                list(executor.map(put, items))
+        for key, data, metadata in items:
+            self.on_data_changed(key)
+            self.on_metadata_changed(key)
 
     def store(self, key, data, metadata):
-        self.object_for_key(key).put(Body=data)
-        self.store_metadata(
-            key, self.finalize_metadata(metadata, key=key, is_dir=False, data=data)
+        """Store data and metadata.
+        Large data are uploaded with a multipart upload (see multipart_threshold).
+        """
+        metadata = self.finalize_metadata(metadata, key=key, is_dir=False, data=data)
+        self._put_object(self.data_prefix + key, data)
+        self._put_object(
+            self.metadata_prefix + key + ".json", json_codec.dumpb(metadata)
         )
         self.on_data_changed(key)
         self.on_metadata_changed(key)
@@ -75,7 +214,7 @@ class S3Store(Store):
         metadata = self.finalize_metadata(
             metadata, key=key, is_dir=self.is_dir(key), update=True
         )
-        metadata_bin = json.dumps(metadata).encode("utf-8")
+        metadata_bin = json_codec.dumpb(metadata)
         self.metadata_object_for_key(key).put(Body=metadata_bin)
         self.on_metadata_changed(key)
 
@@ -102,40 +241,48 @@ class S3Store(Store):
                     self.remove(k)
         self.on_removed(key)
 
+    def _list_pages(self, s3prefix, delimiter=None):
+        """Iterate over all pages of list_objects_v2 for a given prefix."""
+        kwargs = dict(Bucket=self.bucket_name, Prefix=s3prefix)
+        if delimiter is not None:
+            kwargs["Delimiter"] = delimiter
+        paginator = self.client.get_paginator("list_objects_v2")
+        return paginator.paginate(**kwargs)
+
     def object_keys(self, keyprefix=""):
-        response = self.s3_resource.meta.client.list_objects(
-            Bucket=self.bucket_name, Prefix=self.data_prefix + keyprefix
-        )
-        if "Contents" in response:
-            return [x["Key"] for x in response["Contents"]]
-        else:
-            return []
+        return [
+            x["Key"]
+            for page in self._list_pages(self.data_prefix + keyprefix)
+            for x in page.get("Contents", [])
+        ]
 
     def metadata_object_keys(self, keyprefix=""):
-        response = self.s3_resource.meta.client.list_objects(
-            Bucket=self.bucket_name, Prefix=self.metadata_prefix + keyprefix
-        )
-        if "Contents" in response:
-            return [x["Key"] for x in response["Contents"]]
-        else:
-            return []
+        return [
+            x["Key"]
+            for page in self._list_pages(self.metadata_prefix + keyprefix)
+            for x in page.get("Contents", [])
+        ]
 
     def contains(self, key):
         if key in ("", None):
             return True
-        keys = self.object_keys(key)
-        ekey = self.data_prefix + key
-        if ekey in keys:
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=self.data_prefix + key)
             return True
-        ekey = ekey + "/"
-        return any(x.startswith(ekey) for x in keys)
+        except ClientError as e:
+            if not _is_not_found(e):
+                raise
+        return self.is_dir(key)
 
     def is_dir(self, key):
         if key in ("", None):
             return True
-        keys = self.object_keys(key)
-        ekey = self.data_prefix + key + "/"
-        return any(x.startswith(ekey) for x in keys)
+        response = self.client.list_objects_v2(
+            Bucket=self.bucket_name,
+            Prefix=self.data_prefix + key + self.DELIMITER,
+            MaxKeys=1,
+        )
+        return response.get("KeyCount", len(response.get("Contents", []))) > 0
 
     def keys(self, keyprefix=""):
         directories = set()
@@ -154,21 +301,24 @@ class S3Store(Store):
 
     def listdir(self, key):
         if key in ("", None):
-            return [k for k in self.keys() if parent_key(k) in ("", None)]
+            s3prefix = self.data_prefix
         else:
-            return [
-                k[len(key) + 1 :] for k in self.keys(key + "/") if parent_key(k) == key
-            ]
+            s3prefix = self.data_prefix + key + self.DELIMITER
+        names = []
+        for page in self._list_pages(s3prefix, delimiter=self.DELIMITER):
+            for x in page.get("CommonPrefixes", []):
+                names.append(x["Prefix"][len(s3prefix) :].rstrip(self.DELIMITER))
+            for x in page.get("Contents", []):
+                names.append(x["Key"][len(s3prefix) :])
+        return [name for name in names if name != ""]
 
     def makedir(self, key):
         self.on_data_changed(key)
         self.on_metadata_changed(key)
 
     def openbin(self, key, mode="rb", buffering=-1):
-        import io
-
-        if not self.contains(key) and not self.is_dir(key) and mode in ("r", "rb"):
-            return io.BytesIO(self.get_bytes(key))
+        if mode in ("r", "rb"):
+            return BytesIO(self.get_bytes(key))
         else:
             raise Exception(
                 "S3Store only supports openbin for reading of existing objects"
@@ -179,7 +329,13 @@ class S3Store(Store):
     
     def clone(self):
         """Clone S3Store"""
-        s = self.__class__(self.bucket_name, self.prefix, self.s3_resource)
+        s = self.__class__(
+            self.bucket_name,
+            self.prefix,
+            self.s3_resource,
+            multipart_threshold=self.multipart_threshold,
+            multipart_chunksize=self.multipart_chunksize,
+        )
         s.data_prefix = self.data_prefix
         s.metadata_prefix = self.metadata_prefix
         return s
@@ -2,12 +2,16 @@
 import logging
 from flask import Blueprint, jsonify, redirect, send_file, request, make_response, abort
 from liquer.query import evaluate
+from liquer.profiling import profile_parameter
 from liquer.state_types import encode_state_data, state_types_registry
 from liquer.commands import command_registry
 from liquer.state import get_vars
 from liquer.cache import get_cache
 from liquer.store import get_store, KeyNotFoundStoreException
+import base64
+import gzip
 import io
+import liquer.json_codec as json_codec
 import traceback
 
 app = Blueprint("liquer", __name__, static_folder="static")
@@ -72,9 +76,10 @@ def serve(query):
     assert type(kwargs) == dict
     for k, v in request.args.items():
         kwargs[k] = v
+    profile = profile_parameter(kwargs)
 
     try:
-        return response(evaluate(query, extra_parameters=kwargs))
+        return response(evaluate(query, extra_parameters=kwargs, profile=profile))
     except:
         traceback.print_exc()
         abort(500)
@@ -83,10 +88,69 @@ def serve(query):
 @app.route("/submit/<path:query>")
 def detached_serve(query):
     """Main service for evaluating queries"""
-    from liquer.pool import evaluate_in_background
+    from liquer.pool import evaluate_in_background, JobQueueFullException
 
-    evaluate_in_background(query)
-    return jsonify(dict(status="OK", message="Submitted", query=query))
+    try:
+        priority = int(request.args.get("priority", 0))
+    except ValueError:
+        return (
+            jsonify(dict(status="ERROR", message="Priority must be an integer", query=query)),
+            400,
+        )
+    try:
+        job = evaluate_in_background(query, priority=priority)
+    except JobQueueFullException as e:
+        return jsonify(dict(status="ERROR", message=str(e), query=query)), 503
+    return jsonify(
+        dict(status="OK", message="Submitted", query=query, job_id=job.job_id)
+    )
+
+
+@app.route("/api/jobs")
+def jobs_status():
+    """Status of the background jobs"""
+    from liquer.pool import get_scheduler
+
+    return jsonify(dict(status="OK", message="Jobs", **get_scheduler().status()))
+
+
+@app.route("/api/metrics")
+def metrics():
+    """Evaluation metrics in the Prometheus/OpenMetrics text format"""
+    from liquer.instrumentation import get_metrics, OPENMETRICS_CONTENT_TYPE
+
+    m = get_metrics()
+    if m is None:
+        return jsonify(dict(status="ERROR", message="Metrics are not enabled")), 404
+    r = make_response(m.to_openmetrics())
+    r.headers.set("Content-Type", OPENMETRICS_CONTENT_TYPE)
+    return r
+
+
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    """Status of a background job"""
+    from liquer.pool import get_scheduler
+
+    job = get_scheduler().get_job(job_id)
+    if job is None:
+        return (
+            jsonify(dict(status="ERROR", message=f"Job {job_id} not found", job_id=job_id)),
+            404,
+        )
+    return jsonify(dict(status="OK", message=job.message, job=job.to_dict()))
+
+
+@app.route("/api/jobs/<job_id>/cancel")
+def job_cancel(job_id):
+    """Cancel a queued background job"""
+    from liquer.pool import get_scheduler
+
+    if get_scheduler().cancel(job_id):
+        return jsonify(dict(status="OK", message=f"Job {job_id} cancelled", job_id=job_id))
+    return jsonify(
+        dict(status="ERROR", message=f"Job {job_id} can't be cancelled", job_id=job_id)
+    )
 
 
 @app.route("/api/cache/get/<path:query>")
@@ -226,8 +290,15 @@ def store_get(query):
     try:
         metadata = store.get_metadata(query)
         mimetype = metadata.get("mimetype", "application/octet-stream")
+        etag = metadata.get("fileinfo", {}).get("md5")
+        if etag is not None and etag in request.if_none_match:
+            r = make_response("", 304)
+            r.set_etag(etag)
+            return r
         r = make_response(store.get_bytes(query))
         r.headers.set("Content-Type", mimetype)
+        if etag is not None:
+            r.set_etag(etag)
         return r
     except:
         response = jsonify(
@@ -289,9 +360,8 @@ def store_set(query):
 @app.route("/api/store/upload/<path:query>", methods=["GET", "POST"])
 def store_upload(query):
     """Upload data to store - similar to /api/store/data, but using upload. Equivalent to Store.store.
-    Unlike store method, which stores both data and metadata in one call,
-    the api/store/data POST only stores the data. The metadata needs to be set in a separate POST of api/store/metadata
-    either before or after the api/store/data POST.
+    Metadata can be passed in an optional 'metadata' form field (json), so that data and metadata are stored in one request.
+    Without it, the existing metadata are kept and can be set in a separate POST of api/store/metadata.
     """
     if request.method == "POST":
         if "file" not in request.files:
@@ -326,7 +396,10 @@ def store_upload(query):
             return response
         store = get_store()
         try:
-            metadata = store.get_metadata(query)
+            if "metadata" in request.form:
+                metadata = json_codec.loads(request.form["metadata"])
+            else:
+                metadata = store.get_metadata(query)
         except KeyNotFoundStoreException:
             metadata = {}
             traceback.print_exc()
@@ -484,3 +557,99 @@ def store_makedir(query):
         return jsonify(
             dict(query=query, message=traceback.format_exc(), status="ERROR")
         )
+
+
+@app.route("/api/store/get_many", methods=["POST"])
+def store_get_many():
+    """Get data for multiple keys. Equivalent to Store.get_many.
+    Expects a json {"keys":[...]}, data are returned base64-encoded.
+    """
+    store = get_store()
+    try:
+        keys = request.get_json(force=True)["keys"]
+        data = {
+            key: base64.b64encode(b).decode("ascii")
+            for key, b in store.get_many(keys).items()
+        }
+        return jsonify(
+            dict(query=None, message=f"{len(data)} items obtained", data=data, status="OK")
+        )
+    except:
+        return jsonify(dict(query=None, message=traceback.format_exc(), status="ERROR"))
+
+
+@app.route("/api/store/get_metadata_many", methods=["POST"])
+def store_get_metadata_many():
+    """Get metadata for multiple keys. Equivalent to Store.get_metadata_many.
+    Expects a json {"keys":[...]}.
+    """
+    store = get_store()
+    try:
+        keys = request.get_json(force=True)["keys"]
+        metadata = store.get_metadata_many(keys)
+        return jsonify(
+            dict(
+                query=None,
+                message=f"{len(metadata)} metadata obtained",
+                metadata=metadata,
+                status="OK",
+            )
+        )
+    except:
+        return jsonify(dict(query=None, message=traceback.format_exc(), status="ERROR"))
+
+
+@app.route("/api/store/store_many", methods=["POST"])
+def store_store_many():
+    """Store multiple items. Equivalent to Store.store_many.
+    Expects a json {"items":[{"key":..., "data":..., "metadata":{...}}, ...]} with base64-encoded data.
+    """
+    store = get_store()
+    try:
+        items = [
+            (x["key"], base64.b64decode(x["data"]), x.get("metadata", {}))
+            for x in request.get_json(force=True)["items"]
+        ]
+        store.store_many(items)
+        return jsonify(
+            dict(
+                query=None,
+                message=f"{len(items)} items stored",
+                keys=[key for key, _, _ in items],
+                status="OK",
+            )
+        )
+    except:
+        return jsonify(dict(query=None, message=traceback.format_exc(), status="ERROR"))
+
+
+COMPRESSIBLE_MIMETYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+COMPRESS_MIN_SIZE = 1024
+
+
+@app.after_request
+def compress_response(response):
+    """Compress (gzip) text-like responses if the client accepts it."""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or "gzip" not in request.headers.get("Accept-Encoding", "")
+    ):
+        return response
+    mimetype = response.mimetype or ""
+    if not (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_MIMETYPES):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
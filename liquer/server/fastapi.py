@@ -1,13 +1,16 @@
 """[FastAPI](https://fastapi.tiangolo.com/) router for LiQuer server"""
-from fastapi import APIRouter, Request, HTTPException, status, UploadFile
+from fastapi import APIRouter, Request, HTTPException, status, UploadFile, Form
 
 from liquer.query import evaluate
+from liquer.profiling import profile_parameter
 from liquer.state_types import encode_state_data, state_types_registry
 from liquer.commands import command_registry
 from liquer.state import get_vars
 from liquer.cache import get_cache
 from liquer.store import get_store, KeyNotFoundStoreException
+import base64
 import io
+import liquer.json_codec as json_codec
 import traceback
 from fastapi import FastAPI, Request
 from fastapi.responses import (
@@ -64,21 +67,72 @@ def response(state):
 async def serve(query, request: Request):
     """Main service for evaluating queries"""
     kwargs = {**request.query_params}
+    profile = profile_parameter(kwargs)
 
     try:
-        return response(evaluate(query, extra_parameters=kwargs))
+        return response(evaluate(query, extra_parameters=kwargs, profile=profile))
     except:
         traceback.print_exc()
         return Response(status_code=500)
 
 
 @router.get("/submit/{query:path}")
-async def detached_serve(query):
+async def detached_serve(query, priority: int = 0):
     """Main service for evaluating queries"""
-    from liquer.pool import evaluate_in_background
+    from liquer.pool import evaluate_in_background, JobQueueFullException
 
-    evaluate_in_background(query)
-    return dict(status="OK", message="Submitted", query=query)
+    try:
+        job = evaluate_in_background(query, priority=priority)
+    except JobQueueFullException as e:
+        return JSONResponse(
+            dict(status="ERROR", message=str(e), query=query), status_code=503
+        )
+    return dict(status="OK", message="Submitted", query=query, job_id=job.job_id)
+
+
+@router.get("/api/jobs")
+async def jobs_status():
+    """Status of the background jobs"""
+    from liquer.pool import get_scheduler
+
+    return dict(status="OK", message="Jobs", **get_scheduler().status())
+
+
+@router.get("/api/metrics")
+async def metrics():
+    """Evaluation metrics in the Prometheus/OpenMetrics text format"""
+    from liquer.instrumentation import get_metrics, OPENMETRICS_CONTENT_TYPE
+
+    m = get_metrics()
+    if m is None:
+        return JSONResponse(
+            dict(status="ERROR", message="Metrics are not enabled"), status_code=404
+        )
+    return Response(content=m.to_openmetrics(), media_type=OPENMETRICS_CONTENT_TYPE)
+
+
+@router.get("/api/jobs/{job_id}")
+async def job_status(job_id):
+    """Status of a background job"""
+    from liquer.pool import get_scheduler
+
+    job = get_scheduler().get_job(job_id)
+    if job is None:
+        return JSONResponse(
+            dict(status="ERROR", message=f"Job {job_id} not found", job_id=job_id),
+            status_code=404,
+        )
+    return dict(status="OK", message=job.message, job=job.to_dict())
+
+
+@router.get("/api/jobs/{job_id}/cancel")
+async def job_cancel(job_id):
+    """Cancel a queued background job"""
+    from liquer.pool import get_scheduler
+
+    if get_scheduler().cancel(job_id):
+        return dict(status="OK", message=f"Job {job_id} cancelled", job_id=job_id)
+    return dict(status="ERROR", message=f"Job {job_id} can't be cancelled", job_id=job_id)
 
 
 @router.get("/api/cache/get/{query:path}")
@@ -213,15 +267,24 @@ async def register_command1(request: Request):
 
 
 @router.get("/api/store/data/{query:path}")
-def store_get(query):
+def store_get(query, request: Request):
     """Get data from store. Equivalent to Store.get_bytes.
     Content type (MIME) is obtained from the metadata.
+    The md5 checksum of the data is used as an ETag.
     """
     store = get_store()
     try:
         metadata = store.get_metadata(query)
         mimetype = metadata.get("mimetype", "application/octet-stream")
-        return Response(content=store.get_bytes(query), media_type=mimetype)
+        etag = metadata.get("fileinfo", {}).get("md5")
+        if etag is None:
+            return Response(content=store.get_bytes(query), media_type=mimetype)
+        headers = {"ETag": f'"{etag}"'}
+        if f'"{etag}"' in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        return Response(
+            content=store.get_bytes(query), media_type=mimetype, headers=headers
+        )
     except:
         return JSONResponse(
             content=dict(query=query, message=traceback.format_exc(), status="ERROR"),
@@ -300,14 +363,13 @@ def store_upload_get(query):
 
 
 @router.post("/api/store/upload/{query:path}")
-async def store_upload_post(query, f: UploadFile):
+async def store_upload_post(query, file: UploadFile, metadata: str = Form(None)):
     """Upload data to store - similar to /api/store/data, but using upload. Equivalent to Store.store.
-    Unlike store method, which stores both data and metadata in one call,
-    the api/store/data POST only stores the data. The metadata needs to be set in a separate POST of api/store/metadata
-    either before or after the api/store/data POST.
+    Metadata can be passed in an optional 'metadata' form field (json), so that data and metadata are stored in one request.
+    Without it, the existing metadata are kept and can be set in a separate POST of api/store/metadata.
     """
 
-    if f.filename in ("", None):
+    if file.filename in ("", None):
         response = JSONResponse(
             content=dict(
                 query=query,
@@ -319,7 +381,7 @@ async def store_upload_post(query, f: UploadFile):
         return response
 
     try:
-        data = await f.file.read()
+        data = await file.read()
     except:
         response = JSONResponse(
             content=dict(query=query, message=traceback.format_exc(), status="ERROR"),
@@ -328,7 +390,10 @@ async def store_upload_post(query, f: UploadFile):
         return response
     store = get_store()
     try:
-        metadata = store.get_metadata(query)
+        if metadata is not None:
+            metadata = json_codec.loads(metadata)
+        else:
+            metadata = store.get_metadata(query)
     except KeyNotFoundStoreException:
         metadata = {}
         traceback.print_exc()
@@ -486,3 +551,75 @@ def store_makedir(query):
         return JSONResponse(
             content=dict(query=query, message=traceback.format_exc(), status="ERROR")
         )
+
+
+@router.post("/api/store/get_many")
+async def store_get_many(request: Request):
+    """Get data for multiple keys. Equivalent to Store.get_many.
+    Expects a json {"keys":[...]}, data are returned base64-encoded.
+    """
+    store = get_store()
+    try:
+        keys = (await request.json())["keys"]
+        data = {
+            key: base64.b64encode(b).decode("ascii")
+            for key, b in store.get_many(keys).items()
+        }
+        return JSONResponse(
+            content=dict(
+                query=None, message=f"{len(data)} items obtained", data=data, status="OK"
+            )
+        )
+    except:
+        return JSONResponse(
+            content=dict(query=None, message=traceback.format_exc(), status="ERROR")
+        )
+
+
+@router.post("/api/store/get_metadata_many")
+async def store_get_metadata_many(request: Request):
+    """Get metadata for multiple keys. Equivalent to Store.get_metadata_many.
+    Expects a json {"keys":[...]}.
+    """
+    store = get_store()
+    try:
+        keys = (await request.json())["keys"]
+        metadata = store.get_metadata_many(keys)
+        return JSONResponse(
+            content=dict(
+                query=None,
+                message=f"{len(metadata)} metadata obtained",
+                metadata=metadata,
+                status="OK",
+            )
+        )
+    except:
+        return JSONResponse(
+            content=dict(query=None, message=traceback.format_exc(), status="ERROR")
+        )
+
+
+@router.post("/api/store/store_many")
+async def store_store_many(request: Request):
+    """Store multiple items. Equivalent to Store.store_many.
+    Expects a json {"items":[{"key":..., "data":..., "metadata":{...}}, ...]} with base64-encoded data.
+    """
+    store = get_store()
+    try:
+        items = [
+            (x["key"], base64.b64decode(x["data"]), x.get("metadata", {}))
+            for x in (await request.json())["items"]
+        ]
+        store.store_many(items)
+        return JSONResponse(
+            content=dict(
+                query=None,
+                message=f"{len(items)} items stored",
+                keys=[key for key, _, _ in items],
+                status="OK",
+            )
+        )
+    except:
+        return JSONResponse(
+            content=dict(query=None, message=traceback.format_exc(), status="ERROR")
+        )
@@ -2,15 +2,17 @@
 These can be used as Tornado or Jupyter handlers.
 """
 from liquer import *
-import json
+import liquer.json_codec as json_codec
 from liquer.commands import command_registry
 from liquer.state_types import encode_state_data, state_types_registry
 import traceback
 import requests
 from liquer.query import evaluate
+from liquer.profiling import profile_parameter
 from liquer.state import get_vars
 from liquer.cache import get_cache
 from liquer.store import get_store, KeyNotFoundStoreException
+import base64
 import io
 import traceback
 
@@ -36,7 +38,7 @@ class LiquerJsHandler:
 class CommandsHandler:
     def get(self):
         """Returns a list of commands in json format"""
-        self.write(json.dumps(command_registry().as_dict()))
+        self.write(json_codec.dumps(command_registry().as_dict()))
 
 
 def response(state):
@@ -62,10 +64,104 @@ class SubmitHandler:
         self.set_header(header, body)
 
     def get(self, query):
-        from liquer.pool import evaluate_in_background
+        from liquer.pool import evaluate_in_background, JobQueueFullException
 
-        evaluate_in_background(query)
-        self.write(json.dumps(dict(status="OK", message="Submitted", query=query)))
+        try:
+            priority = int(self.get_argument("priority", "0"))
+        except ValueError:
+            self.set_status(400)
+            self.write(
+                json_codec.dumps(
+                    dict(status="ERROR", message="Priority must be an integer", query=query)
+                )
+            )
+            return
+        try:
+            job = evaluate_in_background(query, priority=priority)
+        except JobQueueFullException as e:
+            self.set_status(503)
+            self.write(json_codec.dumps(dict(status="ERROR", message=str(e), query=query)))
+            return
+        self.write(
+            json_codec.dumps(
+                dict(status="OK", message="Submitted", query=query, job_id=job.job_id)
+            )
+        )
+
+
+# /api/jobs
+class JobsHandler:
+    """Status of the background jobs"""
+
+    def prepare(self):
+        self.set_header("Content-Type", "application/json")
+
+    def get(self):
+        from liquer.pool import get_scheduler
+
+        self.write(
+            json_codec.dumps(dict(status="OK", message="Jobs", **get_scheduler().status()))
+        )
+
+
+# /api/jobs/<job_id>
+class JobStatusHandler:
+    """Status of a background job"""
+
+    def prepare(self):
+        self.set_header("Content-Type", "application/json")
+
+    def get(self, job_id):
+        from liquer.pool import get_scheduler
+
+        job = get_scheduler().get_job(job_id)
+        if job is None:
+            self.set_status(404)
+            self.write(
+                json_codec.dumps(
+                    dict(status="ERROR", message=f"Job {job_id} not found", job_id=job_id)
+                )
+            )
+            return
+        self.write(json_codec.dumps(dict(status="OK", message=job.message, job=job.to_dict())))
+
+
+# /api/jobs/<job_id>/cancel
+class JobCancelHandler:
+    """Cancel a queued background job"""
+
+    def prepare(self):
+        self.set_header("Content-Type", "application/json")
+
+    def get(self, job_id):
+        from liquer.pool import get_scheduler
+
+        if get_scheduler().cancel(job_id):
+            result = dict(status="OK", message=f"Job {job_id} cancelled", job_id=job_id)
+        else:
+            result = dict(
+                status="ERROR", message=f"Job {job_id} can't be cancelled", job_id=job_id
+            )
+        self.write(json_codec.dumps(result))
+
+
+# /api/metrics
+class MetricsHandler:
+    """Evaluation metrics in the Prometheus/OpenMetrics text format"""
+
+    def get(self):
+        from liquer.instrumentation import get_metrics, OPENMETRICS_CONTENT_TYPE
+
+        metrics = get_metrics()
+        if metrics is None:
+            self.set_status(404)
+            self.set_header("Content-Type", "application/json")
+            self.write(
+                json_codec.dumps(dict(status="ERROR", message="Metrics are not enabled"))
+            )
+            return
+        self.set_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+        self.write(metrics.to_openmetrics())
 
 
 # /q/<path:query>
@@ -73,13 +169,16 @@ class QueryHandler:
     def get(self, query):
         """Main service for evaluating queries"""
         try:
-            kwargs = json.loads(self.request.body)
+            kwargs = json_codec.loads(self.request.body)
         except:
             kwargs = {}
         keys = self.request.arguments.keys()
         kwargs.update({key: self.get_argument(key) for key in keys})
+        profile = profile_parameter(kwargs)
         try:
-            b, mimetype, filename = response(evaluate(query, extra_parameters=kwargs))
+            b, mimetype, filename = response(
+                evaluate(query, extra_parameters=kwargs, profile=profile)
+            )
         except:
             traceback.print_exc()
             self.set_status(500)
@@ -101,7 +200,7 @@ class CacheGetDataHandler:
     def get(self, query):
         """Main service for evaluating queries"""
         try:
-            kwargs = json.loads(self.request.body)
+            kwargs = json_codec.loads(self.request.body)
         except:
             kwargs = {}
         keys = self.request.arguments.keys()
@@ -136,11 +235,11 @@ class CacheMetadataHandler:
         header = "Content-Type"
         body = mimetype
         self.set_header(header, body)
-        self.write(json.dumps(metadata))
+        self.write(json_codec.dumps(metadata))
 
     def post(self, param):
         try:
-            metadata = json.loads(self.request.body)
+            metadata = json_codec.loads(self.request.body)
             query = metadata.get("query")
             result_code = get_cache().store_metadata(metadata)
             result = dict(
@@ -158,7 +257,7 @@ class CacheMetadataHandler:
         header = "Content-Type"
         body = mimetype
         self.set_header(header, body)
-        self.write(json.dumps(result))
+        self.write(json_codec.dumps(result))
 
 
 # /api/cache/remove/<path:query>
@@ -169,7 +268,7 @@ class CacheRemoveHandler:
         header = "Content-Type"
         body = mimetype
         self.set_header(header, body)
-        self.write(json.dumps(dict(query=query, removed=r)))
+        self.write(json_codec.dumps(dict(query=query, removed=r)))
 
 
 # /api/cache/contains/<path:query>
@@ -180,7 +279,7 @@ class CacheContainsHandler:
         header = "Content-Type"
         body = mimetype
         self.set_header(header, body)
-        self.write(json.dumps(dict(query=query, cached=contains)))
+        self.write(json_codec.dumps(dict(query=query, cached=contains)))
 
 
 # /api/cache/keys.json
@@ -191,7 +290,7 @@ class CacheKeysHandler:
         header = "Content-Type"
         body = mimetype
         self.set_header(header, body)
-        self.write(json.dumps(keys))
+        self.write(json_codec.dumps(keys))
 
 
 # /api/cache/clean
@@ -204,7 +303,7 @@ class CacheCleanHandler:
         header = "Content-Type"
         body = mimetype
         self.set_header(header, body)
-        self.write(json.dumps(keys))
+        self.write(json_codec.dumps(keys))
 
 
 # /api/commands.json
@@ -214,7 +313,7 @@ class CommandsHandler:
         header = "Content-Type"
         body = mimetype
         self.set_header(header, body)
-        self.write(json.dumps(command_registry().as_dict()))
+        self.write(json_codec.dumps(command_registry().as_dict()))
 
 
 # /api/debug-json/<path:query>
@@ -229,7 +328,7 @@ class GetMetadataHandler:
     def get(self, query):
         state = evaluate(query)
         state_json = state.as_dict()
-        self.write(json.dumps(state_json))
+        self.write(json_codec.dumps(state_json))
 
 
 # /api/stored_metadata/<path:query>
@@ -245,7 +344,7 @@ class GetStoredMetadataHandler:
         import liquer.tools
 
         metadata = liquer.tools.get_stored_metadata(query)
-        self.write(json.dumps(metadata))
+        self.write(json_codec.dumps(metadata))
 
 
 # /api/build
@@ -262,13 +361,13 @@ class BuildHandler:
     def post(self):
         from liquer.parser import encode
 
-        query = encode(json.loads(self.request.body)["ql"])
+        query = encode(json_codec.loads(self.request.body)["ql"])
         link = (
             get_vars().get("server", "http://localhost")
             + get_vars().get("api_path", "/q/")
             + query
         )
-        self.write(json.dumps(dict(query=query, link=link, message="OK", status="OK")))
+        self.write(json_codec.dumps(dict(query=query, link=link, message="OK", status="OK")))
 
 
 #'/api/register_command/
@@ -289,14 +388,14 @@ class RegisterCommandHandler:
 
     def get(self, param):
         self.write(
-            json.dumps(
+            json_codec.dumps(
                 command_registry().register_remote_serialized(param.encode("ascii"))
             )
         )
 
     def post(self, param):
         self.write(
-            json.dumps(command_registry().register_remote_serialized(self.request.body))
+            json_codec.dumps(command_registry().register_remote_serialized(self.request.body))
         )
 
 
@@ -305,16 +404,24 @@ class GetStoreDataHandler:
     def get(self, query):
         """Get data from store. Equivalent to Store.get_bytes.
         Content type (MIME) is obtained from the metadata.
+        The md5 checksum of the data is used as an ETag.
         """
         store = get_store()
         metadata = store.get_metadata(query)
 
+        etag = metadata.get("fileinfo", {}).get("md5")
+        if etag is not None:
+            self.set_header("Etag", f'"{etag}"')
+            if self.check_etag_header():
+                self.set_status(304)
+                return
+
         try:
             mimetype = metadata.get("mimetype", "application/octet-stream")
             b = store.get_bytes(query)
         except:
             mimetype = "application/json"
-            b = json.dumps(
+            b = json_codec.dumps(
                 dict(query=query, message=traceback.format_exc(), status="ERROR")
             )
 
@@ -347,7 +454,7 @@ class StoreDataHandler(GetStoreDataHandler):
         header = "Content-Type"
         body = mimetype
         self.set_header(header, body)
-        self.write(json.dumps(response))
+        self.write(json_codec.dumps(response))
 
 
 # /api/store/upload/<path:query>
@@ -370,9 +477,8 @@ class StoreUploadHandler:
 
     def post(self, query):
         """Upload data to store - similar to /api/store/data, but using upload. Equivalent to Store.store.
-        Unlike store method, which stores both data and metadata in one call,
-        the api/store/data POST only stores the data. The metadata needs to be set in a separate POST of api/store/metadata
-        either before or after the api/store/data POST.
+        Metadata can be passed in an optional 'metadata' form field (json), so that data and metadata are stored in one request.
+        Without it, the existing metadata are kept and can be set in a separate POST of api/store/metadata.
         """
         if "file" not in self.request.files:
             response = dict(
@@ -390,7 +496,10 @@ class StoreUploadHandler:
             else:
                 store = get_store()
                 try:
-                    metadata = store.get_metadata(query)
+                    if "metadata" in self.request.body_arguments:
+                        metadata = json_codec.loads(self.request.body_arguments["metadata"][0])
+                    else:
+                        metadata = store.get_metadata(query)
                 except KeyNotFoundStoreException:
                     metadata = {}
                 try:
@@ -408,7 +517,7 @@ class StoreUploadHandler:
         header = "Content-Type"
         body = mimetype
         self.set_header(header, body)
-        self.write(json.dumps(response))
+        self.write(json_codec.dumps(response))
 
 
 # /api/store/metadata/<path:query>
@@ -424,7 +533,7 @@ class GetStoreMetadataHandler:
         header = "Content-Type"
         body = mimetype
         self.set_header(header, body)
-        self.write(json.dumps(metadata))
+        self.write(json_codec.dumps(metadata))
 
 class StoreMetadataHandler(GetStoreMetadataHandler):
     def post(self, query):
@@ -435,7 +544,7 @@ class StoreMetadataHandler(GetStoreMetadataHandler):
         """
         store = get_store()
         try:
-            metadata = json.loads(self.request.body)
+            metadata = json_codec.loads(self.request.body)
             store.store_metadata(query, metadata)
             response = dict(query=query, message="Metadata stored", status="OK")
         except:
@@ -445,7 +554,7 @@ class StoreMetadataHandler(GetStoreMetadataHandler):
         header = "Content-Type"
         body = mimetype
         self.set_header(header, body)
-        self.write(json.dumps(response))
+        self.write(json_codec.dumps(response))
 
 
 # /web/<path:query>
@@ -468,7 +577,7 @@ class WebStoreHandler:
             b = store.get_bytes(query)
         except:
             mimetype = "application/json"
-            b = json.dumps(
+            b = json_codec.dumps(
                 dict(query=query, message=traceback.format_exc(), status="ERROR")
             )
 
@@ -492,11 +601,11 @@ class StoreRemoveHandler:
         try:
             store.remove(query)
             self.write(
-                json.dumps(dict(query=query, message=f"Removed {query}", status="OK"))
+                json_codec.dumps(dict(query=query, message=f"Removed {query}", status="OK"))
             )
         except:
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(query=query, message=traceback.format_exc(), status="ERROR")
                 )
             )
@@ -514,13 +623,13 @@ class StoreRemovedirHandler:
         try:
             store.removedir(query)
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(query=query, message=f"Removed directory {query}", status="OK")
                 )
             )
         except:
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(query=query, message=traceback.format_exc(), status="ERROR")
                 )
             )
@@ -538,7 +647,7 @@ class StoreContainsHandler:
         try:
             contains = store.contains(query)
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(
                         query=query,
                         message=f"Contains {query}",
@@ -549,7 +658,7 @@ class StoreContainsHandler:
             )
         except:
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(query=query, message=traceback.format_exc(), status="ERROR")
                 )
             )
@@ -567,7 +676,7 @@ class StoreIsDirHandler:
         try:
             is_dir = store.is_dir(query)
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(
                         query=query,
                         message=f"Is directory {query}",
@@ -578,7 +687,7 @@ class StoreIsDirHandler:
             )
         except:
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(query=query, message=traceback.format_exc(), status="ERROR")
                 )
             )
@@ -596,13 +705,13 @@ class StoreKeysHandler:
         try:
             keys = store.keys()
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(query=None, message=f"Keys obtained", keys=keys, status="OK")
                 )
             )
         except:
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(query=query, message=traceback.format_exc(), status="ERROR")
                 )
             )
@@ -620,7 +729,7 @@ class StoreListdirHandler:
         try:
             listdir = store.listdir(query)
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(
                         query=query,
                         message=f"Keys obtained",
@@ -631,7 +740,7 @@ class StoreListdirHandler:
             )
         except:
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(query=query, message=traceback.format_exc(), status="ERROR")
                 )
             )
@@ -649,11 +758,116 @@ class StoreMakedirHandler:
         try:
             store.makedir(query)
             self.write(
-                json.dumps(dict(query=query, message=f"Makedir succeeded", status="OK"))
+                json_codec.dumps(dict(query=query, message=f"Makedir succeeded", status="OK"))
             )
         except:
             self.write(
-                json.dumps(
+                json_codec.dumps(
                     dict(query=query, message=traceback.format_exc(), status="ERROR")
                 )
             )
+
+
+# /api/store/get_many
+class StoreGetManyHandler:
+    def prepare(self):
+        header = "Content-Type"
+        body = "application/json"
+        self.set_header(header, body)
+
+    def post(self):
+        """Get data for multiple keys. Equivalent to Store.get_many.
+        Expects a json {"keys":[...]}, data are returned base64-encoded.
+        """
+        store = get_store()
+        try:
+            keys = json_codec.loads(self.request.body)["keys"]
+            data = {
+                key: base64.b64encode(b).decode("ascii")
+                for key, b in store.get_many(keys).items()
+            }
+            self.write(
+                json_codec.dumps(
+                    dict(
+                        query=None,
+                        message=f"{len(data)} items obtained",
+                        data=data,
+                        status="OK",
+                    )
+                )
+            )
+        except:
+            self.write(
+                json_codec.dumps(
+                    dict(query=None, message=traceback.format_exc(), status="ERROR")
+                )
+            )
+
+
+# /api/store/get_metadata_many
+class StoreGetMetadataManyHandler:
+    def prepare(self):
+        header = "Content-Type"
+        body = "application/json"
+        self.set_header(header, body)
+
+    def post(self):
+        """Get metadata for multiple keys. Equivalent to Store.get_metadata_many.
+        Expects a json {"keys":[...]}.
+        """
+        store = get_store()
+        try:
+            keys = json_codec.loads(self.request.body)["keys"]
+            metadata = store.get_metadata_many(keys)
+            self.write(
+                json_codec.dumps(
+                    dict(
+                        query=None,
+                        message=f"{len(metadata)} metadata obtained",
+                        metadata=metadata,
+                        status="OK",
+                    )
+                )
+            )
+        except:
+            self.write(
+                json_codec.dumps(
+                    dict(query=None, message=traceback.format_exc(), status="ERROR")
+                )
+            )
+
+
+# /api/store/store_many
+class StoreStoreManyHandler:
+    def prepare(self):
+        header = "Content-Type"
+        body = "application/json"
+        self.set_header(header, body)
+
+    def post(self):
+        """Store multiple items. Equivalent to Store.store_many.
+        Expects a json {"items":[{"key":..., "data":..., "metadata":{...}}, ...]} with base64-encoded data.
+        """
+        store = get_store()
+        try:
+            items = [
+                (x["key"], base64.b64decode(x["data"]), x.get("metadata", {}))
+                for x in json_codec.loads(self.request.body)["items"]
+            ]
+            store.store_many(items)
+            self.write(
+                json_codec.dumps(
+                    dict(
+                        query=None,
+                        message=f"{len(items)} items stored",
+                        keys=[key for key, _, _ in items],
+                        status="OK",
+                    )
+                )
+            )
+        except:
+            self.write(
+                json_codec.dumps(
+                    dict(query=None, message=traceback.format_exc(), status="ERROR")
+                )
+            )
@@ -35,6 +35,26 @@ class SubmitHandler(h.SubmitHandler, BaseHandler):
     pass
 
 
+# /api/jobs
+class JobsHandler(h.JobsHandler, BaseHandler):
+    pass
+
+
+# /api/metrics
+class MetricsHandler(h.MetricsHandler, BaseHandler):
+    pass
+
+
+# /api/jobs/<job_id>
+class JobStatusHandler(h.JobStatusHandler, BaseHandler):
+    pass
+
+
+# /api/jobs/<job_id>/cancel
+class JobCancelHandler(h.JobCancelHandler, BaseHandler):
+    pass
+
+
 # /q/<path:query>
 class QueryHandler(h.QueryHandler, BaseHandler):
     pass
@@ -156,6 +176,21 @@ class StoreMakedirHandler(h.StoreMakedirHandler, BaseHandler):
     pass
 
 
+# /api/store/get_many
+class StoreGetManyHandler(h.StoreGetManyHandler, BaseHandler):
+    pass
+
+
+# /api/store/get_metadata_many
+class StoreGetMetadataManyHandler(h.StoreGetMetadataManyHandler, BaseHandler):
+    pass
+
+
+# /api/store/store_many
+class StoreStoreManyHandler(h.StoreStoreManyHandler, BaseHandler):
+    pass
+
+
 # class DebugQueryHandler(h.DebugQueryHandler, BaseHandler):
 #    pass
 
@@ -165,6 +200,10 @@ def url_mapping():
         (r"/liquer/api/commands.json", CommandsHandler),
         (r"/liquer/submit/(.*)", SubmitHandler),
         (r"/liquer/q/(.*)", QueryHandler),
+        (r"/liquer/api/jobs", JobsHandler),
+        (r"/liquer/api/metrics", MetricsHandler),
+        (r"/liquer/api/jobs/([^/]+)/cancel", JobCancelHandler),
+        (r"/liquer/api/jobs/([^/]+)", JobStatusHandler),
         (r"/liquer/api/cache/get/(.*)", CacheGetDataHandler),
         (r"/liquer/api/cache/meta/(.*)", CacheMetadataHandler),
         (r"/liquer/api/cache/remove/(.*)", CacheRemoveHandler),
@@ -187,6 +226,9 @@ def url_mapping():
         (r"/liquer/api/store/keys", StoreKeysHandler),
         (r"/liquer/api/store/listdir/(.*)", StoreListdirHandler),
         (r"/liquer/api/store/makedir/(.*)", StoreMakedirHandler),
+        (r"/liquer/api/store/get_many", StoreGetManyHandler),
+        (r"/liquer/api/store/get_metadata_many", StoreGetMetadataManyHandler),
+        (r"/liquer/api/store/store_many", StoreStoreManyHandler),
     ]
 
 def url_mapping_ro():
@@ -208,6 +250,8 @@ def url_mapping_ro():
         (r"/liquer/api/store/is_dir/(.*)", StoreIsDirHandler),
         (r"/liquer/api/store/keys", StoreKeysHandler),
         (r"/liquer/api/store/listdir/(.*)", StoreListdirHandler),
+        (r"/liquer/api/store/get_many", StoreGetManyHandler),
+        (r"/liquer/api/store/get_metadata_many", StoreGetMetadataManyHandler),
     ]
 
 
@@ -245,7 +289,8 @@ if __name__ == "__main__":
             (r"/", LiquerIndexHandler),
             (r"/index.html", LiquerIndexHandler),
             (r"/liquer.js", LiquerJsHandler),
-        ]
+        ],
+        compress_response=True,
     )
     application.listen(port)
     tornado.ioloop.IOLoop.current().start()
@@ -8,11 +8,20 @@ The error status as well as other metadata can be inspected by accessing the Sta
 Metadata is stored in the *State* *metadata* property as a dictionary.
 """
 import json
-from liquer.state_types import type_identifier_of, copy_state_data, data_characteristics
+from liquer.state_types import (
+    type_identifier_of,
+    copy_state_data,
+    lazy_data_characteristics,
+    DataCharacteristics,
+)
 from liquer.constants import mimetype_from_extension
+from liquer.metadata import copy_metadata
 
 from copy import deepcopy
 from liquer.parser import QueryException, Position
+import logging
+
+logger = logging.getLogger(__name__)
 
 _vars = None
 
@@ -71,14 +80,14 @@ class State(object):
                 type_identifier=type_identifier_of(data),
                 caching=True,
                 attributes={},
-                data_characteristics=data_characteristics(data),
+                data_characteristics=lazy_data_characteristics(data),
             )
         )
 
     def next_state(self):
-        state = self.__class__()
-        state = state.from_dict(self.as_dict()).with_data(None)
-        return state
+        metadata = copy_metadata(self.metadata)
+        metadata.pop("data_characteristics", None)
+        return self.__class__(metadata=metadata).with_data(None)
 
     @property
     def query(self):
@@ -135,7 +144,17 @@ class State(object):
         """Set the data"""
         self.data = data
         self.metadata["type_identifier"] = type_identifier_of(data)
-        self.metadata["data_characteristics"] = data_characteristics(data)
+        self.metadata["data_characteristics"] = lazy_data_characteristics(data)
+        return self
+
+    def materialize_data_characteristics(self):
+        """Replace the lazily computed data characteristics in the metadata by a plain dictionary.
+        This is done when the state leaves the evaluation, so that the metadata is JSON-serializable
+        and the data characteristics do not depend on the later changes of the data.
+        """
+        dc = self.metadata.get("data_characteristics")
+        if isinstance(dc, DataCharacteristics):
+            self.metadata["data_characteristics"] = dc.value()
         return self
 
     def with_source(self, source):
@@ -154,7 +173,7 @@ class State(object):
         """Get data from the state"""
         if self.is_error:
             tb = "\n".join((m.get("traceback", "") or "-") for m in self.metadata["log"])
-            print(tb)
+            logger.debug("Getting data from a state with error:\n%s", tb)
             position = None
             query = None
             for entry in self.metadata["log"]:
@@ -245,10 +264,17 @@ class State(object):
     def clone(self):
         """Clone the state including the deep copy of the data"""
         state = self.__class__()
-        state = state.from_dict(self.as_dict())
+        state.metadata = deepcopy(self.metadata)
         state.data = copy_state_data(self.data)
+        state.exclusive = True
         return state
 
+    def shallow_clone(self):
+        """Clone the state sharing the data with the original.
+        Metadata are copied by copy_metadata, hence can be modified independently.
+        """
+        return self.__class__(data=self.data, metadata=copy_metadata(self.metadata))
+
     def with_filename(self, filename):
         """set filename"""
         self.metadata["filename"] = filename
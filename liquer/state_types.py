@@ -27,8 +27,9 @@ of a state being cached or served is limited.
 """
 
 from io import BytesIO, StringIO
-import json
+import liquer.json_codec as json_codec
 from copy import deepcopy
+from collections.abc import Mapping
 import base64
 import pickle
 from liquer.constants import mimetype_from_extension, MIMETYPES
@@ -114,6 +115,59 @@ def data_characteristics(data):
     return ch
 
 
+class DataCharacteristics(Mapping):
+    """Lazily computed data characteristics.
+    Behaves like a read-only dictionary; the data characteristics (see data_characteristics function)
+    are computed on the first access and memoized.
+    This avoids computing data characteristics of intermediate states, which are never inspected.
+    Deep copy, pickling and JSON serialization (via liquer.json_codec) produce a plain dictionary.
+    """
+
+    __slots__ = ("_data", "_value")
+
+    def __init__(self, data):
+        self._data = data
+        self._value = None
+
+    def is_computed(self):
+        return self._value is not None
+
+    def value(self):
+        """Return data characteristics as a dictionary (computed if necessary)"""
+        if self._value is None:
+            self._value = data_characteristics(self._data)
+            self._data = None
+        return self._value
+
+    def __getitem__(self, key):
+        return self.value()[key]
+
+    def __iter__(self):
+        return iter(self.value())
+
+    def __len__(self):
+        return len(self.value())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return deepcopy(self.value(), memo)
+
+    def __reduce__(self):
+        return (dict, (self.value(),))
+
+    def __repr__(self):
+        if self.is_computed():
+            return f"DataCharacteristics({repr(self._value)})"
+        return "DataCharacteristics(<not computed>)"
+
+
+def lazy_data_characteristics(data):
+    """Data characteristics computed lazily on the first access (see DataCharacteristics)"""
+    return DataCharacteristics(data)
+
+
 def type_identifier_of(data):
     """Convenience function to return a state type identifier for supplied data"""
     return state_types_registry().get(get_type_qualname(type(data))).identifier()
@@ -207,6 +261,14 @@ class StateType(object):
             "State type class must define deserialization from bytes (from_bytes)"
         )
 
+    def from_file(self, path, extension=None):
+        """Deserialize data from a file.
+        By default the file is read and deserialized with from_bytes;
+        state types may override this to read the file more efficiently (e.g. memory-map it).
+        """
+        with open(path, "rb") as f:
+            return self.from_bytes(f.read(), extension=extension)
+
     def copy(self, data):
         """Create a deep copy of data.
         Data must be of this state type."""
@@ -239,7 +301,7 @@ class DictStateType(StateType):
 
     def encode_element(self, data_element):
         if isinstance(data_element, (int, float, str)) or data_element is None:
-            return json.dumps(data_element)
+            return json_codec.dumps(data_element)
         else:
             reg = state_types_registry()
             t = reg.get(get_type_qualname(type(data_element)))
@@ -275,7 +337,7 @@ class DictStateType(StateType):
             d += "\n}"
             return d.encode("utf-8"), mimetype_from_extension("djson")
         elif extension == "json":
-            return json.dumps(data).encode("utf-8"), mimetype_from_extension("json")
+            return json_codec.dumpb(data), mimetype_from_extension("json")
 
         raise Exception(f"Unsupported file extension: {extension}")
 
@@ -284,11 +346,11 @@ class DictStateType(StateType):
             extension = self.default_extension()
         if extension == "djson":
             d = {}
-            for key, value in json.loads(b.decode("utf-8")).items():
+            for key, value in json_codec.loads(b).items():
                 d[key] = self.decode_element(value)
             return d
         elif extension == "json":
-            return json.loads(b.decode("utf-8"))
+            return json_codec.loads(b)
 
     def copy(self, data):
         return deepcopy(data)
@@ -317,13 +379,13 @@ class JsonStateType(StateType):
             extension = self.default_extension()
 
         if extension == "json":
-            return json.dumps(data).encode("utf-8"), self.default_mimetype()
+            return json_codec.dumpb(data), self.default_mimetype()
         elif extension in ["html", "htm"]:
             if isinstance(data, str):
                 return data.encode("utf-8"), mimetype_from_extension("html")
             else:
                 return (
-                    f"<pre>{json.dumps(data)}</pre>".encode("utf-8"),
+                    f"<pre>{json_codec.dumps(data)}</pre>".encode("utf-8"),
                     mimetype_from_extension("html"),
                 )
         raise Exception(f"Unsupported file extension: {extension}")
@@ -333,7 +395,7 @@ class JsonStateType(StateType):
             extension = self.default_extension()
 
         assert extension == "json"
-        return json.loads(b.decode("utf-8"))
+        return json_codec.loads(b)
 
     def copy(self, data):
         return deepcopy(data)
@@ -379,13 +441,13 @@ class PickleStateType(StateType):
         if extension in ["pkl", "pickle"]:
             return pickle.dumps(data), mimetype_from_extension("pickle")
         elif extension == "json":
-            return json.dumps(data).encode("utf-8"), mimetype_from_extension("json")
+            return json_codec.dumpb(data), mimetype_from_extension("json")
         elif extension in ["html", "htm"]:
             if isinstance(data, str):
                 return data.encode("utf-8"), mimetype_from_extension("html")
             else:
                 return (
-                    f"<pre>{json.dumps(data)}</pre>".encode("utf-8"),
+                    f"<pre>{json_codec.dumps(data)}</pre>".encode("utf-8"),
                     mimetype_from_extension("html"),
                 )
         raise Exception(f"Unsupported file extension: {extension}")
@@ -397,7 +459,7 @@ class PickleStateType(StateType):
         if extension in ["pkl", "pickle"]:
             return pickle.loads(b)
         elif extension == "json":
-            return json.loads(b.decode("utf-8"))
+            return json_codec.loads(b)
         raise Exception(f"Unsupported file extension: {extension}")
 
     def copy(self, data):
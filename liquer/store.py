@@ -26,13 +26,28 @@ By convention, the folder "web" in the get_store() holds web interface and can b
 """
 from os import makedirs, name, remove
 from pathlib import Path
-import json
+import liquer.json_codec as json_codec
 from io import BytesIO
 from liquer.constants import *
 import liquer.util as util
 import hashlib
 from liquer.metadata import Metadata
+from liquer.dependencies import resource_fingerprint
+from liquer.compression import (
+    COMPRESSION_KEY,
+    ClosingStream,
+    compression_policy,
+    compress,
+    decompress,
+    get_codec,
+    preserve_compression,
+    without_compression,
+)
+from collections import OrderedDict
 import traceback
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 STORE = None
@@ -176,6 +191,22 @@ class StoreMixin:
         else:
             return IndexerStore(self)
 
+    def with_cache(self, cache_store=None, max_size=None, revalidate=True):
+        """Create a read-through caching proxy for the store.
+        Data are served from a (fast, local) cache_store and fetched from the current store (self) on a miss.
+        See CachingStore for details.
+        """
+        return CachingStore(
+            self, cache_store=cache_store, max_size=max_size, revalidate=revalidate
+        )
+
+    def with_compression(self, compression="auto"):
+        """Create a proxy compressing the data stored in the current store (self).
+        Compression is a codec name (e.g. "gzip", "zstd"), "auto" or a compression policy.
+        See CompressingStore for details.
+        """
+        return CompressingStore(self, compression=compression)
+
 
 def key_name(key):
     """Get name of the key - i.e. last component after slash.
@@ -251,7 +282,7 @@ class Store(StoreMixin):
     def finalize_metadata(self, metadata, key, is_dir=False, data=None, update=False):
         if data is not None:
             if type(data) != bytes:
-                print(f"WARNING: Non-binary data for '{key}': type is {type(data)}")
+                logger.warning("Non-binary data for '%s': type is %s", key, type(data))
         if key is None:
             key = ""
         metadata["key"] = key
@@ -336,6 +367,44 @@ class Store(StoreMixin):
         else:
             return [self.join_key(key, k) for k in self.listdir(key)]
 
+    def get_many(self, keys):
+        """Get data for multiple keys.
+        Returns a dictionary key -> bytes; keys that are not found are omitted.
+        Default implementation calls get_bytes for each key.
+        Stores with expensive round-trips (e.g. remote stores) should override this
+        with a batched or concurrent implementation.
+        """
+        result = {}
+        for key in keys:
+            try:
+                result[key] = self.get_bytes(key)
+            except StoreException:
+                pass
+        return result
+
+    def get_metadata_many(self, keys):
+        """Get metadata for multiple keys.
+        Returns a dictionary key -> metadata; keys that are not found are omitted.
+        Default implementation calls get_metadata for each key.
+        """
+        result = {}
+        for key in keys:
+            try:
+                metadata = self.get_metadata(key)
+            except StoreException:
+                continue
+            if metadata is not None:
+                result[key] = metadata
+        return result
+
+    def store_many(self, items):
+        """Store multiple items.
+        Items is an iterable of (key, data, metadata) tuples.
+        Default implementation calls store for each item.
+        """
+        for key, data, metadata in items:
+            self.store(key, data, metadata)
+
     def makedir(self, key):
         "Make a directory"
         raise KeyNotSupportedStoreException(key=key, store=self)
@@ -443,10 +512,9 @@ class FileStore(Store):
                 if self.metadata_path_for_key(key).exists():
                     with open(self.metadata_path_for_key(key)) as f:
                         try:
-                            metadata.update(json.loads(f.read()))
+                            metadata.update(json_codec.loads(f.read()))
                         except:
-                            traceback.print_exc()
-                            print(f"Removing {key} due to corrupted metadata (a)")
+                            logger.exception("Removing %s due to corrupted metadata (a)", key)
                             self.remove(key)
                             raise KeyNotFoundStoreException(key=key, store=self)
                 else:
@@ -458,10 +526,9 @@ class FileStore(Store):
                 if self.metadata_path_for_key(key).exists():
                     with open(self.metadata_path_for_key(key)) as f:
                         try:
-                            metadata.update(json.loads(f.read()))
+                            metadata.update(json_codec.loads(f.read()))
                         except:
-                            traceback.print_exc()
-                            print(f"Removing {key} due to corrupted metadata (b)")
+                            logger.exception("Removing %s due to corrupted metadata (b)", key)
                             self.remove(key)
                             raise KeyNotFoundStoreException(key=key, store=self)
 
@@ -484,7 +551,7 @@ class FileStore(Store):
             metadata, key=key, is_dir=self.is_dir(key), update=True
         )
         with open(self.metadata_path_for_key(key), "w") as f:
-            json.dump(metadata, f)
+            f.write(json_codec.dumps(metadata))
         self.on_metadata_changed(key)
 
     def remove(self, key):
@@ -724,6 +791,19 @@ class ProxyStore(Store):
         self._store.removedir(key, recursive=recursive)
         self.on_removed(key)
 
+    def get_many(self, keys):
+        return self._store.get_many(keys)
+
+    def get_metadata_many(self, keys):
+        return self._store.get_metadata_many(keys)
+
+    def store_many(self, items):
+        items = list(items)
+        self._store.store_many(items)
+        for key, data, metadata in items:
+            self.on_data_changed(key)
+            self.on_metadata_changed(key)
+
     def contains(self, key):
         return self._store.contains(key)
 
@@ -771,6 +851,19 @@ class IndexerStore(ProxyStore):
         self.on_data_changed(key)
         self.on_metadata_changed(key)
 
+    def store_many(self, items):
+        from liquer.indexer import index
+
+        indexed = []
+        for key, data, metadata in items:
+            metadata = self._store.finalize_metadata(metadata, key=key, is_dir=False, data=data)
+            metadata = index(key=self.to_root_key(key), query=metadata.get("query"), data=data, metadata=metadata)
+            indexed.append((key, data, metadata))
+        self._store.store_many(indexed)
+        for key, data, metadata in indexed:
+            self.on_data_changed(key)
+            self.on_metadata_changed(key)
+
     def mount(self, key, store):
         """Mount a store in a mount-point"""
         r = self._store.mount(key, store)
@@ -792,6 +885,9 @@ class ReadOnlyStore(ProxyStore):
     def store_metadata(self, key, metadata):
         raise ReadOnlyStoreException(key=key, store=self)
 
+    def store_many(self, items):
+        raise ReadOnlyStoreException(store=self)
+
     def remove(self, key):
         raise ReadOnlyStoreException(key=key, store=self)
 
@@ -808,6 +904,307 @@ class ReadOnlyStore(ProxyStore):
         return f"ReadOnlyStore({repr(self._store)})"
 
 
+class CachingStore(ProxyStore):
+    """Read-through caching proxy to a (slow) store, e.g. S3Store, RemoteStore or FSSpecStore.
+    Data are read from the cache_store (typically a local FileStore or a MemoryStore)
+    and on a miss they are fetched from the underlying store and kept in the cache_store.
+    Writes go to the underlying store and the cache is updated as well (write-through).
+
+    If revalidate is True, the fingerprint (md5 checksum, alternatively the update time and size)
+    from the metadata of the underlying store is compared with the fingerprint of the cached copy
+    on every read, so that only the (small) metadata are fetched when the data did not change.
+    If revalidate is False, cached data are trusted, which is suitable when the underlying store
+    is not modified by anyone else.
+
+    Total size of the cached data is limited by max_size (in bytes, None means unlimited);
+    least recently used data are evicted first.
+    Metadata are always read from the underlying store.
+    """
+
+    FINGERPRINT = "cache_fingerprint"
+
+    def __init__(self, store, cache_store=None, max_size=None, revalidate=True):
+        super().__init__(store)
+        if cache_store is None:
+            cache_store = MemoryStore()
+        self.cache_store = cache_store
+        self.max_size = max_size
+        self.revalidate = revalidate
+        self.hits = 0
+        self.misses = 0
+        self._sizes = OrderedDict()
+        self._init_sizes()
+
+    def _init_sizes(self):
+        """Register data already present in a persistent cache_store."""
+        keys = [key for key in self.cache_store.keys() if not self.cache_store.is_dir(key)]
+        for key, metadata in self.cache_store.get_metadata_many(keys).items():
+            size = metadata.get("fileinfo", {}).get("size")
+            if metadata.get(self.FINGERPRINT) is None or size is None:
+                self.cache_store.remove(key)
+            else:
+                self._sizes[key] = size
+        self._evict()
+
+    @property
+    def cache_size(self):
+        """Total size of the cached data in bytes."""
+        return sum(self._sizes.values())
+
+    def _evict(self):
+        if self.max_size is None:
+            return
+        total = self.cache_size
+        while total > self.max_size and len(self._sizes):
+            key, size = self._sizes.popitem(last=False)
+            total -= size
+            try:
+                self.cache_store.remove(key)
+            except StoreException:
+                pass
+
+    def _invalidate(self, key):
+        if self._sizes.pop(key, None) is not None:
+            try:
+                self.cache_store.remove(key)
+            except StoreException:
+                pass
+
+    def _invalidate_prefix(self, key):
+        if key in ("", None):
+            keys = list(self._sizes.keys())
+        else:
+            keys = [k for k in self._sizes if k == key or k.startswith(key + "/")]
+        for k in keys:
+            self._invalidate(k)
+
+    def _put(self, key, data, fingerprint):
+        self._invalidate(key)
+        if fingerprint is None:
+            return
+        if self.max_size is not None and len(data) > self.max_size:
+            return
+        self.cache_store.store(key, data, {self.FINGERPRINT: fingerprint})
+        self._sizes[key] = len(data)
+        self._evict()
+
+    def _cached(self, key, metadata=None):
+        """Return cached data or None.
+        If revalidate is True, metadata of the underlying store are needed for the validation.
+        """
+        if key not in self._sizes:
+            return None
+        if self.revalidate:
+            try:
+                cached_fingerprint = self.cache_store.get_metadata(key).get(
+                    self.FINGERPRINT
+                )
+            except StoreException:
+                cached_fingerprint = None
+            if cached_fingerprint is None or cached_fingerprint != resource_fingerprint(
+                metadata
+            ):
+                self._invalidate(key)
+                return None
+        try:
+            data = self.cache_store.get_bytes(key)
+        except StoreException:
+            self._invalidate(key)
+            return None
+        self._sizes.move_to_end(key)
+        return data
+
+    def get_bytes(self, key):
+        metadata = self._store.get_metadata(key) if self.revalidate else None
+        data = self._cached(key, metadata)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+        data = self._store.get_bytes(key)
+        if metadata is None:
+            metadata = self._store.get_metadata(key)
+        self._put(key, data, resource_fingerprint(metadata))
+        return data
+
+    def get_many(self, keys):
+        keys = list(keys)
+        metadata = self._store.get_metadata_many(keys) if self.revalidate else {}
+        result = {}
+        missing = []
+        for key in keys:
+            data = self._cached(key, metadata.get(key))
+            if data is None:
+                missing.append(key)
+            else:
+                result[key] = data
+        self.hits += len(result)
+        self.misses += len(missing)
+        if len(missing):
+            fetched = self._store.get_many(missing)
+            if not self.revalidate:
+                metadata = self._store.get_metadata_many(list(fetched.keys()))
+            for key, data in fetched.items():
+                self._put(key, data, resource_fingerprint(metadata.get(key)))
+                result[key] = data
+        return result
+
+    def store(self, key, data, metadata):
+        metadata = self._store.finalize_metadata(
+            metadata, key=key, is_dir=False, data=data
+        )
+        self._store.store(key, data, metadata)
+        self._put(key, data, resource_fingerprint(metadata))
+        self.on_data_changed(key)
+        self.on_metadata_changed(key)
+
+    def store_many(self, items):
+        items = [
+            (
+                key,
+                data,
+                self._store.finalize_metadata(metadata, key=key, is_dir=False, data=data),
+            )
+            for key, data, metadata in items
+        ]
+        self._store.store_many(items)
+        for key, data, metadata in items:
+            self._put(key, data, resource_fingerprint(metadata))
+            self.on_data_changed(key)
+            self.on_metadata_changed(key)
+
+    def remove(self, key):
+        self._invalidate(key)
+        super().remove(key)
+
+    def removedir(self, key, recursive=False):
+        self._invalidate_prefix(key)
+        super().removedir(key, recursive=recursive)
+
+    def openbin(self, key, mode="r", buffering=-1):
+        mode = dict(r="rb", w="wb").get(mode, mode)
+        if mode == "rb":
+            return BytesIO(self.get_bytes(key))
+        self._invalidate(key)
+        return self._store.openbin(key, mode, buffering)
+
+    def clone(self):
+        """Clone the store."""
+        return self.__class__(
+            self._store.clone(),
+            cache_store=self.cache_store.clone(),
+            max_size=self.max_size,
+            revalidate=self.revalidate,
+        )
+
+    def __str__(self):
+        return f"cache of {self._store} in {self.cache_store}"
+
+    def __repr__(self):
+        return f"CachingStore({repr(self._store)}, {repr(self.cache_store)})"
+
+
+class CompressingStore(ProxyStore):
+    """Proxy store compressing the data stored in the underlying store.
+
+    The codec is selected by a compression policy (see liquer.compression)
+    from the type identifier (in metadata), key extension and data size.
+    The codec is recorded in the metadata of the underlying store, so the decompression is transparent;
+    metadata returned by this store do not contain the compression record.
+    Note that fileinfo (size, md5) in the metadata describe the stored (compressed) data.
+    Large blobs can be compressed or decompressed as a stream via openbin
+    (if the underlying store supports openbin).
+    """
+
+    def __init__(self, store, compression="auto"):
+        super().__init__(store)
+        self.compression = compression_policy(compression)
+
+    def _stored_metadata(self, key):
+        try:
+            return self._store.get_metadata(key)
+        except StoreException:
+            return None
+
+    def _compress(self, key, data, metadata):
+        return compress(
+            data,
+            metadata,
+            self.compression,
+            type_identifier=metadata.get("type_identifier"),
+            extension=key_extension(key),
+        )
+
+    def get_bytes(self, key):
+        return decompress(self._store.get_bytes(key), self._stored_metadata(key))
+
+    def get_metadata(self, key):
+        return without_compression(self._store.get_metadata(key))
+
+    def store(self, key, data, metadata):
+        data, metadata = self._compress(key, data, metadata)
+        self._store.store(key, data, metadata)
+        self.on_data_changed(key)
+        self.on_metadata_changed(key)
+
+    def store_metadata(self, key, metadata):
+        metadata = preserve_compression(metadata, self._stored_metadata(key))
+        self._store.store_metadata(key, metadata)
+        self.on_metadata_changed(key)
+
+    def get_many(self, keys):
+        keys = list(keys)
+        data = self._store.get_many(keys)
+        metadata = self._store.get_metadata_many(list(data.keys()))
+        return {key: decompress(b, metadata.get(key)) for key, b in data.items()}
+
+    def get_metadata_many(self, keys):
+        return {
+            key: without_compression(metadata)
+            for key, metadata in self._store.get_metadata_many(keys).items()
+        }
+
+    def store_many(self, items):
+        items = [(key,) + self._compress(key, data, metadata) for key, data, metadata in items]
+        super().store_many(items)
+
+    def openbin(self, key, mode="r", buffering=-1):
+        mode = dict(r="rb", w="wb").get(mode, mode)
+        if mode == "rb":
+            metadata = self._stored_metadata(key)
+            name = None if metadata is None else metadata.get(COMPRESSION_KEY)
+            f = self._store.openbin(key, mode, buffering)
+            if name is None:
+                return f
+            return ClosingStream(get_codec(name).open(f, "rb"), f)
+
+        name = self.compression.select(
+            float("inf"), extension=key_extension(key)
+        )
+        f = self._store.openbin(key, mode, buffering)
+        if name is None:
+            return f
+
+        def on_close():
+            metadata = self._stored_metadata(key) or {}
+            metadata[COMPRESSION_KEY] = name
+            self._store.store_metadata(key, metadata)
+            self.on_data_changed(key)
+            self.on_metadata_changed(key)
+
+        return ClosingStream(get_codec(name).open(f, "wb"), f, on_close=on_close)
+
+    def clone(self):
+        """Clone the store."""
+        return self.__class__(self._store.clone(), compression=self.compression)
+
+    def __str__(self):
+        return f"compressed {self._store}"
+
+    def __repr__(self):
+        return f"CompressingStore({repr(self._store)}, {repr(self.compression)})"
+
+
 class OverlayStore(Store):
     """Overlay store combines two stores: overlay and fallback.
     Overlay is used as a primary store for reading and writing.
@@ -974,6 +1371,59 @@ class RoutingStore(Store):
         self.on_data_changed(key)
         self.on_metadata_changed(key)
 
+    def _route_many(self, keys):
+        """Group keys by the store they are routed to.
+        Returns a list of (store, keys) tuples and a list of keys without a route.
+        """
+        routes = {}
+        unrouted = []
+        for key in keys:
+            try:
+                store = self.route_to(key)
+            except StoreException:
+                unrouted.append(key)
+                continue
+            if id(store) not in routes:
+                routes[id(store)] = (store, [])
+            routes[id(store)][1].append(key)
+        return list(routes.values()), unrouted
+
+    def get_many(self, keys):
+        result = {}
+        routes, _ = self._route_many(keys)
+        for store, store_keys in routes:
+            result.update(store.get_many(store_keys))
+        return result
+
+    def get_metadata_many(self, keys):
+        result = {}
+        routes, unrouted = self._route_many(keys)
+        for store, store_keys in routes:
+            for key, metadata in store.get_metadata_many(store_keys).items():
+                metadata["key"] = key
+                result[key] = metadata
+        for key in unrouted:
+            # e.g. virtual directories of a MountPointStore
+            try:
+                result[key] = self.get_metadata(key)
+            except StoreException:
+                pass
+        return result
+
+    def store_many(self, items):
+        items = list(items)
+        routes = {}
+        for key, data, metadata in items:
+            store = self.route_to(key)
+            if id(store) not in routes:
+                routes[id(store)] = (store, [])
+            routes[id(store)][1].append((key, data, metadata))
+        for store, store_items in routes.values():
+            store.store_many(store_items)
+        for key, data, metadata in items:
+            self.on_data_changed(key)
+            self.on_metadata_changed(key)
+
     def store_metadata(self, key, metadata):
         self.route_to(key).store_metadata(key, metadata)
         self.on_metadata_changed(key)
@@ -1061,6 +1511,46 @@ class KeyTranslatingStore(Store):
         self.on_data_changed(key)
         self.on_metadata_changed(key)
 
+    def _translate_many(self, keys):
+        translated = {}
+        for key in keys:
+            try:
+                tkey = self.translate_key(key)
+            except KeyNotSupportedStoreException:
+                continue
+            if tkey is not None:
+                translated[tkey] = key
+        return translated
+
+    def get_many(self, keys):
+        translated = self._translate_many(keys)
+        return {
+            translated[tkey]: data
+            for tkey, data in self.substore.get_many(list(translated)).items()
+        }
+
+    def get_metadata_many(self, keys):
+        translated = self._translate_many(keys)
+        result = {}
+        for tkey, metadata in self.substore.get_metadata_many(list(translated)).items():
+            key = translated[tkey]
+            metadata["key"] = key
+            if "recipes_key" in metadata:
+                metadata["recipes_key"] = self.translate_key(
+                    metadata["recipes_key"], inverse=True
+                )
+            result[key] = metadata
+        return result
+
+    def store_many(self, items):
+        items = list(items)
+        self.substore.store_many(
+            [(self.translate_key(key), data, metadata) for key, data, metadata in items]
+        )
+        for key, data, metadata in items:
+            self.on_data_changed(key)
+            self.on_metadata_changed(key)
+
     def store_metadata(self, key, metadata):
         self.substore.store_metadata(self.translate_key(key), metadata)
         self.on_metadata_changed(key)
@@ -1346,13 +1836,12 @@ class FileSystemStore(Store):
                 if self.fs.exists(self.metadata_path_for_key(key)):
                     try:
                         metadata.update(
-                            json.loads(
+                            json_codec.loads(
                                 self.fs.readtext(self.metadata_path_for_key(key))
                             )
                         )
                     except:
-                        traceback.print_exc()
-                        print(f"Removing {key} due to corrupted metadata (c)")
+                        logger.exception("Removing %s due to corrupted metadata (c)", key)
                         self.remove(key)
                         raise KeyNotFoundStoreException(key=key, store=self)
 
@@ -1360,13 +1849,12 @@ class FileSystemStore(Store):
                 if self.fs.exists(self.metadata_path_for_key(key)):
                     try:
                         metadata.update(
-                            json.loads(
+                            json_codec.loads(
                                 self.fs.readtext(self.metadata_path_for_key(key))
                             )
                         )
                     except:
-                        traceback.print_exc()
-                        print(f"Removing {key} due to corrupted metadata (d)")
+                        logger.exception("Removing %s due to corrupted metadata (d)", key)
                         self.remove(key)
                         raise KeyNotFoundStoreException(key=key, store=self)
                 else:
@@ -1374,7 +1862,7 @@ class FileSystemStore(Store):
             return self.finalize_metadata(metadata, key, is_dir=False)
 
     def store(self, key, data, metadata):
-        self.fs.makedirs(self.path_for_key(self.parent_key(key)))
+        self.fs.makedirs(self.path_for_key(self.parent_key(key)), recreate=True)
         self.fs.writebytes(self.path_for_key(key), data)
         assert self.fs.exists(self.path_for_key(key))
         self.store_metadata(
@@ -1388,9 +1876,9 @@ class FileSystemStore(Store):
         metadata = self.finalize_metadata(
             metadata, key=key, is_dir=self.is_dir(key), update=True
         )
-        self.fs.makedirs(parent)
+        self.fs.makedirs(parent, recreate=True)
         with self.fs.open(self.metadata_path_for_key(key), "w") as f:
-            json.dump(metadata, f)
+            f.write(json_codec.dumps(metadata))
         self.on_metadata_changed(key)
 
     def remove(self, key):
@@ -1460,7 +1948,7 @@ class FileSystemStore(Store):
         if self.is_dir(key):
             listdir = [d.replace('\\','/') for d in self.fs.listdir(self.path_for_key(key)) if d is not None]
             if any("/" in d for d in listdir):
-                print(f"WARNING - listdir on {repr(self)} not working properly")
+                logger.warning("listdir on %r not working properly", self)
 
             return [
                 key_name(d)
@@ -1547,13 +2035,12 @@ class FSSpecStore(Store):
                 if self.fs.exists(self.metadata_path_for_key(key)):
                     try:
                         metadata.update(
-                            json.loads(
+                            json_codec.loads(
                                 self.fs.read_text(self.metadata_path_for_key(key))
                             )
                         )
                     except:
-                        traceback.print_exc()
-                        print(f"Removing {key} due to corrupted metadata (c)")
+                        logger.exception("Removing %s due to corrupted metadata (c)", key)
                         self.remove(key)
                         raise KeyNotFoundStoreException(key=key, store=self)
 
@@ -1561,21 +2048,79 @@ class FSSpecStore(Store):
                 if self.fs.exists(self.metadata_path_for_key(key)):
                     try:
                         metadata.update(
-                            json.loads(
+                            json_codec.loads(
                                 self.fs.read_text(self.metadata_path_for_key(key))
                             )
                         )
                     except:
-                        traceback.print_exc()
-                        print(f"Removing {key} due to corrupted metadata (d)")
+                        logger.exception("Removing %s due to corrupted metadata (d)", key)
                         self.remove(key)
                         raise KeyNotFoundStoreException(key=key, store=self)
                 else:
                     raise KeyNotFoundStoreException(key=key, store=self)
             return self.finalize_metadata(metadata, key, is_dir=False)
 
+    def get_many(self, keys):
+        """Get data for multiple keys with a single fsspec cat call.
+        For remote filesystems (e.g. s3fs, http) fsspec fetches the files concurrently.
+        """
+        paths = {self.path_for_key(key): key for key in keys}
+        if len(paths) == 0:
+            return {}
+        data = self.fs.cat(list(paths), on_error="omit")
+        paths = self._with_stripped_paths(paths)
+        return {
+            paths[path]: b
+            for path, b in data.items()
+            if path in paths and not isinstance(b, Exception)
+        }
+
+    def _with_stripped_paths(self, paths):
+        """fsspec returns results of multi-path operations keyed by paths without protocol,
+        so the path -> key dictionary is extended with stripped paths.
+        """
+        result = dict(paths)
+        for path, key in paths.items():
+            result[self.fs._strip_protocol(path)] = key
+        return result
+
+    def get_metadata_many(self, keys):
+        """Get metadata for multiple keys.
+        Metadata files are fetched with a single fsspec cat call,
+        keys without a metadata file (directories, external files) fall back to get_metadata.
+        """
+        keys = list(keys)
+        paths = {}
+        for key in keys:
+            if key not in ("", None):
+                paths[self.metadata_path_for_key(key)] = key
+        metadata_bytes = {}
+        if len(paths):
+            metadata_bytes = self.fs.cat(list(paths), on_error="omit")
+            paths = self._with_stripped_paths(paths)
+        result = {}
+        for path, b in metadata_bytes.items():
+            if path not in paths or isinstance(b, Exception):
+                continue
+            key = paths[path]
+            try:
+                metadata = json_codec.loads(b)
+            except:
+                continue
+            is_dir = metadata.get("fileinfo", {}).get("is_dir", False)
+            result[key] = self.finalize_metadata(
+                dict(self.default_metadata(key, is_dir), **metadata), key, is_dir=is_dir
+            )
+        for key in keys:
+            if key not in result:
+                try:
+                    result[key] = self.get_metadata(key)
+                except StoreException:
+                    pass
+        return result
+
     def store(self, key, data, metadata):
-        self.fs.makedirs(self.path_for_key(self.parent_key(key)))
+        self.fs.makedirs(self.path_for_key(self.parent_key(key)), exist_ok=True)
         self.fs.write_bytes(self.path_for_key(key), data)
         assert self.fs.exists(self.path_for_key(key))
         self.store_metadata(
@@ -1589,9 +2134,9 @@ class FSSpecStore(Store):
         metadata = self.finalize_metadata(
             metadata, key=key, is_dir=self.is_dir(key), update=True
         )
-        self.fs.makedirs(parent)
+        self.fs.makedirs(parent, exist_ok=True)
         with self.fs.open(self.metadata_path_for_key(key), "w") as f:
-            json.dump(metadata, f)
+            f.write(json_codec.dumps(metadata))
         self.on_metadata_changed(key)
 
     def remove(self, key):
@@ -1669,13 +2214,11 @@ class FSSpecStore(Store):
             listdir = self.fs.listdir(self.path_for_key(key), detail=False)
             names=set()
             for d in listdir:
-                print("  - ",d)
                 if d.startswith("/"):
                     d = d[len(key)+1:]
                 if d.startswith("/"):
                     d = d[1:]
                 if key_name(d) != self.METADATA and f"/{self.METADATA}/" not in d and len(d) > 0:
-                    print("    name: ",d.split("/")[0])
                     names.add(d.split("/")[0])
             return sorted(list(names))
 
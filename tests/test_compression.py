@@ -0,0 +1,135 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Unit tests for LiQuer compression of cache and store payloads.
+"""
+import pytest
+from io import BytesIO
+from liquer.compression import *
+from liquer.cache import FileCache, SQLCache, StoreCache
+from liquer.store import MemoryStore, FileStore
+from liquer.state import State
+import tempfile
+
+TEXT = ("Hello, compressed world! " * 1000).encode("utf-8")
+
+
+class TestCodecs:
+    @pytest.mark.parametrize("name", ["gzip", "bz2", "lzma", "zstd", "lz4"])
+    def test_roundtrip(self, name):
+        codec = get_codec(name) if name in available_codecs() else None
+        if codec is None:
+            pytest.skip(f"{name} not available")
+        b = codec.compress(TEXT)
+        assert len(b) < len(TEXT)
+        assert codec.decompress(b) == TEXT
+
+        compressed = BytesIO()
+        codec.compress_stream(BytesIO(TEXT), compressed)
+        compressed.seek(0)
+        decompressed = BytesIO()
+        codec.decompress_stream(compressed, decompressed)
+        assert decompressed.getvalue() == TEXT
+
+    def test_unknown(self):
+        with pytest.raises(CompressionException):
+            get_codec("nonexistent")
+
+    def test_policy(self):
+        policy = CompressionPolicy(
+            codec="gzip", min_size=100, type_codecs=dict(dataframe=None, text="bz2")
+        )
+        assert policy.select(1000) == "gzip"
+        assert policy.select(10) is None
+        assert policy.select(1000, type_identifier="dataframe") is None
+        assert policy.select(1000, type_identifier="text") == "bz2"
+        assert policy.select(1000, extension="png") is None
+        assert compression_policy("gzip").codec == "gzip"
+        assert compression_policy(dict(codec="bz2", min_size=10)).min_size == 10
+        assert compression_policy(None) is None
+        assert CompressionPolicy().select(10000) in available_codecs()
+
+    def test_compress(self):
+        policy = CompressionPolicy(codec="gzip")
+        b, metadata = compress(TEXT, dict(a=1), policy)
+        assert metadata["compression"] == "gzip"
+        assert len(b) < len(TEXT)
+        assert decompress(b, metadata) == TEXT
+        b, metadata = compress(b"short", dict(a=1), policy)
+        assert metadata["compression"] is None
+        assert decompress(b, metadata) == b"short"
+        b, metadata = compress(TEXT, dict(a=1), None)
+        assert metadata == dict(a=1)
+
+
+class TestCompressedCache:
+    def check_cache(self, cache):
+        state = State().with_data("x" * 10000)
+        state.query = "abc"
+        assert cache.store(state)
+        assert cache.get_metadata("abc")["compression"] == "gzip"
+        assert "compression" not in state.metadata
+
+        state = cache.get("abc")
+        assert state.get() == "x" * 10000
+        assert "compression" not in state.metadata
+
+    def test_file_cache(self):
+        with tempfile.TemporaryDirectory() as cachepath:
+            cache = FileCache(cachepath, compression="gzip")
+            self.check_cache(cache)
+            state = cache.get("abc")
+            cache.store_metadata(state.metadata)
+            assert cache.get_metadata("abc")["compression"] == "gzip"
+            assert cache.get("abc").get() == "x" * 10000
+
+    def test_store_cache(self):
+        cache = StoreCache(MemoryStore(), path="cache", compression="gzip")
+        self.check_cache(cache)
+        state = cache.get("abc")
+        cache.store_metadata(state.metadata)
+        assert cache.get("abc").get() == "x" * 10000
+
+    def test_sql_cache(self):
+        import sqlite3
+
+        cache = SQLCache(
+            sqlite3.connect(":memory:"), delete_before_insert=True, compression="gzip"
+        )
+        self.check_cache(cache)
+
+
+class TestCompressingStore:
+    def test_store(self):
+        store = MemoryStore().with_compression("gzip")
+        store.store("a/b.txt", TEXT, {})
+        assert store.get_bytes("a/b.txt") == TEXT
+        assert "compression" not in store.get_metadata("a/b.txt")
+        assert store._store.get_metadata("a/b.txt")["compression"] == "gzip"
+        assert len(store._store.get_bytes("a/b.txt")) < len(TEXT)
+
+        store.store_metadata("a/b.txt", dict(x=1))
+        assert store.get_bytes("a/b.txt") == TEXT
+
+        store.store("a/c.png", TEXT, {})
+        assert store._store.get_bytes("a/c.png") == TEXT
+
+    def test_many(self):
+        store = MemoryStore().with_compression("gzip")
+        store.store_many([("a.txt", TEXT, {}), ("b.txt", b"short", {})])
+        assert store.get_many(["a.txt", "b.txt"]) == {"a.txt": TEXT, "b.txt": b"short"}
+        assert all(
+            "compression" not in m
+            for m in store.get_metadata_many(["a.txt", "b.txt"]).values()
+        )
+
+    def test_openbin(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = FileStore(tmpdir).with_compression("gzip")
+            with store.openbin("big.txt", "wb") as f:
+                for i in range(10):
+                    f.write(TEXT)
+            assert store._store.get_metadata("big.txt")["compression"] == "gzip"
+            assert store.get_bytes("big.txt") == TEXT * 10
+            with store.openbin("big.txt", "rb") as f:
+                assert f.read() == TEXT * 10
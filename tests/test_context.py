@@ -598,3 +598,77 @@ subdir:
         ix.init_indexer_registry()
 
         assert get_context().evaluate("hello-world").metadata.get("tools") is not None
+
+    def test_metadata_json_serializable(self):
+        import json
+
+        reset_command_registry()
+
+        @first_command
+        def hello():
+            return [1, 2, 3]
+
+        @command
+        def append_item(data):
+            data.append(4)
+            return data
+
+        state = evaluate("hello")
+        d = json.loads(json.dumps(state.metadata))
+        assert d["data_characteristics"]["type_identifier"] == state.type_identifier
+        description = state.metadata["data_characteristics"]["description"]
+        state.get().append(5)
+        assert state.metadata["data_characteristics"]["description"] == description
+        json.dumps(evaluate("hello/append_item").metadata)
+
+    def test_copy_free_transitions(self):
+        reset_command_registry()
+
+        @command(pure=True)
+        def pure_append(x, y):
+            return x + [y]
+
+        @command
+        def mutating_append(x, y):
+            x.append(y)
+            return x
+
+        @first_command
+        def append_base():
+            return [1, "2"]
+
+        data = [1]
+        context = get_context()
+        result = context.evaluate_action(
+            State().with_data(data), ActionRequest.from_arguments("mutating_append", "2")
+        )
+        assert result.get() == [1, "2"]
+        assert data == [1]
+        assert result.exclusive
+
+        result2 = context.evaluate_action(
+            result, ActionRequest.from_arguments("mutating_append", "3")
+        )
+        assert result2.get() == [1, "2", "3"]
+        assert result.get() == [1, "2"]
+        assert result2.exclusive
+
+        result2 = context.evaluate_action(
+            result, ActionRequest.from_arguments("mutating_append", "3"), exclusive=True
+        )
+        assert result2.get() is result.get()
+
+        state = evaluate("append_base/mutating_append-3")
+        assert state.get() == [1, "2", "3"]
+        state2 = context.evaluate_action(
+            state, ActionRequest.from_arguments("mutating_append", "4")
+        )
+        assert state.get() == [1, "2", "3"]
+        assert state2.get() == [1, "2", "3", "4"]
+
+        result = context.evaluate_action(
+            State().with_data(data), ActionRequest.from_arguments("pure_append", "2")
+        )
+        assert result.get() == [1, "2"]
+        assert data == [1]
+        assert result.exclusive
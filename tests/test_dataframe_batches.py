@@ -0,0 +1,134 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Unit tests for LiQuer dataframe batches.
+"""
+import pandas as pd
+import pytest
+import json
+import liquer.ext.lq_pandas  # register the dataframe state type
+from liquer.ext.dataframe_batches import *
+
+
+def batches(count=10, size=7):
+    for i in range(count):
+        yield pd.DataFrame(dict(a=range(i * size, (i + 1) * size), b=[str(i)] * size))
+
+
+class TestBatches:
+    def test_buffer(self):
+        buffer = BatchBuffer()
+        assert len(buffer.concat()) == 0
+        for df in batches(3, 5):
+            buffer.append(df)
+        assert len(buffer) == 15
+        result = buffer.split(4)
+        assert [len(df) for df in result] == [4, 4, 4]
+        assert list(result[1].a) == [4, 5, 6, 7]
+        assert len(buffer) == 3
+        assert list(buffer.concat().a) == [12, 13, 14]
+        assert list(buffer.concat().index) == [0, 1, 2]
+
+    def test_concat_batches(self):
+        df = concat_batches(batches())
+        assert list(df.a) == list(range(70))
+        assert list(df.index) == list(range(70))
+        assert len(concat_batches(batches(), max_batches=3)) == 21
+        single = pd.DataFrame(dict(a=[1, 2]), index=[5, 6])
+        assert list(concat_batches(single).index) == [0, 1]
+
+    def test_repackage_batches(self):
+        result = list(repackage_batches(batches(), batch_size=10))
+        assert [len(df) for df in result] == [10] * 7
+        assert list(pd.concat(result).a) == list(range(70))
+        result = list(repackage_batches(batches(), batch_size=16))
+        assert [len(df) for df in result] == [16, 16, 16, 16, 6]
+        assert list(pd.concat(result).a) == list(range(70))
+        result = list(repackage_batches(batches(), batch_size=16, max_batches=2))
+        assert [len(df) for df in result] == [16, 16]
+
+
+class TestStoredBatches:
+    def test_store_batches(self):
+        from liquer.store import set_store, MemoryStore
+
+        store = MemoryStore()
+        set_store(store)
+        try:
+            sdfi = store_batches(batches(25), "batches")
+            assert len(sdfi) == 25
+            assert sdfi.item_keys[:2] == ["batches/0001.parquet", "batches/0002.parquet"]
+            assert list(concat_batches(sdfi).a) == list(range(175))
+            manifest = store.get_bytes("batches/dataframe_iterator.json")
+            assert len(json.loads(manifest)["item_keys"]) == 25
+
+            sdfi = store_batches(batches(25), "batches", max_batches=3)
+            assert len(sdfi) == 3
+            assert not store.contains("batches/0004.parquet")
+
+            result = list(store_batches_pass_through(batches(4), "batches2"))
+            assert len(result) == 4
+            assert list(concat_batches(iter(sdfi)).a) == list(range(21))
+        finally:
+            set_store(None)
+
+    def test_resume(self):
+        from liquer.store import set_store, MemoryStore
+
+        def failing_batches():
+            yield from batches(12)
+            raise Exception("Failed")
+
+        store = MemoryStore()
+        set_store(store)
+        try:
+            with pytest.raises(Exception):
+                store_batches(failing_batches(), "batches")
+            manifest = json.loads(store.get_bytes("batches/dataframe_iterator.json"))
+            assert len(manifest["item_keys"]) == 12
+
+            stored = []
+            original = StoredDataframeIterator.encode
+
+            def encode(self, df):
+                stored.append(df)
+                return original(self, df)
+
+            StoredDataframeIterator.encode = encode
+            try:
+                sdfi = store_batches(batches(20), "batches", resume=True)
+            finally:
+                StoredDataframeIterator.encode = original
+            assert len(stored) == 20 - len(manifest["item_keys"])
+            assert len(sdfi) == 20
+            assert list(concat_batches(sdfi).a) == list(range(140))
+        finally:
+            set_store(None)
+
+    def test_writer_reused_dataframe(self):
+        from liquer.store import MemoryStore
+
+        sdfi = StoredDataframeIterator("batches", store=MemoryStore())
+        writer = BatchWriter(sdfi, max_workers=2)
+        df = pd.DataFrame(dict(a=range(7)))
+        for i in range(5):
+            writer.write(df)
+            df["a"] += 7
+        writer.close()
+        assert list(concat_batches(sdfi).a) == list(range(35))
+
+    def test_prefetch(self):
+        from liquer.store import MemoryStore
+
+        sdfi = StoredDataframeIterator("batches", store=MemoryStore(), prefetch=3)
+        for df in batches(5):
+            sdfi.append(df)
+        iterator = iter(sdfi)
+        assert list(next(iterator).a) == list(range(7))
+        assert len(iterator._prefetched) == 3
+        rest = [next(iterator) for i in range(4)]
+        assert list(pd.concat(rest).a) == list(range(7, 35))
+        with pytest.raises(StopIteration):
+            next(iterator)
+        sdfi.prefetch = 0
+        assert len(list(sdfi)) == 5
@@ -148,3 +148,20 @@ RECIPES:
         assert store.get_metadata("hello.parquet")["has_recipe"] == True
         assert store.get_metadata("hello.parquet")["recipes_directory"] == ""
         assert store.get_metadata("hello.parquet")["recipe_name"] == "recipes.yaml/-Ryaml/RECIPES/0#hello.parquet"
+
+    def test_serialization(self):
+        import pyarrow
+        from liquer.ext.lq_datafusion import DATAFUSION_DATAFRAME_STATE_TYPE
+
+        df = daf.SessionContext().from_arrow(pyarrow.table({"a": [1, 3], "b": [2, 4]}))
+        for extension in ["feather", "parquet", "csv"]:
+            b, mimetype = DATAFUSION_DATAFRAME_STATE_TYPE.as_bytes(df, extension)
+            result = DATAFUSION_DATAFRAME_STATE_TYPE.from_bytes(b, extension)
+            assert result.to_arrow_table().to_pydict() == {"a": [1, 3], "b": [2, 4]}
+        b, mimetype = DATAFUSION_DATAFRAME_STATE_TYPE.as_bytes(df)
+        assert b[:6] == b"ARROW1"
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "data.feather"
+            path.write_bytes(b)
+            result = DATAFUSION_DATAFRAME_STATE_TYPE.from_file(path)
+            assert result.to_arrow_table().to_pydict() == {"a": [1, 3], "b": [2, 4]}
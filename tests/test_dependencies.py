@@ -24,3 +24,119 @@ class TestDependencies:
         m = Dependencies()
         m.add_command_dependency(ns, command_metadata)
         assert "ns-root/test_callable" in m.as_dict()["commands"]
+
+    def test_resource(self):
+        from liquer.dependencies import resource_fingerprint
+
+        m = Dependencies()
+        m.add_resource_dependency("a.txt", dict(fileinfo=dict(md5="abc")))
+        assert m.as_dict()["resources"]["a.txt"] == "md5:abc"
+        assert resource_fingerprint(None) is None
+
+    def test_merge(self):
+        a = Dependencies()
+        a.add_resource_dependency("a.txt", dict(fileinfo=dict(md5="abc")))
+        b = Dependencies(dict(commands={"ns-root/x": "1"}))
+        b.add_resource_dependency("a.txt", dict(fileinfo=dict(md5="xyz")))
+        a.merge(b.as_dict())
+        assert a.as_dict()["commands"]["ns-root/x"] == "1"
+        assert a.as_dict()["resources"]["a.txt"] == "md5:abc"
+
+    def test_query_dependencies(self):
+        from liquer.store import MemoryStore, set_store
+        from liquer.cache import set_cache
+
+        reset_command_registry()
+        set_cache(None)
+
+        @first_command
+        def hello():
+            return "Hello"
+
+        @command
+        def join(x, y):
+            return f"{x} {y}"
+
+        store = MemoryStore()
+        store.store("a.txt", b"world", {})
+        set_store(store)
+        d = evaluate("hello/join-~X~/-R/a.txt~E").metadata["dependencies"]
+        assert "ns-root/hello" in d["commands"]
+        assert "ns-root/join" in d["commands"]
+        assert d["resources"]["a.txt"].startswith("md5:")
+        set_store(None)
+        reset_command_registry()
+
+    def test_outdated(self):
+        from liquer.dependencies import outdated_dependencies
+        from liquer.store import MemoryStore, set_store
+        from liquer.cache import set_cache
+
+        reset_command_registry()
+        set_cache(None)
+
+        @command
+        def upper(x):
+            return x.decode().upper()
+
+        store = MemoryStore()
+        store.store("a.txt", b"abc", {})
+        set_store(store)
+        metadata = evaluate("-R/a.txt/-/upper").metadata
+        assert outdated_dependencies(metadata, store=store) == []
+
+        store.store("a.txt", b"xyz", {})
+        assert len(outdated_dependencies(metadata, store=store)) == 1
+
+        @command(modify_command=True)
+        def upper(x):
+            return x.decode().upper() + "!"
+
+        assert len(outdated_dependencies(metadata, store=store)) == 2
+        set_store(None)
+        reset_command_registry()
+
+    def test_outdated_recipe(self):
+        import liquer.store as st
+        from liquer.store import set_store
+        import liquer.recipes as r
+        from liquer.cache import set_cache
+        from liquer.constants import Status
+        from liquer.ext.meta import make_recipes
+
+        reset_command_registry()
+        set_cache(None)
+
+        @command
+        def upper(x):
+            return x.decode().upper()
+
+        store = r.RecipeSpecStore(st.MemoryStore())
+        store.store("input.txt", b"abc", {})
+        store.store(
+            "results/recipes.yaml",
+            b"""
+        RECIPES:
+            - -R/input.txt/-/upper/upper.txt
+        """,
+            {},
+        )
+        set_store(store)
+        assert store.get_bytes("results/upper.txt") == b"ABC"
+        assert store.get_metadata("results/upper.txt")["status"] == Status.READY.value
+        result = make_recipes(store.get_metadata("results"))
+        assert result["processed"] == []
+
+        store.store("input.txt", b"xyz", {})
+        # Dependencies are not checked when reading the metadata
+        assert store.get_metadata("results/upper.txt")["status"] == Status.READY.value
+        store.sync()
+        metadata = store.get_metadata("results/upper.txt")
+        assert metadata["status"] == Status.EXPIRED.value
+        assert len(metadata["outdated"]) == 1
+        result = make_recipes(store.get_metadata("results"))
+        assert result["processed"] == ["results/upper.txt"]
+        assert store.get_bytes("results/upper.txt") == b"XYZ"
+        assert store.get_metadata("results/upper.txt")["status"] == Status.READY.value
+        set_store(None)
+        reset_command_registry()
@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Unit tests for LiQuer distributed workers.
+"""
+import multiprocessing as mp
+import os
+import pytest
+from liquer import first_command
+from liquer.cache import MemoryCache
+from liquer.store import MemoryStore
+from liquer.commands import reset_command_registry
+from liquer.distributed import Coordinator, JobQueue, Worker, run_worker
+from liquer.pool import JobStatus
+
+
+class TestJobQueue:
+    def test_queue(self):
+        queue = JobQueue()
+        a = queue.submit("a")
+        assert queue.submit("a")["job_id"] == a["job_id"]
+        b = queue.submit("b", priority=1)
+        job = queue.next_job("w1", timeout=0)
+        assert job["job_id"] == b["job_id"]
+        assert job["worker"] == "w1"
+        assert queue.job_done(job["job_id"], "w2") is False
+        assert queue.job_done(job["job_id"], "w1") is True
+        assert queue.get_job(b["job_id"])["status"] == "done"
+        assert queue.cancel(a["job_id"]) is True
+        assert queue.next_job("w1", timeout=0) is None
+
+    def test_finished_jobs_pruned(self):
+        queue = JobQueue(max_finished=2)
+        jobs = [queue.submit(f"q{i}") for i in range(4)]
+        for job in jobs[:3]:
+            assert queue.cancel(job["job_id"]) is True
+        assert queue.get_job(jobs[0]["job_id"]) is None
+        assert queue.get_job(jobs[2]["job_id"])["status"] == "cancelled"
+        job = queue.next_job("w1", timeout=0)
+        assert job["job_id"] == jobs[3]["job_id"]
+        assert queue.status()["running"] == 1
+        assert queue.job_done(job["job_id"], "w1") is True
+        assert queue.status()["running"] == 0
+        assert queue.get_job(jobs[1]["job_id"]) is None
+        assert len(queue.jobs) == 2
+
+    def test_lease_timeout(self):
+        queue = JobQueue(lease_timeout=0)
+        a = queue.submit("a")
+        assert queue.next_job("w1", timeout=0)["worker"] == "w1"
+        assert queue.next_job("w2", timeout=0)["worker"] == "w2"
+        assert queue.job_failed(a["job_id"], "w2", "failed") is True
+        assert queue.get_job(a["job_id"])["status"] == "error"
+
+
+    def test_failed_job(self):
+        reset_command_registry()
+
+        @first_command
+        def distributed_fail():
+            raise Exception("Intentional failure")
+
+        worker = Worker(("127.0.0.1", 0), authkey=b"test", worker_id="w1")
+        worker.queue = JobQueue()
+        a = worker.queue.submit("distributed_fail")
+        assert worker.run_job(worker.queue.next_job("w1", timeout=0)) is False
+        job = worker.queue.get_job(a["job_id"])
+        assert job["status"] == JobStatus.ERROR.value
+        assert "Intentional failure" in job["message"]
+        assert worker.jobs_done == 0
+
+        worker.queue.submit("distributed_fail/x")
+        worker.queue.submit("distributed_fail/y")
+        # Failed jobs count towards max_jobs
+        assert worker.run(max_jobs=2, poll_timeout=0) == 0
+        assert worker.jobs_processed == 2
+        assert worker.queue.queue_length() == 1
+
+
+class TestCoordinator:
+    def test_authkey_required(self, monkeypatch):
+        monkeypatch.delenv("LIQUER_AUTHKEY", raising=False)
+        with pytest.raises(Exception):
+            Coordinator()
+        monkeypatch.setenv("LIQUER_AUTHKEY", "test")
+        coordinator = Coordinator()
+        assert coordinator.authkey == b"test"
+        assert coordinator.address == ("127.0.0.1", 5050)
+
+    def test_workers(self):
+        @first_command(modify_command=True)
+        def distributed_test(x=0):
+            return f"{x}:{os.getpid()}"
+
+        cache = MemoryCache()
+        coordinator = Coordinator(
+            address=("127.0.0.1", 0), authkey=b"test", store=MemoryStore(), cache=cache
+        )
+        address = coordinator.start()
+        ctx = mp.get_context("fork")
+        workers = [
+            ctx.Process(
+                target=run_worker,
+                args=(address,),
+                kwargs=dict(authkey=b"test", idle_timeout=2, worker_id=f"w{i}"),
+            )
+            for i in range(2)
+        ]
+        try:
+            for w in workers:
+                w.start()
+            jobs = [coordinator.submit(f"distributed_test-{i}") for i in range(6)]
+            for job in jobs:
+                job = coordinator.wait(job["job_id"], timeout=30)
+                assert job["status"] == JobStatus.DONE.value
+                assert job["worker"] in ("w0", "w1")
+            for i in range(6):
+                assert cache.get(f"distributed_test-{i}").get().startswith(f"{i}:")
+        finally:
+            for w in workers:
+                w.join(timeout=10)
+                if w.is_alive():
+                    w.terminate()
+            coordinator.stop()
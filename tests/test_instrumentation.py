@@ -0,0 +1,85 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Unit tests for LiQuer evaluation instrumentation.
+"""
+import pytest
+from liquer.instrumentation import *
+from liquer.commands import command, first_command, reset_command_registry
+from liquer.cache import MemoryCache, set_cache
+from liquer import evaluate
+
+
+class TestInstrumentation:
+    def test_timings(self):
+        reset_command_registry()
+        set_cache(MemoryCache())
+
+        @first_command
+        def instrumented_hello():
+            return "Hello"
+
+        @command
+        def instrumented_greet(x, who):
+            return f"{x}, {who}"
+
+        recorded = []
+
+        def hook(phase, duration, query):
+            recorded.append((phase, query))
+
+        add_timing_hook(hook)
+        try:
+            state = evaluate("instrumented_hello/instrumented_greet-world")
+        finally:
+            remove_timing_hook(hook)
+            set_cache(None)
+        assert state.get() == "Hello, world"
+        timings = state.metadata["timings"]
+        for phase in [PARSE, CACHE_GET, PREDECESSOR, ARGUMENTS, COMMAND, CACHE_STORE]:
+            assert timings[phase] >= 0
+        assert (COMMAND, "instrumented_hello/instrumented_greet-world") in recorded
+        parsed = [query for phase, query in recorded if phase == PARSE]
+        assert parsed == ["instrumented_hello/instrumented_greet-world", "instrumented_hello"]
+
+    def test_failing_hook(self, caplog):
+        def hook(phase, duration, query):
+            raise Exception("Hook failed")
+
+        add_timing_hook(hook)
+        try:
+            timings = {}
+            record_timing(timings, COMMAND, 0.5, "q")
+        finally:
+            remove_timing_hook(hook)
+        assert timings[COMMAND] == 0.5
+        assert "Hook failed" in caplog.text
+
+    def test_metrics(self):
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics(COMMAND, 0.05)
+        metrics(COMMAND, 0.5)
+        assert metrics.as_dict()[COMMAND] == dict(count=2, sum=0.55)
+        text = metrics.to_openmetrics()
+        assert 'liquer_evaluation_phase_seconds_bucket{phase="command",le="0.1"} 1' in text
+        assert 'liquer_evaluation_phase_seconds_bucket{phase="command",le="1.0"} 2' in text
+        assert 'liquer_evaluation_phase_seconds_count{phase="command"} 2' in text
+        assert text.endswith("# EOF\n")
+
+    def test_metrics_endpoint(self):
+        flask = pytest.importorskip("flask")
+        import liquer.server.blueprint as bp
+
+        app = flask.Flask(__name__)
+        app.register_blueprint(bp.app, url_prefix="/liquer")
+        client = app.test_client()
+        disable_metrics()
+        assert client.get("/liquer/api/metrics").status_code == 404
+        metrics = enable_metrics()
+        try:
+            metrics(PARSE, 0.001)
+            response = client.get("/liquer/api/metrics")
+            assert response.status_code == 200
+            assert b'phase="parse"' in response.data
+        finally:
+            disable_metrics()
@@ -0,0 +1,39 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Unit tests for LiQuer JSON codec.
+"""
+import pytest
+import json
+import numpy as np
+import liquer.json_codec as json_codec
+from liquer.json_codec import set_json_codec, get_json_codec
+
+
+class TestJsonCodec:
+    @pytest.mark.parametrize("name", ["json", "orjson", "msgspec"])
+    def test_roundtrip(self, name):
+        default = get_json_codec().name
+        try:
+            try:
+                set_json_codec(name)
+            except Exception:
+                pytest.skip(f"{name} not available")
+            data = dict(a=1, b=[1.5, "x", None, True], c={"d": {}}, e=2**70)
+            assert json_codec.loads(json_codec.dumps(data)) == data
+            assert json_codec.loads(json_codec.dumpb(data)) == data
+            assert json.loads(json_codec.dumps(data, sort_keys=True)) == data
+            assert json.loads(json_codec.dumps(data, indent=4)) == data
+            assert json_codec.loads(json_codec.dumps({1: "x"})) == {"1": "x"}
+            assert json_codec.loads('{"a": NaN}')["a"] != 0
+            with pytest.raises(TypeError):
+                json_codec.dumps(dict(a=object()))
+            with pytest.raises(ValueError):
+                json_codec.loads("{")
+        finally:
+            set_json_codec(default)
+
+    def test_default(self):
+        assert get_json_codec().is_available()
+        with pytest.raises(Exception):
+            set_json_codec("nonexistent")
@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Unit tests for LiQuer logging support.
+"""
+import logging
+import pytest
+from liquer.logs import *
+from liquer.context import Context
+
+
+class Formatted:
+    """Counts how many times it was formatted"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return "formatted"
+
+    __repr__ = __str__
+
+
+class TestLogs:
+    def test_set_log_levels(self):
+        set_log_levels({"liquer.test_a": "debug", "liquer.test_b": logging.ERROR})
+        assert logging.getLogger("liquer.test_a").level == logging.DEBUG
+        assert logging.getLogger("liquer.test_b").level == logging.ERROR
+        set_log_levels({"liquer.test_a": logging.NOTSET, "liquer.test_b": logging.NOTSET})
+
+    def test_ring_buffer(self):
+        buffer = enable_debug_buffer(capacity=3, module="liquer.test_ring")
+        try:
+            assert get_debug_buffer() is buffer
+            logger = logging.getLogger("liquer.test_ring.sub")
+            x = Formatted()
+            for i in range(5):
+                logger.debug("Message %d %s", i, x)
+            assert len(buffer) == 3
+            assert x.count == 5
+            assert buffer.records()[0].args is None
+            assert buffer.records()[0].msg == "Message 2 formatted"
+            entries = buffer.entries()
+            assert [e["message"] for e in entries] == [
+                f"Message {i} formatted" for i in (2, 3, 4)
+            ]
+            assert entries[0]["level"] == "DEBUG"
+            assert entries[0]["logger"] == "liquer.test_ring.sub"
+        finally:
+            disable_debug_buffer()
+        assert get_debug_buffer() is None
+        assert logging.getLogger("liquer.test_ring").level == logging.NOTSET
+
+    def test_ring_buffer_mutable_args(self):
+        buffer = enable_debug_buffer(capacity=3, module="liquer.test_ring")
+        try:
+            data = [1]
+            logging.getLogger("liquer.test_ring").debug("Data %s", data)
+            data.append(2)
+            assert buffer.entries()[0]["message"] == "Data [1]"
+        finally:
+            disable_debug_buffer()
+
+    def test_context_debug(self):
+        x = Formatted()
+        context = Context()
+        context.debug("Debug %s", x)
+        assert x.count == 0
+        assert len(context.metadata()["log"]) == 0
+
+        context = Context(debug=True)
+        context.debug("Debug %s", x)
+        assert x.count == 1
+        assert context.metadata()["log"][-1]["message"] == "Debug formatted"
+
+    def test_context_debug_buffer(self):
+        buffer = enable_debug_buffer(capacity=10)
+        try:
+            Context().debug("Debug %s", 123)
+            assert buffer.entries()[-1]["message"] == "Debug 123"
+        finally:
+            disable_debug_buffer()
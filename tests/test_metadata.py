@@ -12,6 +12,37 @@ class TestMetadata:
     def test_create(self):
         m = Metadata()
         assert "status" in m.as_dict()
+    def test_validate(self):
+        from liquer.metadata import validate_metadata
+
+        m = Metadata(dict(query="a/b"))
+        assert m.validate() == []
+        assert Metadata.from_string(m.to_string()).as_dict() == m.as_dict()
+        assert "Missing field status" in validate_metadata(dict(query="a/b"))
+        d = m.as_dict()
+        d["is_error"] = "no"
+        assert validate_metadata(d) == ["Field is_error has a wrong type str"]
+
+    def test_snapshot(self):
+        from liquer.commands import command_metadata_from_callable
+        import liquer.json_codec as json_codec
+
+        def f(state):
+            return state
+
+        m = Metadata()
+        m.info("Hello")
+        snapshot = m.as_dict()
+        m.info("World")
+        m.add_command_dependency("root", command_metadata_from_callable(f))
+        assert [x["message"] for x in snapshot["log"]] == ["Hello"]
+        assert snapshot["dependencies"]["commands"] == {}
+        assert snapshot["log"][0] is m.log[0]
+
+        snapshot["log"].append(dict(kind="info", message="Snapshot"))
+        assert len(m.log) == 2
+        assert json_codec.loads(json_codec.dumps(m.as_dict())) == m.metadata
+
     def test_get_stored_metadata(self):
         from liquer.store import set_store, MemoryStore
         from liquer.cache import set_cache, MemoryCache, NoCache
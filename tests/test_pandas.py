@@ -11,7 +11,9 @@ from liquer.cache import set_cache, FileCache
 import os.path
 import inspect
 import tempfile
-from liquer.state import set_var
+from liquer.state import State, set_var
+from liquer.parser import ActionRequest
+from liquer.context import get_context
 from liquer.store import set_store, MemoryStore
 from liquer.constants import *
 import importlib
@@ -219,6 +221,140 @@ class TestPandas:
             f"http://localhost/q/df_from-{filename}/teq-a-3",
         ]
 
+    def test_fanout_split(self):
+        import liquer.ext.lq_pandas  # register pandas commands and state type
+        from liquer.cache import MemoryCache, NoCache
+
+        filename = encode_token(
+            os.path.dirname(inspect.getfile(self.__class__)) + "/test.csv"
+        )
+        cache = MemoryCache()
+        set_cache(cache)
+        try:
+            df = evaluate(f"df_from-{filename}/fanout_split_df-a").get()
+            assert list(df["query"]) == [
+                f"df_from-{filename}/eq-a-1",
+                f"df_from-{filename}/eq-a-3",
+            ]
+            for query in df["query"]:
+                assert cache.contains(query)
+            assert list(cache.get(f"df_from-{filename}/eq-a-3").get().b) == [4]
+        finally:
+            set_cache(None)
+
+    def test_fanout_tsplit(self):
+        import liquer.ext.lq_pandas  # register pandas commands and state type
+        from liquer.cache import MemoryCache
+
+        filename = encode_token(
+            os.path.dirname(inspect.getfile(self.__class__)) + "/test_hxl.csv"
+        )
+        cache = MemoryCache()
+        set_cache(cache)
+        try:
+            df = evaluate(f"df_from-{filename}/fanout_tsplit_df-a").get()
+            assert list(df["query"])[1:] == [
+                f"df_from-{filename}/teq-a-1",
+                f"df_from-{filename}/teq-a-3",
+            ]
+            result = cache.get(f"df_from-{filename}/teq-a-1").get()
+            expected = evaluate(f"df_from-{filename}/teq-a-1").get()
+            assert result.equals(expected)
+            assert len(result) == 2
+        finally:
+            set_cache(None)
+
+    def test_fanout(self):
+        import liquer.ext.lq_pandas as lq_pandas
+        from liquer.cache import MemoryCache
+
+        @first_command(modify_command=True)
+        def fanout_test_df():
+            return pd.DataFrame(
+                dict(g=[1, 2, 1, 3, 2, 1], h=["x", "y", "x", "x", "y", "y"], v=range(6))
+            )
+
+        cache = MemoryCache()
+        set_cache(cache)
+        try:
+            sdf, results = lq_pandas.fanout(
+                "fanout_test_df", "g", "h", downstream="df_columns", background=False
+            )
+            assert len(sdf) == 4
+            assert [r.get() for r in results] == [["g", "h", "v"]] * 4
+            for query in sdf["query"]:
+                fast = cache.get(query).get()
+                lq_pandas._filter_indices.clear()
+                slow = evaluate(query).get()
+                assert list(fast.v) == list(slow.v)
+            assert cache.contains("fanout_test_df/eq-g-1-h-x/df_columns")
+            assert lq_pandas.filter_index(pd.DataFrame(dict(a=[1.0, 2.0])), ["a"]) is None
+        finally:
+            set_cache(None)
+
+    def test_filter_index(self):
+        import liquer.ext.lq_pandas as lq_pandas
+        from liquer.cache import MemoryCache
+
+        @first_command(modify_command=True)
+        def filter_test_df():
+            return pd.DataFrame(
+                dict(g=[1, 2, 1, 3, 2, 1], h=["x", "y", "x", "x", "y", "y"], v=range(6))
+            )
+
+        df = pd.DataFrame(
+            dict(g=[1, 2, 1, 3, 2, 1], h=["x", "y", "x", "x", "y", "y"], v=range(6))
+        )
+        assert list(lq_pandas.eq_mask(df, ["g", "01", "h", "x"])) == [
+            True, False, True, False, False, False
+        ]
+        assert lq_pandas.filter_index(df, ["g"])[("1",)].tolist() == [0, 2, 5]
+
+        lq_pandas._filter_indices.clear()
+        context = get_context()
+
+        def eq_v(state, *args):
+            action = ActionRequest.from_arguments("eq", *args)
+            return list(context.evaluate_action(state, action).get().v)
+
+        try:
+            state = evaluate("filter_test_df")
+            assert eq_v(state, "g", "1", "h", "x") == [0, 2]
+            assert ("filter_test_df", "eq", ("g", "h")) not in lq_pandas._filter_indices
+            assert eq_v(state, "g", "2", "h", "y") == [1, 4]
+            assert ("filter_test_df", "eq", ("g", "h")) in lq_pandas._filter_indices
+            assert eq_v(state, "g", "3", "h", "x") == [3]
+            assert eq_v(state, "g", "01", "h", "y") == [5]
+            assert eq_v(state, "g", "4", "h", "y") == []
+
+            # Index is only used for the dataframe it was created for
+            other = State().with_data(
+                pd.DataFrame(dict(g=[2, 1, 1, 3, 2, 1], h=["x"] * 6, v=range(6)))
+            )
+            other.query = state.query
+            other.metadata["created"] = state.metadata["created"]
+            assert eq_v(other, "g", "1", "h", "x") == [1, 2, 5]
+
+            context.evaluate_action(state, ActionRequest.from_arguments("qsplit_df", "h"))
+            assert ("filter_test_df", "eq", ("h",)) in lq_pandas._filter_indices
+            assert eq_v(state, "h", "y") == [1, 4, 5]
+        finally:
+            lq_pandas._filter_indices.clear()
+
+    def test_eq_strings_not_parsed(self):
+        import liquer.ext.lq_pandas as lq_pandas
+
+        df = pd.DataFrame(
+            dict(
+                d=pd.to_datetime(["2020-01-01", "2020-01-02"]),
+                s=["2020-01-01", "x"],
+                c=pd.Categorical(["x", "y"]),
+            )
+        )
+        assert list(lq_pandas.eq_mask(df, ["d", "2020-01-01"])) == [False, False]
+        assert list(lq_pandas.eq_mask(df, ["s", "2020-01-01"])) == [True, False]
+        assert list(lq_pandas.eq_mask(df, ["c", "y"])) == [False, True]
+
     def test_columns_info(self):
         import liquer.ext.lq_pandas  # register pandas commands and state type
         from liquer.state_types import encode_state_data, decode_state_data
@@ -268,21 +404,27 @@ class TestPandas:
         assert list(df.a) == [1]
         assert list(df.b) == [2]
 
-    def test_save_parquet(self):
+    def test_save_parquet(self, tmpdir):
         import liquer.ext.lq_pandas  # register pandas commands and state type
 
         filename = encode_token(
             os.path.dirname(inspect.getfile(self.__class__)) + "/test.csv"
         )
-        evaluate_and_save(f"df_from-{filename}/head_df-1/test.parquet")
+        evaluate_and_save(
+            f"df_from-{filename}/head_df-1/test.parquet", target_directory=str(tmpdir)
+        )
+        assert os.path.exists(os.path.join(str(tmpdir), "test.parquet"))
 
-    def test_save_feather(self):
+    def test_save_feather(self, tmpdir):
         import liquer.ext.lq_pandas  # register pandas commands and state type
 
         filename = encode_token(
             os.path.dirname(inspect.getfile(self.__class__)) + "/test.csv"
         )
-        evaluate_and_save(f"df_from-{filename}/head_df-1/test.feather")
+        evaluate_and_save(
+            f"df_from-{filename}/head_df-1/test.feather", target_directory=str(tmpdir)
+        )
+        assert os.path.exists(os.path.join(str(tmpdir), "test.feather"))
 
     def test_dr(self):
         import pandas as pd
@@ -395,3 +537,104 @@ RECIPES:
 
         set_store(None)
         reset_command_registry()
+
+
+class TestArrowSerialization:
+    def test_default_roundtrip(self):
+        from liquer.ext.lq_pandas import DataframeStateType, ARROW_MAGIC
+
+        t = DataframeStateType()
+        assert t.default_extension() == "feather"
+        df = pd.DataFrame(dict(a=[1, 2, 3], b=["x", "y", "z"]), index=["p", "q", "r"])
+        b, mimetype = t.as_bytes(df)
+        assert b[:6] == ARROW_MAGIC
+        assert t.from_bytes(b).equals(df)
+
+    def test_compression(self):
+        from liquer.ext.lq_pandas import DataframeStateType
+
+        df = pd.DataFrame(dict(a=list(range(1000)) * 10))
+        for compression in ["lz4", "zstd"]:
+            t = DataframeStateType(compression=compression)
+            b, mimetype = t.as_bytes(df)
+            assert len(b) < len(DataframeStateType().as_bytes(df)[0])
+            assert t.from_bytes(b).equals(df)
+
+    def test_pickle_fallback(self):
+        from liquer.ext.lq_pandas import DataframeStateType
+
+        t = DataframeStateType()
+        df = pd.DataFrame(dict(a=[1, "x"]))
+        b, mimetype = t.as_bytes(df)
+        assert list(t.from_bytes(b).a) == [1, "x"]
+        legacy, mimetype = t.as_bytes(pd.DataFrame(dict(a=[1, 2])), "pickle")
+        assert list(t.from_bytes(legacy).a) == [1, 2]
+
+    def test_object_columns_roundtrip(self):
+        from liquer.ext.lq_pandas import DataframeStateType, ARROW_MAGIC
+
+        t = DataframeStateType()
+        for df in [
+            pd.DataFrame(dict(a=[{"x": 1}, {"y": 2}])),
+            pd.DataFrame(dict(a=[[1, 2], [3]])),
+            pd.DataFrame(dict(a=[(1, 2), (3,)])),
+            pd.DataFrame(dict(a=pd.Series([1.5, None], dtype=object))),
+        ]:
+            b, mimetype = t.as_bytes(df)
+            assert b[:6] != ARROW_MAGIC
+            result = t.from_bytes(b)
+            assert list(result.a) == list(df.a)
+            assert result.a.dtype == object
+        for index in [
+            pd.Index([(1, 2), (3, 4)], tupleize_cols=False),
+            pd.MultiIndex.from_tuples([("x", (1, 2)), ("y", (3,))]),
+        ]:
+            df = pd.DataFrame(dict(a=[1, 2]), index=index)
+            b, mimetype = t.as_bytes(df)
+            assert b[:6] != ARROW_MAGIC
+            assert list(t.from_bytes(b).index) == list(df.index)
+        df = pd.DataFrame(dict(a=pd.Series(["x", None], dtype=object), b=[1, 2]))
+        b, mimetype = t.as_bytes(df)
+        assert b[:6] == ARROW_MAGIC
+        assert list(t.from_bytes(b).b) == [1, 2]
+
+    def test_from_file(self):
+        from liquer.ext.lq_pandas import DataframeStateType
+
+        df = pd.DataFrame(dict(a=[1, 2, 3], b=[1.5, 2.5, 3.5]))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "data.feather")
+            with open(path, "wb") as f:
+                f.write(DataframeStateType().as_bytes(df)[0])
+            assert DataframeStateType().from_file(path).equals(df)
+            zero_copy_df = DataframeStateType(zero_copy=True).from_file(path)
+            assert zero_copy_df.equals(df)
+
+    def test_legacy_file_cache(self):
+        import liquer.ext.lq_pandas
+        from liquer.ext.lq_pandas import DATAFRAME_STATE_TYPE
+        from liquer.cache import migrate_cache
+        from liquer.state import State
+
+        df = pd.DataFrame(dict(a=[1, 2, 3]))
+        with tempfile.TemporaryDirectory() as cachepath:
+            cache = FileCache(cachepath)
+            state = State().with_data(df)
+            state.query = "abc"
+            assert cache.store(state)
+            new_path = cache.to_path("abc", prefix="data_", extension="feather")
+            legacy_path = cache.to_path("abc", prefix="data_", extension="pickle")
+            assert os.path.exists(new_path)
+
+            os.remove(new_path)
+            with open(legacy_path, "wb") as f:
+                f.write(DATAFRAME_STATE_TYPE.as_bytes(df, "pickle")[0])
+            assert cache.get("abc").get().equals(df)
+
+            assert migrate_cache(cache) == 1
+            assert os.path.exists(new_path)
+            assert not os.path.exists(legacy_path)
+            assert cache.get("abc").get().equals(df)
+
+            cache.remove("abc")
+            assert not os.path.exists(new_path)
@@ -0,0 +1,81 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Unit tests for LiQuer query plans.
+"""
+import pytest
+from liquer.plan import QueryPlanner, query_planner
+from liquer.commands import command, first_command, command_registry, reset_command_registry
+from liquer.parser import parse
+from liquer.state import State
+from liquer import evaluate
+
+
+class TestQueryPlanner:
+    def test_parse(self):
+        planner = QueryPlanner(maxsize=2)
+        q = planner.parse("a-1/b-2")
+        assert q.encode() == "a-1/b-2"
+        assert planner.parse("a-1/b-2") is q
+        planner.parse("c")
+        planner.parse("d")
+        assert planner.parse("a-1/b-2") is not q
+
+    def test_action_plan(self):
+        reset_command_registry()
+
+        @command
+        def plan_add(x, y: int, context=None):
+            return (x or 0) + y + (1000 if context == "ctx" else 0)
+
+        planner = QueryPlanner()
+        registry = command_registry()
+        action = parse("plan_add-12").segments[0].query[0]
+        plan = planner.action_plan(registry, State(), action)
+        assert plan.is_compiled()
+        assert plan.ns == "root"
+        assert plan.argv[0] == 12
+        assert planner.action_plan(registry, State(), action) is plan
+        assert plan.execute(State().with_data(1), context="ctx").get() == 1013
+
+        @command
+        def other(x):
+            return x
+
+        assert planner.action_plan(registry, State(), action) is not plan
+
+    def test_not_compiled(self):
+        reset_command_registry()
+
+        @command
+        def plan_int(x, y: int):
+            return y
+
+        planner = QueryPlanner()
+        action = parse("plan_int-abc").segments[0].query[0]
+        plan = planner.action_plan(command_registry(), State(), action)
+        assert not plan.is_compiled()
+        action = parse("plan_unknown-1").segments[0].query[0]
+        plan = planner.action_plan(command_registry(), State(), action)
+        assert plan.command is None
+        assert not plan.is_compiled()
+
+    def test_evaluate(self):
+        reset_command_registry()
+
+        @first_command
+        def plan_hello(name="world"):
+            return f"Hello, {name}"
+
+        @command
+        def plan_append(x, *items):
+            return x + "".join(items)
+
+        assert evaluate("plan_hello-abc/plan_append-1-2").get() == "Hello, abc12"
+        assert evaluate("plan_hello-abc/plan_append-1-2").get() == "Hello, abc12"
+
+        @command(modify_command=True)
+        def plan_append(x, *items):
+            return x + "+".join(items)
+
+        assert evaluate("plan_hello-abc/plan_append-1-2").get() == "Hello, abc1+2"
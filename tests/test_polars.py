@@ -81,3 +81,39 @@ class TestPolars:
             assert df["b"] == [2, 4]
             assert df["c"] == [3, 7]
 
+
+    def test_serialization(self):
+        from liquer.ext.lq_polars import (
+            POLARS_DATAFRAME_STATE_TYPE,
+            POLARS_LAZYFRAME_STATE_TYPE,
+        )
+
+        df = pl.DataFrame({"a": [1, 3], "b": ["x", "y"]})
+        for extension in ["feather", "parquet", "csv", "json", "ndjson"]:
+            b, mimetype = POLARS_DATAFRAME_STATE_TYPE.as_bytes(df, extension)
+            assert POLARS_DATAFRAME_STATE_TYPE.from_bytes(b, extension).equals(df)
+            b, mimetype = POLARS_LAZYFRAME_STATE_TYPE.as_bytes(df.lazy(), extension)
+            lf = POLARS_LAZYFRAME_STATE_TYPE.from_bytes(b, extension)
+            assert isinstance(lf, pl.LazyFrame)
+            assert lf.collect().equals(df)
+
+        b, mimetype = POLARS_DATAFRAME_STATE_TYPE.as_bytes(df)
+        assert b[:6] == b"ARROW1"
+        legacy, mimetype = POLARS_DATAFRAME_STATE_TYPE.as_bytes(df, "parquet")
+        assert POLARS_DATAFRAME_STATE_TYPE.from_bytes(legacy).equals(df)
+
+    def test_lazyframe_cache(self):
+        with TemporaryDirectory() as cachepath:
+            set_cache(FileCache(cachepath))
+
+            @first_command(modify_command=True)
+            def lazy_frame():
+                return pl.DataFrame({"a": [1, 3], "b": [2, 4]}).lazy()
+
+            state = evaluate("lazy_frame")
+            assert isinstance(state.get(), pl.LazyFrame)
+            assert state.metadata["data_characteristics"]["columns"] == ["a", "b"]
+            lf = evaluate("lazy_frame").get()
+            assert isinstance(lf, pl.LazyFrame)
+            assert lf.collect().to_dict(as_series=False) == {"a": [1, 3], "b": [2, 4]}
+            set_cache(None)
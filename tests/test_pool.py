@@ -0,0 +1,190 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Unit tests for LiQuer pool worker initialization.
+"""
+import os
+import pytest
+import liquer.pool as pool
+from liquer.cache import MemoryCache, get_cache, set_cache
+from liquer.store import MemoryStore, get_store, set_store
+
+constructed = []
+
+
+def counting_store():
+    store = MemoryStore()
+    constructed.append(store)
+    return store
+
+
+class TestPool:
+    def test_worker_initialized_once(self):
+        constructed.clear()
+        config = dict(store_constructor=counting_store, cache_constructor=MemoryCache)
+        try:
+            pool._ensure_worker(config, 1)
+            store = get_store()
+            cache = get_cache()
+            pool._ensure_worker(config, 1)
+            assert len(constructed) == 1
+            assert get_store() is store
+            assert get_cache() is cache
+
+            pool._ensure_worker(config, 2)
+            assert len(constructed) == 2
+            assert get_store() is not store
+        finally:
+            pool._worker_initialized_version = None
+            set_store(None)
+            set_cache(None)
+
+    def test_config_version(self):
+        old_config = pool._worker_config
+        try:
+            version = pool.get_worker_config_version()
+            pool.set_worker_modules(["liquer.ext.basic"])
+            assert pool.get_worker_config_version() == version + 1
+            assert pool._worker_config["modules"] == ["liquer.ext.basic"]
+        finally:
+            pool._worker_config = old_config
+
+
+class RecordingScheduler(pool.JobScheduler):
+    """Scheduler recording the started jobs instead of running them."""
+
+    def __init__(self, **kwarg):
+        super().__init__(**kwarg)
+        self.started_jobs = []
+
+    def _start(self, job):
+        self.started_jobs.append(job)
+
+
+class TestJobScheduler:
+    def test_priority(self):
+        scheduler = RecordingScheduler(max_running=1)
+        a = scheduler.submit("a")
+        scheduler.submit("b", priority=1)
+        scheduler.submit("c", priority=5)
+        assert a.status == pool.JobStatus.RUNNING
+        assert scheduler.queue_length() == 2
+        scheduler._done(a.job_id, "ok")
+        assert a.get(timeout=1) == "ok"
+        assert [job.query for job in scheduler.started_jobs] == ["a", "c"]
+
+    def test_dedup(self):
+        scheduler = RecordingScheduler(max_running=1)
+        a = scheduler.submit("a")
+        b = scheduler.submit("b")
+        assert scheduler.submit("a") is a
+        assert scheduler.submit("b") is b
+        c = scheduler.submit("c", priority=1)
+        scheduler.submit("b", priority=2)
+        assert scheduler.queue_length() == 2
+        scheduler._done(a.job_id, "ok")
+        assert scheduler.started_jobs[-1] is b
+        assert scheduler.submit("a") is not a
+
+    def test_queue_full(self):
+        scheduler = RecordingScheduler(max_running=1, max_queue_length=1)
+        scheduler.submit("a")
+        scheduler.submit("b")
+        with pytest.raises(pool.JobQueueFullException):
+            scheduler.submit("c")
+
+    def test_cancel(self):
+        scheduler = RecordingScheduler(max_running=1)
+        a = scheduler.submit("a")
+        b = scheduler.submit("b")
+        assert scheduler.cancel(a.job_id) is False
+        assert scheduler.cancel(b.job_id) is True
+        assert b.status == pool.JobStatus.CANCELLED
+        scheduler._done(a.job_id, "ok")
+        assert scheduler.started_jobs == [a]
+        assert scheduler.status()["queued"] == 0
+
+    def test_error(self):
+        scheduler = RecordingScheduler()
+        a = scheduler.submit("a")
+        scheduler._error(a.job_id, Exception("failed"))
+        assert a.to_dict()["status"] == "error"
+        with pytest.raises(Exception):
+            a.get(timeout=1)
+
+    def test_main_process(self):
+        from liquer import first_command
+
+        @first_command(modify_command=True)
+        def job_test():
+            return "Hello"
+
+        scheduler = pool.JobScheduler()
+        job = scheduler.submit("job_test")
+        assert job.status == pool.JobStatus.DONE
+
+    def test_main_process_error(self):
+        from liquer import first_command
+
+        @first_command(modify_command=True)
+        def job_fail_test():
+            raise Exception("Intentional failure")
+
+        scheduler = pool.JobScheduler()
+        job = scheduler.submit("job_fail_test")
+        assert job.status == pool.JobStatus.ERROR
+        assert "Intentional failure" in job.message
+
+    def test_submit_priority_validation(self):
+        flask = pytest.importorskip("flask")
+        import liquer.server.blueprint as bp
+
+        app = flask.Flask(__name__)
+        app.register_blueprint(bp.app, url_prefix="/liquer")
+        client = app.test_client()
+        response = client.get("/liquer/submit/job_test?priority=high")
+        assert response.status_code == 400
+        assert response.get_json()["status"] == "ERROR"
+
+
+class TestTransport:
+    def test_payload(self):
+        payload = pool.pack_payload(b"abc", threshold=50)
+        assert payload[0] == "inline"
+        assert pool.unpack_payload(payload) == b"abc"
+        payload = pool.pack_payload(b"x" * 100, threshold=50)
+        assert payload[0] == "file"
+        assert pool.unpack_payload(payload) == b"x" * 100
+        assert not os.path.exists(payload[1])
+
+    def test_central_store_and_cache(self):
+        from liquer.state import State
+
+        old_config = pool._worker_config
+        manager = pool.PoolManager()
+        manager.start()
+        try:
+            pool.set_central_store(MemoryStore(), manager=manager)
+            pool.set_central_cache(MemoryCache(), manager=manager)
+            store = get_store()
+            store.transport_threshold = 10
+            data = b"x" * 1000
+            store.store("a/b", data, {})
+            assert store.get_bytes("a/b") == data
+            assert store.get_many(["a/b", "c"]) == {"a/b": data}
+            assert store.get_metadata("a/b")["fileinfo"]["size"] == 1000
+            assert store.is_dir("a")
+
+            cache = get_cache()
+            cache.transport_threshold = 10
+            state = State().with_data("x" * 1000)
+            state.query = "q"
+            state.metadata["query"] = "q"
+            cache.store(state)
+            assert cache.contains("q")
+            assert cache.get("q").get() == "x" * 1000
+        finally:
+            manager.shutdown()
+            pool._worker_config = old_config
+            set_store(None)
+            set_cache(None)
@@ -0,0 +1,95 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Unit tests for LiQuer per-query profiling.
+"""
+import time
+import pytest
+from liquer import *
+from liquer.cache import MemoryCache, get_cache, set_cache, RefreshCache
+from liquer.commands import reset_command_registry
+from liquer.profiling import *
+from liquer.state import State, set_var
+
+
+def slow_function():
+    time.sleep(0.05)
+
+
+class TestSamplingProfiler:
+    def test_profiler(self):
+        with SamplingProfiler() as profiler:
+            slow_function()
+        assert not is_profiling()
+        assert profiler.duration >= 0.05
+        assert sum(profiler.samples.values()) > 0
+        assert "slow_function" in profiler.collapsed()
+        d = profiler.as_dict()
+        assert d["kind"] == "sampling"
+        assert d["samples"] > 0
+
+    def test_profile_parameter(self):
+        parameters = dict(a="1", _profile="1")
+        assert profile_parameter(parameters) is None
+        assert parameters == dict(a="1")
+        enable_profiling()
+        try:
+            parameters = dict(a="1", _profile="1", profile="1")
+            assert profile_parameter(parameters)
+            assert parameters == dict(a="1", profile="1")
+            assert profile_parameter(dict(_profile="false")) is False
+            assert profile_parameter(dict(a="1")) is None
+        finally:
+            enable_profiling(False)
+
+
+class TestQueryProfiling:
+    def test_evaluate(self):
+        reset_command_registry()
+
+        @first_command
+        def slow_hello():
+            time.sleep(0.05)
+            return "Hello"
+
+        set_cache(MemoryCache())
+        state = evaluate("slow_hello")
+        assert state.get() == "Hello"
+        assert "profile" not in state.metadata
+
+        state = evaluate("slow_hello", profile=True)
+        assert state.get() == "Hello"
+        profile = state.metadata["profile"]
+        assert profile["samples"] > 0
+        assert "slow_hello" in profile["collapsed"]
+        assert "slow_hello" in get_cache().get_metadata("slow_hello")["profile"]["collapsed"]
+        set_cache(None)
+        reset_command_registry()
+
+    def test_profile_var(self):
+        reset_command_registry()
+
+        @first_command
+        def slow_hello():
+            time.sleep(0.05)
+            return "Hello"
+
+        try:
+            set_var("profile", True)
+            state = evaluate("slow_hello")
+        finally:
+            set_var("profile", False)
+        assert "slow_hello" in state.metadata["profile"]["collapsed"]
+        reset_command_registry()
+
+    def test_refresh_cache(self):
+        cache = MemoryCache()
+        state = State().with_data(123)
+        state.query = "abc"
+        cache.store(state)
+        refresh = RefreshCache(cache)
+        assert refresh.get("abc") is None
+        assert not refresh.contains("abc")
+        state.query = "def"
+        refresh.store(state)
+        assert cache.contains("def")
@@ -0,0 +1,89 @@
+import threading
+import pytest
+from liquer.store import *
+from liquer.remote_store import RemoteStore
+
+
+class TestRemoteStore:
+    @pytest.fixture
+    def server(self):
+        from flask import Flask
+        from werkzeug.serving import make_server
+        import liquer.server.blueprint as bp
+
+        app = Flask(__name__)
+        app.register_blueprint(bp.app, url_prefix="/liquer")
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        store = MemoryStore()
+        set_store(store)
+        yield store, f"http://127.0.0.1:{server.server_port}/liquer/api/"
+        server.shutdown()
+        set_store(None)
+
+    def test_many(self, server):
+        store, url = server
+        remote = RemoteStore(url)
+        remote.store_many(
+            [("a/b", b"test b", dict(x="b")), ("a/c", b"\x00\xff", dict(x="c"))]
+        )
+        assert store.get_bytes("a/b") == b"test b"
+        assert store.get_metadata("a/c")["x"] == "c"
+        assert remote.get_many(["a/b", "a/c", "a/missing"]) == {
+            "a/b": b"test b",
+            "a/c": b"\x00\xff",
+        }
+        metadata = remote.get_metadata_many(["a", "a/b", "a/missing"])
+        assert sorted(metadata.keys()) == ["a", "a/b"]
+        assert metadata["a"]["fileinfo"]["is_dir"] is True
+        assert metadata["a/b"]["x"] == "b"
+
+    def test_basic(self, server):
+        store, url = server
+        remote = RemoteStore(url)
+        remote.store("a/b", b"test", dict(x="xx"))
+        assert store.get_bytes("a/b") == b"test"
+        assert store.get_metadata("a/b")["x"] == "xx"
+        assert remote.get_bytes("a/b") == b"test"
+        assert remote.get_metadata("a/b")["x"] == "xx"
+        assert remote.get_metadata("a")["fileinfo"]["is_dir"] is True
+        assert remote.contains("a/b") is True
+        assert remote.contains("a/c") is False
+        assert remote.is_dir("a") is True
+        assert remote.listdir("a") == ["b"]
+        remote.store_metadata("a/b", dict(x="yy"))
+        assert store.get_metadata("a/b")["x"] == "yy"
+        remote.remove("a/b")
+        assert store.contains("a/b") is False
+
+    def test_etag_cache(self, server):
+        store, url = server
+        calls = []
+        get_bytes = store.get_bytes
+
+        def counting_get_bytes(key):
+            calls.append(key)
+            return get_bytes(key)
+
+        store.get_bytes = counting_get_bytes
+        store.store("a/b", b"test", {})
+        cache = MemoryStore()
+        remote = RemoteStore(url, cache_store=cache)
+        assert remote.get_bytes("a/b") == b"test"
+        assert cache.get_bytes("a/b") == b"test"
+        assert len(calls) == 1
+        assert remote.get_bytes("a/b") == b"test"
+        assert len(calls) == 1  # Not modified, served from cache
+        store.store("a/b", b"changed", {})
+        assert remote.get_bytes("a/b") == b"changed"
+        assert len(calls) == 2
+        assert cache.get_bytes("a/b") == b"changed"
+
+    def test_gzip(self, server):
+        store, url = server
+        store.store("a/b.txt", b"x" * 10000, {})
+        remote = RemoteStore(url)
+        response = remote.fetch("store/data/a/b.txt")
+        assert response.headers.get("Content-Encoding") == "gzip"
+        assert response.content == b"x" * 10000
@@ -1,19 +1,22 @@
+import os
 import pytest
+import boto3
 from liquer.store import *
 from liquer.s3_store import *
 
+moto = pytest.importorskip("moto")
+
 
 class TestStore:
     @pytest.fixture
     def store(self):
-        store = S3Store(bucket_name="liquertest")
-        for s3key in store.object_keys():
-            print(f"Delete S3 object {s3key} (data)")
-            store.s3_resource.Object(bucket_name=store.bucket_name, key=s3key).delete()
-        for s3key in store.metadata_object_keys():
-            print(f"Delete S3 object {s3key} (metadata)")
-            store.s3_resource.Object(bucket_name=store.bucket_name, key=s3key).delete()
-        return store
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        with moto.mock_aws():
+            s3_resource = boto3.resource("s3", region_name="us-east-1")
+            s3_resource.create_bucket(Bucket="liquertest")
+            yield S3Store(bucket_name="liquertest", s3_resource=s3_resource)
 
     def test_file_store_creation(self, store):
         assert list(store.keys()) == []
@@ -86,3 +89,59 @@ class TestStore:
         memory_store.root_store().store(memory_store.to_root_key("y"), b"test1", {})
         assert s.get_bytes("x/y") == b"test1"
         assert memory_store.get_bytes("y") == b"test1"
+
+    def test_pagination(self, store):
+        client = store.s3_resource.meta.client
+        for i in range(1005):
+            client.put_object(
+                Bucket=store.bucket_name, Key=store.data_prefix + f"a/x{i:04d}", Body=b""
+            )
+        client.put_object(Bucket=store.bucket_name, Key=store.data_prefix + "a/b/c", Body=b"")
+        assert len(store.object_keys()) == 1006
+        assert len(store.listdir("a")) == 1006
+        assert "b" in store.listdir("a")
+        assert store.listdir("a/b") == ["c"]
+        assert store.listdir("") == ["a"]
+        assert store.contains("a/x1004")
+        assert store.is_dir("a/b")
+        assert not store.is_dir("a/x1004")
+        assert not store.contains("a/x1005")
+
+    def test_multipart(self, store):
+        store = S3Store(
+            bucket_name=store.bucket_name,
+            s3_resource=store.s3_resource,
+            multipart_threshold=5 * 1024 * 1024,
+            multipart_chunksize=5 * 1024 * 1024,
+        )
+        data = os.urandom(11 * 1024 * 1024)
+        store.store("big/data", data, dict(x="xx"))
+        assert store.get_bytes("big/data") == data
+        assert store.get_metadata("big/data")["x"] == "xx"
+        assert store.clone().multipart_threshold == 5 * 1024 * 1024
+
+    def test_missing(self, store):
+        with pytest.raises(KeyNotFoundStoreException):
+            store.get_bytes("missing")
+        with pytest.raises(KeyNotFoundStoreException):
+            store.get_metadata("missing")
+        store.store("a/b", b"test", {})
+        assert store.openbin("a/b").read() == b"test"
+
+    def test_get_many_errors(self, store):
+        from botocore.exceptions import ClientError
+
+        store.store("a/b", b"test", {})
+        assert store.get_many(["a/b", "missing"]) == {"a/b": b"test"}
+        assert list(store.get_metadata_many(["a/b", "missing"])) == ["a/b"]
+
+        def denied(s3key):
+            raise ClientError(
+                {"Error": {"Code": "AccessDenied", "Message": "Access Denied"}}, "GetObject"
+            )
+
+        store._get_object_bytes = denied
+        with pytest.raises(ClientError):
+            store.get_many(["a/b"])
+        with pytest.raises(ClientError):
+            store.get_metadata_many(["a/b"])
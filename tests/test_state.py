@@ -19,3 +19,25 @@ class TestState:
             d = state.as_dict()
             assert type(d["data_characteristics"]["description"]) == str
             assert d["data_characteristics"]["type_identifier"] == type_identifier_of(data)
+
+    def test_lazy_data_characteristics(self):
+        import pickle
+        import liquer.json_codec as json_codec
+        from liquer.state_types import DataCharacteristics
+
+        state = State().with_data({"abc": 123})
+        dc = state.metadata["data_characteristics"]
+        assert isinstance(dc, DataCharacteristics)
+        assert not dc.is_computed()
+        assert type(state.as_dict()["data_characteristics"]) == dict
+        assert dc.is_computed()
+        assert dc["type_identifier"] == type_identifier_of({"abc": 123})
+
+        state = State().with_data([1, 2, 3])
+        d = json_codec.loads(json_codec.dumps(state.metadata))
+        assert d["data_characteristics"]["type_identifier"] == type_identifier_of([1, 2, 3])
+        d = pickle.loads(pickle.dumps(state.metadata))
+        assert type(d["data_characteristics"]) == dict
+
+        next_state = state.next_state()
+        assert not next_state.metadata["data_characteristics"].is_computed()
@@ -115,6 +115,21 @@ class TestStore:
         assert store.contains("a/b") is False
         assert store.contains("a/b/c") is False
 
+    def test_many(self, store):
+        store.store_many(
+            [("a/b", b"test b", dict(x="b")), ("a/c", b"test c", dict(x="c"))]
+        )
+        assert store.get_bytes("a/b") == b"test b"
+        assert store.get_many(["a/b", "a/c", "a/missing"]) == {
+            "a/b": b"test b",
+            "a/c": b"test c",
+        }
+        metadata = store.get_metadata_many(["a", "a/b", "a/c", "a/missing"])
+        assert sorted(metadata.keys()) == ["a", "a/b", "a/c"]
+        assert metadata["a"]["fileinfo"]["is_dir"] is True
+        assert metadata["a/b"]["x"] == "b"
+        assert metadata["a/c"]["fileinfo"]["is_dir"] is False
+
 class TestMemoryStore(TestStore):
     @pytest.fixture
     def store(self, tmpdir):
@@ -135,6 +150,86 @@ class TestOverlayStoreClone(TestStore):
     def store(self, tmpdir):
         return OverlayStore(MemoryStore(), MemoryStore()).clone()
 
+class TestCachingStore(TestStore):
+    @pytest.fixture
+    def store(self, tmpdir):
+        return CachingStore(MemoryStore(), FileStore(tmpdir))
+
+class TestCachingStoreClone(TestStore):
+    @pytest.fixture
+    def store(self, tmpdir):
+        return MemoryStore().with_cache(max_size=10).clone()
+
+class TestCachingStoreBehaviour:
+    def test_read_through(self):
+        backend = MemoryStore()
+        backend.store("a/b", b"test", dict(x="xx"))
+        store = CachingStore(backend)
+        assert store.get_bytes("a/b") == b"test"
+        assert store.misses == 1
+        assert store.get_bytes("a/b") == b"test"
+        assert store.hits == 1
+        assert store.cache_store.get_bytes("a/b") == b"test"
+        assert store.get_metadata("a/b")["x"] == "xx"
+
+    def test_revalidate(self):
+        backend = MemoryStore()
+        backend.store("a", b"test1", {})
+        store = CachingStore(backend)
+        assert store.get_bytes("a") == b"test1"
+        backend.store("a", b"test2", {})
+        assert store.get_bytes("a") == b"test2"
+        assert store.misses == 2
+
+        trusting = CachingStore(backend, revalidate=False)
+        assert trusting.get_bytes("a") == b"test2"
+        backend.store("a", b"test3", {})
+        assert trusting.get_bytes("a") == b"test2"
+
+    def test_write_through(self):
+        backend = MemoryStore()
+        store = CachingStore(backend)
+        store.store("a", b"test", {})
+        assert backend.get_bytes("a") == b"test"
+        assert store.get_bytes("a") == b"test"
+        assert store.hits == 1
+        store.remove("a")
+        assert not store.cache_store.contains("a")
+        assert not backend.contains("a")
+
+    def test_eviction(self):
+        backend = MemoryStore()
+        for key in "abc":
+            backend.store(key, b"12345", {})
+        store = CachingStore(backend, max_size=10)
+        store.get_bytes("a")
+        store.get_bytes("b")
+        store.get_bytes("a")
+        store.get_bytes("c")
+        assert store.cache_size == 10
+        assert store.cache_store.contains("a")
+        assert not store.cache_store.contains("b")
+        assert store.cache_store.contains("c")
+
+    def test_many(self):
+        backend = MemoryStore()
+        backend.store("a", b"A", {})
+        backend.store("b", b"B", {})
+        store = CachingStore(backend)
+        store.get_bytes("a")
+        assert store.get_many(["a", "b", "missing"]) == dict(a=b"A", b=b"B")
+        assert store.hits == 1
+        assert store.cache_store.get_bytes("b") == b"B"
+
+    def test_persistent_cache(self, tmpdir):
+        backend = MemoryStore()
+        backend.store("a", b"test", {})
+        CachingStore(backend, FileStore(tmpdir)).get_bytes("a")
+        store = CachingStore(backend, FileStore(tmpdir))
+        assert store.cache_size == 4
+        assert store.get_bytes("a") == b"test"
+        assert store.hits == 1
+
 class TestFileSystemStore(TestStore):
     @pytest.fixture
     def store(self, tmpdir):
@@ -258,6 +353,31 @@ class TestMountPointStore:
         assert "d" in list(d_root.keys())
         assert store == d_root
 
+    def test_many(self):
+        store = MountPointStore(MemoryStore())
+        store.mount("a", MemoryStore())
+        store.mount("b/c", MemoryStore())
+        store.store_many(
+            [("a/x", b"ax", dict(x="a")), ("b/c/y", b"by", {}), ("d", b"d", {})]
+        )
+        assert store.get_many(["a/x", "b/c/y", "d", "a/missing"]) == {
+            "a/x": b"ax",
+            "b/c/y": b"by",
+            "d": b"d",
+        }
+        metadata = store.get_metadata_many(["a/x", "b/c/y", "a/missing"])
+        assert sorted(metadata.keys()) == ["a/x", "b/c/y"]
+        assert metadata["a/x"]["x"] == "a"
+        assert metadata["a/x"]["key"] == "a/x"
+        assert metadata["b/c/y"]["key"] == "b/c/y"
+
+    def test_many_noroute(self):
+        store = MountPointStore()
+        store.mount("a/b", MemoryStore())
+        metadata = store.get_metadata_many(["a", "x"])
+        assert list(metadata.keys()) == ["a"]
+        assert metadata["a"]["fileinfo"]["is_dir"] is True
+
     def test_metadata_bug1(self, tmpdir):
         import liquer.recipes as r
         set_store(None)